@@ -16,12 +16,22 @@ Folder structure:
 
 The script generates torrents for each folder contains files.
 There are a possibility to add ignored files (see "_ignore_glob" below).
+
+Torrents are created in a process pool and are added to the LibTorrent session
+as soon as they are ready. Folders that have not changed since their torrent was
+created (see "_cache_file_name" below) are not hashed again.
 """
 import argparse
+import hashlib
+import json
 import logging
+import multiprocessing
 import os
+import re
 import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fnmatch import translate
 from pathlib import Path
 
 import libtorrent
@@ -45,13 +55,16 @@ _dht_routers = [
 ]
 _port_range = (6881, 7000)
 _log_statistics_interval_in_sec = 10
-_add_torrent_delay_in_sec = 1
+_cache_file_name = '.seeder_cache.json'
+_cache_save_interval = 100  # save the cache after each N created torrents
 _ignore_glob = [
     '*DS_Store',
     '*.torrent',
     'thumbnail.png',
     'description.md',
+    _cache_file_name,
 ]
+_ignore_regex = re.compile('|'.join(translate(g) for g in _ignore_glob))
 
 _logger = logging.getLogger('Seeder')
 
@@ -66,6 +79,8 @@ def parse_args():
 
     parser.add_argument('-s', '--source', type=str, help='path to data folder', default='.')
     parser.add_argument('-v', '--verbosity', help='increase output verbosity', action='store_true')
+    parser.add_argument('-w', '--workers', type=int, help='number of torrent hashing processes',
+                        default=os.cpu_count())
 
     return parser.parse_args()
 
@@ -88,36 +103,85 @@ def get_folders_with_files(source):
     """
     result = {}
 
-    for file in Path(source).rglob('*'):
-        ignore = any(file.match(a) for a in _ignore_glob)
-        if file.is_file() and not ignore:
-            result.setdefault(file.parent, set()).add(file)
+    for root, _, files in os.walk(source):
+        files = [f for f in files if not _ignore_regex.match(f)]
+        if files:
+            folder = Path(root)
+            result[folder] = {folder / f for f in files}
 
     return result
 
 
-def create_torrents(folders, source):
+def load_cache(source):
+    """ Return the cache of created torrents: a dictionary where key is a folder
+    and value is the signature of its files at the moment of the torrent creation
+    """
+    cache_file = Path(source) / _cache_file_name
+    if not cache_file.exists():
+        return {}
+
+    try:
+        return json.loads(cache_file.read_text())
+    except ValueError:
+        _logger.warning(f'Corrupted cache file: {cache_file}')
+        return {}
+
+
+def save_cache(source, cache):
+    (Path(source) / _cache_file_name).write_text(json.dumps(cache))
+
+
+def get_folder_signature(folder, files):
+    """ Return a signature of the (relative path, size, modification time) of the files in a folder,
+    so that added, removed, renamed and modified files all change it
+    """
+    entries = []
+    for file in files:
+        stat = file.stat()
+        entries.append((file.relative_to(folder).as_posix(), stat.st_size, stat.st_mtime))
+    return hashlib.sha1(json.dumps(sorted(entries)).encode()).hexdigest()
+
+
+def create_torrents(folders, source, workers=None):
     _logger.info(f'Creating {len(folders)} torrent files...')
 
-    for folder in folders:
-        if folder.match(source):
-            continue
+    cache = load_cache(source)
+    # Spawned processes do not inherit the LibTorrent session threads of the parent process
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {}
+        for folder in folders:
+            if folder.match(source):
+                continue
 
-        torrent_file = folder.parent / f'{folder.name}.torrent'
+            torrent_file = folder.parent / f'{folder.name}.torrent'
+            signature = get_folder_signature(folder, folders[folder])
 
-        if not torrent_file.exists():
-            original, encoded = create_torrent_from_folder(folder, folders[folder])
-            torrent_file.write_bytes(encoded)
-            _logger.info(f'Created: {torrent_file}')
+            if torrent_file.exists() and cache.setdefault(str(folder), signature) == signature:
+                _logger.info(f'Skipped (file already exists): {torrent_file}')
 
-            yield original, folder
-        else:
-            _logger.info(f'Skipped (file already exists): {torrent_file}')
+                encoded = torrent_file.read_bytes()
+                decoded = libtorrent.bdecode(encoded)
 
-            encoded = torrent_file.read_bytes()
-            decoded = libtorrent.bdecode(encoded)
+                yield decoded, folder
+            else:
+                future = executor.submit(create_torrent_from_folder, folder, folders[folder])
+                futures[future] = folder, torrent_file, signature
 
-            yield decoded, folder
+        try:
+            for created, future in enumerate(as_completed(futures), start=1):
+                folder, torrent_file, signature = futures[future]
+                encoded = future.result()
+                torrent_file.write_bytes(encoded)
+                _logger.info(f'Created: {torrent_file}')
+
+                cache[str(folder)] = signature
+                if created % _cache_save_interval == 0:
+                    save_cache(source, cache)
+
+                yield libtorrent.bdecode(encoded), folder
+        finally:
+            save_cache(source, cache)
 
 
 def create_torrent_from_folder(folder, files):
@@ -137,7 +201,7 @@ def create_torrent_from_folder(folder, files):
     libtorrent.set_piece_hashes(torrent, str(folder.parent))
 
     torrent_data = torrent.generate()
-    return torrent_data, libtorrent.bencode(torrent_data)
+    return libtorrent.bencode(torrent_data)
 
 
 def log_all_alerts(session):
@@ -148,7 +212,7 @@ def log_all_alerts(session):
             _logger.info(a)
 
 
-def log_statistics(session, handlers, interval):
+def log_statistics(session, interval):
     while True:
         time.sleep(interval)
         log_all_alerts(session)
@@ -156,7 +220,7 @@ def log_statistics(session, handlers, interval):
         states = defaultdict(int)
         errors = defaultdict(int)
 
-        for h in handlers:
+        for h in session.get_torrents():
             status = h.status()
             states[status.state] += 1
             if status.errc.value() != 0:
@@ -181,7 +245,7 @@ def seed(torrents):
         'active_limit': UNLIMITED
     })
 
-    handlers = []
+    # Torrents are added asynchronously as soon as they are created, the results are reported through the alerts
     for torrent, folder in torrents:
         torrent_info = libtorrent.torrent_info(torrent)
         params = {
@@ -191,13 +255,10 @@ def seed(torrents):
         }
 
         _logger.info(f'Add torrent: {params}')
-        result = session.add_torrent(params)
-        handlers.append(result)
-
-        time.sleep(_add_torrent_delay_in_sec)
+        session.async_add_torrent(params)
         log_all_alerts(session)
 
-    log_statistics(session, handlers, _log_statistics_interval_in_sec)
+    log_statistics(session, _log_statistics_interval_in_sec)
 
 
 if __name__ == "__main__":
@@ -206,5 +267,5 @@ if __name__ == "__main__":
 
     setup_logger(_arguments.verbosity)
     _folders = get_folders_with_files(_arguments.source)
-    _torrents = list(create_torrents(_folders, _arguments.source))
+    _torrents = create_torrents(_folders, _arguments.source, _arguments.workers)
     seed(_torrents)
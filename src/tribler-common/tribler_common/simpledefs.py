@@ -96,6 +96,7 @@ class NTFY(Enum):
     UPGRADER_STARTED = "upgrader_started"
     UPGRADER_DONE = "upgrader_done"
     CHANNEL_ENTITY_UPDATED = "channel_entity_updated"
+    METADATA_BULK_PROGRESS = "metadata_bulk_progress"
     LOW_SPACE = "low_space"
     EVENTS_START = "events_start"
     TRIBLER_EXCEPTION = "tribler_exception"
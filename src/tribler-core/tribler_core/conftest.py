@@ -15,6 +15,7 @@ from tribler_common.network_utils import NetworkUtils
 from tribler_common.simpledefs import DLSTATUS_SEEDING
 
 from tribler_core.config.tribler_config import TriblerConfig
+from tribler_core.modules.libtorrent.checkpoint_store import CHECKPOINT_STORE_FILENAME, CheckpointStore
 from tribler_core.modules.libtorrent.download import Download
 from tribler_core.modules.libtorrent.download_config import DownloadConfig
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef
@@ -102,6 +103,7 @@ def mock_dlmgr(session, mocker, tmpdir):
     mocker.patch.object(session, 'dlmgr')
     session.dlmgr.shutdown = lambda: succeed(None)
     session.dlmgr.get_checkpoint_dir = lambda: tmpdir
+    session.dlmgr.checkpoint_store = CheckpointStore(tmpdir / CHECKPOINT_STORE_FILENAME)
 
 
 @pytest.fixture
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-from asyncio import Future
+from asyncio import Future, Lock
 from binascii import unhexlify
 from pathlib import Path
 from random import Random
-from typing import Dict
+from typing import Dict, List, Tuple
 
 from ipv8.peer import Peer
 from ipv8.requestcache import RequestCache
@@ -36,6 +36,12 @@ class BandwidthAccountingCommunity(TriblerCommunity):
         self.database = kwargs.pop('database', None)
         self.database_path = Path(kwargs.pop('database_path', ''))
         self.random = Random()
+        # (public key A, public key B) -> {sequence number: transaction}, for the received third-party transactions
+        # that have not been validated and stored yet.
+        self.pending_transactions: Dict[Tuple[bytes, bytes], Dict[int, BandwidthTransactionData]] = {}
+        self.num_pending_transactions = 0
+        # Makes sure that the periodic flush and a flush because of a full queue do not run at the same time
+        self.flush_lock = Lock()
 
         super().__init__(*args, **kwargs)
 
@@ -49,6 +55,8 @@ class BandwidthAccountingCommunity(TriblerCommunity):
         self.add_message_handler(BandwidthTransactionQueryPayload, self.received_query)
 
         self.register_task("query_peers", self.query_random_peer, interval=self.settings.outgoing_query_interval)
+        self.register_task("flush_transactions", self.flush_transactions,
+                           interval=self.settings.transaction_flush_interval)
 
         self.logger.info("Started bandwidth accounting community with public key %s", hexlify(self.my_pk))
 
@@ -101,48 +109,101 @@ class BandwidthAccountingCommunity(TriblerCommunity):
         payload = self._ez_unpack_noauth(BandwidthTransactionPayload, data, global_time=False)
         tx = BandwidthTransactionData.from_payload(payload)
 
+        if payload.public_key_a != self.my_pk and payload.public_key_b != self.my_pk:
+            # This transaction involves two unknown peers. We can add it to our database.
+            self.queue_transaction(tx)
+            return
+
         if not tx.is_valid():
             self.logger.info("Transaction %s not valid, ignoring it", tx)
             return
 
-        if payload.public_key_a == self.my_pk or payload.public_key_b == self.my_pk:
-            # This transaction involves this peer.
-            latest_tx = self.database.get_latest_transaction(tx.public_key_a, tx.public_key_b)
-            if payload.public_key_b == self.my_peer.public_key.key_to_bin():
-                from_peer = Peer(payload.public_key_a, source_address)
-                if latest_tx:
-                    # Check if the amount in the received transaction is higher than the amount of the latest one
-                    # in the database.
-                    if payload.amount > latest_tx.amount:
-                        # Sign it, store it, and send it back
-                        tx.sign(self.my_peer.key, as_a=False)
-                        self.database.BandwidthTransaction.insert(tx)
-                        self.send_transaction(tx, from_peer.address, payload.request_id)
-                    else:
-                        self.logger.info("Received older bandwidth transaction from peer %s:%d - "
-                                         "sending back the latest one", *from_peer.address)
-                        self.send_transaction(latest_tx, from_peer.address, payload.request_id)
-                else:
-                    # This transaction is the first one with party A. Sign it, store it, and send it back.
+        # This transaction involves this peer.
+        latest_tx = self.database.get_latest_transaction(tx.public_key_a, tx.public_key_b)
+        if payload.public_key_b == self.my_pk:
+            from_peer = Peer(payload.public_key_a, source_address)
+            if latest_tx:
+                # Check if the amount in the received transaction is higher than the amount of the latest one
+                # in the database.
+                if payload.amount > latest_tx.amount:
+                    # Sign it, store it, and send it back
                     tx.sign(self.my_peer.key, as_a=False)
                     self.database.BandwidthTransaction.insert(tx)
-                    from_peer = Peer(payload.public_key_a, source_address)
                     self.send_transaction(tx, from_peer.address, payload.request_id)
-            elif payload.public_key_a == self.my_peer.public_key.key_to_bin():
-                # It seems that we initiated this transaction. Check if we are waiting for it.
-                cache = self.request_cache.get("bandwidth-tx-sign", payload.request_id)
-                if not cache:
-                    self.logger.info("Received bandwidth transaction %s without associated cache entry, ignoring it",
-                                     tx)
-                    return
-
-                if not latest_tx or (latest_tx and latest_tx.amount >= tx.amount):
-                    self.database.BandwidthTransaction.insert(tx)
-
-                cache.future.set_result(tx)
+                else:
+                    self.logger.info("Received older bandwidth transaction from peer %s:%d - "
+                                     "sending back the latest one", *from_peer.address)
+                    self.send_transaction(latest_tx, from_peer.address, payload.request_id)
+            else:
+                # This transaction is the first one with party A. Sign it, store it, and send it back.
+                tx.sign(self.my_peer.key, as_a=False)
+                self.database.BandwidthTransaction.insert(tx)
+                self.send_transaction(tx, from_peer.address, payload.request_id)
         else:
-            # This transaction involves two unknown peers. We can add it to our database.
-            self.database.BandwidthTransaction.insert(tx)
+            # It seems that we initiated this transaction. Check if we are waiting for it.
+            cache = self.request_cache.get("bandwidth-tx-sign", payload.request_id)
+            if not cache:
+                self.logger.info("Received bandwidth transaction %s without associated cache entry, ignoring it", tx)
+                return
+
+            if not latest_tx or (latest_tx and latest_tx.amount >= tx.amount):
+                self.database.BandwidthTransaction.insert(tx)
+
+            cache.future.set_result(tx)
+
+    def queue_transaction(self, transaction: BandwidthTransactionData) -> None:
+        """
+        Queue a third-party transaction for validation and storage in the next flush.
+        :param transaction: The received transaction.
+        """
+        key = (transaction.public_key_a, transaction.public_key_b)
+        candidates = self.pending_transactions.setdefault(key, {})
+        if transaction.sequence_number not in candidates:
+            candidates[transaction.sequence_number] = transaction
+            self.num_pending_transactions += 1
+
+        if self.num_pending_transactions >= self.settings.max_pending_transactions \
+                and not self.is_pending_task_active("flush_pending_transactions"):
+            self.register_task("flush_pending_transactions", self.flush_transactions)
+
+    def select_transactions(self, pending: Dict[Tuple[bytes, bytes], Dict[int, BandwidthTransactionData]]) \
+            -> List[BandwidthTransactionData]:
+        """
+        Validate a batch of pending transactions. Unless we store all transactions, only the valid transaction with
+        the highest sequence number is kept for every pair of parties.
+        :param pending: The pending transactions, grouped by the parties involved.
+        :return: A list with the transactions that should be stored.
+        """
+        selected = []
+        for candidates in pending.values():
+            for sequence_number in sorted(candidates, reverse=True):
+                transaction = candidates[sequence_number]
+                if not transaction.is_valid():
+                    self.logger.info("Transaction %s not valid, ignoring it", transaction)
+                    continue
+                selected.append(transaction)
+                if not self.database.store_all_transactions:
+                    break
+        return selected
+
+    def store_transactions(self, pending: Dict[Tuple[bytes, bytes], Dict[int, BandwidthTransactionData]]) -> None:
+        self.database.insert_transactions(self.select_transactions(pending))
+
+    async def flush_transactions(self) -> None:
+        """
+        Validate and store the pending third-party transactions, in a single database transaction on a worker thread.
+        """
+        async with self.flush_lock:
+            if not self.pending_transactions:
+                return
+            pending, self.pending_transactions = self.pending_transactions, {}
+            self.num_pending_transactions = 0
+            self.logger.debug("Storing %d pending bandwidth transaction(s)", len(pending))
+            try:
+                await self.database.run_threaded(self.store_transactions, pending)
+            finally:
+                # Balances that were cached while the batch was being stored may not include it
+                self.database.invalidate_balances({public_key for pair in pending for public_key in pair})
 
     def query_random_peer(self) -> None:
         """
@@ -196,10 +257,11 @@ class BandwidthAccountingCommunity(TriblerCommunity):
         self.logger.info("Unloading the bandwidth accounting community.")
 
         await self.request_cache.shutdown()
-        self.database.shutdown()
-
         await super().unload()
 
+        await self.flush_transactions()
+        self.database.shutdown()
+
 
 class BandwidthAccountingTestnetCommunity(BandwidthAccountingCommunity):
     """
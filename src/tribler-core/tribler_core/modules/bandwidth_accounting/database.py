@@ -1,5 +1,7 @@
+import threading
+from asyncio import get_event_loop
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, List, Optional
 
 from pony.orm import Database, count, db_session, select, sum
 
@@ -25,7 +27,11 @@ class BandwidthDatabase:
         self.db_path = db_path
         self.my_pub_key = my_pub_key
         self.store_all_transactions = store_all_transactions
-        create_db = str(db_path) == ":memory:" or not self.db_path.is_file()
+        # Public key -> balance, for the balances that have been requested. Only accessed from the event loop, and
+        # only updated after the transactions that change a balance have been committed.
+        self.balances = {}
+        self.in_memory = str(db_path) == ":memory:"
+        create_db = self.in_memory or not self.db_path.is_file()
         self.database = Database()
 
         # This attribute is internally called by Pony on startup, though pylint cannot detect it
@@ -50,6 +56,45 @@ class BandwidthDatabase:
             with db_session:
                 self.MiscData(name="db_version", value=str(self.CURRENT_DB_VERSION))
 
+    async def run_threaded(self, func, *args):
+        """
+        Run a function that accesses the database on a worker thread.
+        An in-memory database only exists for the connection of the thread that created it, so in that case the
+        function is run on the calling thread instead.
+        """
+        if self.in_memory:
+            return func(*args)
+
+        def wrapper():
+            try:
+                return func(*args)
+            finally:
+                self.disconnect_thread()
+
+        return await get_event_loop().run_in_executor(None, wrapper)
+
+    def disconnect_thread(self) -> None:
+        if not isinstance(threading.current_thread(), threading._MainThread):  # pylint: disable=W0212
+            self.database.disconnect()
+
+    @db_session(optimistic=False)
+    def insert_transactions(self, transactions: Iterable[BandwidthTransactionData]) -> None:
+        """
+        Insert a batch of transactions in a single database transaction.
+        The cached balances are not updated, since this usually runs on a worker thread. Call invalidate_balances
+        for the parties involved once the transactions are committed.
+        Unless we store all transactions, a transaction is skipped if we already have a newer one between the same
+        parties.
+        :param transactions: The transactions to insert in the database.
+        """
+        for transaction in transactions:
+            if not self.store_all_transactions:
+                latest_tx = self.BandwidthTransaction.get(public_key_a=transaction.public_key_a,
+                                                          public_key_b=transaction.public_key_b)
+                if latest_tx and latest_tx.sequence_number >= transaction.sequence_number:
+                    continue
+            self.BandwidthTransaction.store(transaction)
+
     def has_transaction(self, transaction: BandwidthTransactionData) -> bool:
         """
         Return whether a transaction is persisted to the database.
@@ -123,11 +168,44 @@ class BandwidthDatabase:
     def get_balance(self, public_key: bytes) -> int:
         """
         Return the bandwidth balance (total given - total taken) of a specific peer.
+        The balance is only computed from the database on the first request, and cached afterwards.
+        :param public_key: The public key of the peer of which we want to determine the balance.
+        :return The bandwidth balance the specified peer, in bytes.
+        """
+        balance = self.balances.get(public_key)
+        if balance is None:
+            balance = self.balances[public_key] = self.compute_balance(public_key)
+        return balance
+
+    @db_session
+    def compute_balance(self, public_key: bytes) -> int:
+        """
+        Compute the bandwidth balance of a specific peer from the database, bypassing the cache.
         :param public_key: The public key of the peer of which we want to determine the balance.
         :return The bandwidth balance the specified peer, in bytes.
         """
         return self.get_total_given(public_key) - self.get_total_taken(public_key)
 
+    def update_balances(self, public_key_a: bytes, public_key_b: bytes, amount: int) -> None:
+        """
+        Update the cached balances after the amount that party A has taken from party B changed.
+        :param public_key_a: The public key of the party transferring the bandwidth.
+        :param public_key_b: The public key of the party receiving the bandwidth.
+        :param amount: The change of the total amount transferred between the two parties, in bytes.
+        """
+        if public_key_a in self.balances:
+            self.balances[public_key_a] -= amount
+        if public_key_b in self.balances:
+            self.balances[public_key_b] += amount
+
+    def invalidate_balances(self, public_keys: Iterable[bytes]) -> None:
+        """
+        Forget the cached balances of the given parties, so that they are computed from the database again.
+        :param public_keys: The public keys of the parties of which the balance changed.
+        """
+        for public_key in public_keys:
+            self.balances.pop(public_key, None)
+
     def get_my_balance(self) -> int:
         """
         Return your bandwidth balance, which is the total amount given minus the total amount taken.
@@ -7,3 +7,5 @@ class BandwidthAccountingSettings(TriblerConfigSection):
     testnet: bool = Field(default=False, env='BANDWIDTH_TESTNET')
     outgoing_query_interval: int = 30  # The interval at which we send out queries to other peers, in seconds.
     max_tx_returned_in_query: int = 10  # The maximum number of bandwidth transactions to return in response to a query.
+    transaction_flush_interval: float = 5  # The interval at which received third-party transactions are stored.
+    max_pending_transactions: int = 1000  # The number of pending third-party transactions that triggers a flush.
@@ -141,34 +141,52 @@ def define_binding(bandwidth_database):
         PrimaryKey(sequence_number, public_key_a, public_key_b)
 
         @classmethod
-        @db_session(optimistic=False)
         def insert(cls, transaction: BandwidthTransaction) -> None:
             """
-            Insert a BandwidthTransaction object in the database.
-            Remove the last transaction with that specific counterparty while doing so.
+            Insert a BandwidthTransaction object in the database, and update the cached balances once it is committed.
             :param transaction: The transaction to insert in the database.
             """
+            amount = cls.store(transaction)
+            bandwidth_database.update_balances(transaction.public_key_a, transaction.public_key_b, amount)
+
+        @classmethod
+        @db_session(optimistic=False)
+        def store(cls, transaction: BandwidthTransaction) -> int:
+            """
+            Store a BandwidthTransaction object in the database, without touching the cached balances.
+            Remove the last transaction with that specific counterparty while doing so.
+            :param transaction: The transaction to store in the database.
+            :return: The change of the total amount transferred between the two parties, in bytes.
+            """
             if not bandwidth_database.store_all_transactions:
                 # Make sure to only store the latest pairwise transaction.
+                amount = transaction.amount
                 for tx in cls.select(
                         lambda c: c.public_key_a == transaction.public_key_a and
                                   c.public_key_b == transaction.public_key_b):
+                    amount -= tx.amount
                     tx.delete()
-                db.commit()
+                db.flush()
                 cls(**transaction.get_db_kwargs())
             elif not bandwidth_database.has_transaction(transaction):
                 # We store all transactions and it does not exist yet - insert it.
+                amount = transaction.amount
                 cls(**transaction.get_db_kwargs())
+            else:
+                amount = 0
 
             if transaction.public_key_a == bandwidth_database.my_pub_key or \
                     transaction.public_key_b == bandwidth_database.my_pub_key:
-                # Update the balance history
+                # Update the balance history. The cache does not include this transaction yet.
                 timestamp = int(round(time.time() * 1000))
-                db.BandwidthHistory(timestamp=timestamp, balance=bandwidth_database.get_my_balance())
+                balance = bandwidth_database.compute_balance(bandwidth_database.my_pub_key)
+                db.BandwidthHistory(timestamp=timestamp, balance=balance)
                 num_entries = db.BandwidthHistory.select().count()
                 if num_entries > bandwidth_database.MAX_HISTORY_ITEMS:
                     # Delete the entry with the lowest timestamp
                     entry = list(db.BandwidthHistory.select().order_by(db.BandwidthHistory.timestamp))[0]
                     entry.delete()
 
+            return amount
+
     return BandwidthTransaction
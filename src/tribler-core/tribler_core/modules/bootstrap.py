@@ -1,12 +1,13 @@
 import logging
 import os
+from asyncio import gather
 from binascii import unhexlify
 
-from ipv8.dht import DHTError
 from ipv8.taskmanager import TaskManager
 
 from tribler_core.modules.libtorrent.download_config import DownloadConfig
 from tribler_core.modules.libtorrent.torrentdef import TorrentDefNoMetainfo
+from tribler_core.modules.peer_resolver import PeerResolver
 from tribler_core.utilities.unicode import hexlify
 
 
@@ -16,7 +17,7 @@ class Bootstrap(TaskManager):
     Bootstrap class will be initialized at the start of Tribler by downloading/seeding bootstrap file.
     """
 
-    def __init__(self, config_dir, dht=None):
+    def __init__(self, config_dir, dht=None, resolver=None):
         super().__init__()
 
         self._logger = logging.getLogger(self.__class__.__name__)
@@ -29,6 +30,8 @@ class Bootstrap(TaskManager):
         self.dcfg.set_safe_seeding(True)
         self.bootstrap_file = self.bootstrap_dir / "bootstrap.blocks"
         self.dht = dht
+        self.owns_resolver = resolver is None
+        self.resolver = PeerResolver(dht) if resolver is None else resolver
 
         self.bootstrap_finished = False
         self.infohash = None
@@ -52,21 +55,17 @@ class Bootstrap(TaskManager):
         if not self.download:
             return {}
 
-        for peer in self.download.get_peerlist():
-            mid = peer['id']
-            if (mid not in self.bootstrap_nodes or not self.bootstrap_nodes[mid]) and mid != "0" * 40:
-                if self.dht:
-                    try:
-                        nodes = await self.dht.connect_peer(bytes(unhexlify(mid)))
-                    except DHTError as e:
-                        self._logger.error("Failed to get DHT response:%s", e)
-                        continue
-
-                    if not nodes:
-                        return
-                    for node in nodes:
-                        self.bootstrap_nodes[hexlify(node.mid)] = hexlify(node.public_key.key_to_bin())
+        if self.dht:
+            mids = {peer['id'] for peer in self.download.get_peerlist()
+                    if not self.bootstrap_nodes.get(peer['id']) and peer['id'] != "0" * 40}
+            # The resolver bounds the number of DHT lookups that run at the same time
+            node_lists = await gather(*[self.resolver.resolve(bytes(unhexlify(mid))) for mid in mids])
+            for nodes in node_lists:
+                for node in nodes:
+                    self.bootstrap_nodes[hexlify(node.mid)] = hexlify(node.public_key.key_to_bin())
         return self.bootstrap_nodes
 
     async def shutdown(self):
         await self.shutdown_task_manager()
+        if self.owns_resolver:
+            await self.resolver.shutdown()
@@ -0,0 +1,218 @@
+"""
+A single-file store for download checkpoints.
+"""
+import logging
+import sqlite3
+from asyncio import CancelledError, Lock as AsyncLock, get_event_loop, shield, wait
+from threading import Lock
+
+from tribler_core.modules.libtorrent.download_config import DownloadConfig
+from tribler_core.utilities.libtorrent_helper import libtorrent as lt
+from tribler_core.utilities.path_util import Path
+
+CHECKPOINT_STORE_FILENAME = 'checkpoints.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint (
+    infohash BLOB PRIMARY KEY,
+    settings TEXT NOT NULL,
+    resume_data BLOB
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS metainfo (
+    infohash BLOB PRIMARY KEY,
+    metainfo BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class CheckpointStore:
+    """
+    Keeps the checkpoints of all downloads in one SQLite file, keyed by infohash.
+
+    The download settings are stored as ConfigObj text (without the state section), the metainfo and the libtorrent
+    resume data are stored as raw bencoded bytes. Since the metainfo of a torrent does not change, it is only
+    written when it is passed explicitly. Writes are queued in memory and flushed in a single transaction on a worker
+    thread, so checkpointing never blocks the event loop on disk I/O. Flushes never overlap.
+    """
+
+    def __init__(self, db_path):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.db_path = Path(db_path)
+        self._connection = None
+        self._lock = Lock()
+        self._flush_lock = AsyncLock()
+        self._closed = False
+        # The infohashes of the checkpoints on disk, loaded when the store is first accessed
+        self._infohashes = None
+        # infohash -> (settings, metainfo, resume_data), or None if the checkpoint should be removed
+        self._pending = {}
+        # The batch that is being written to disk, in the same format as the pending checkpoints
+        self._writing = {}
+
+    def _connect(self):
+        if self._connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute("PRAGMA synchronous = NORMAL")
+            self._connection.executescript(SCHEMA)
+            self._infohashes = {row[0] for row in self._connection.execute("SELECT infohash FROM checkpoint")}
+        return self._connection
+
+    def __contains__(self, infohash):
+        for batch in (self._pending, self._writing):
+            if infohash in batch:
+                return batch[infohash] is not None
+        if self._infohashes is None:
+            # Only happens if we are asked before the checkpoints are loaded
+            with self._lock:
+                self._connect()
+        return infohash in self._infohashes
+
+    def is_stored(self, infohash):
+        """
+        Check whether the checkpoint of the given infohash has been written to disk.
+        """
+        return self._infohashes is not None and infohash in self._infohashes
+
+    def save(self, infohash, config, metainfo=None, resume_data=None):
+        """
+        Queue a checkpoint for writing.
+
+        :param infohash: the infohash of the download
+        :param config: the DownloadConfig of the download
+        :param metainfo: the metainfo dictionary, or None if the stored metainfo is still up to date
+        :param resume_data: the libtorrent resume data dictionary
+        """
+        previous = self._pending.get(infohash)
+        encoded_metainfo = lt.bencode(metainfo) if metainfo is not None else None
+        if encoded_metainfo is None and previous is not None:
+            encoded_metainfo = previous[1]
+        self._pending[infohash] = (config.get_settings_text(),
+                                   encoded_metainfo,
+                                   lt.bencode(resume_data) if resume_data is not None else None)
+
+    def remove(self, infohash):
+        self._pending[infohash] = None
+
+    def _write(self, batch):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                for infohash, entry in batch.items():
+                    if entry is None:
+                        connection.execute("DELETE FROM checkpoint WHERE infohash = ?", (infohash,))
+                        connection.execute("DELETE FROM metainfo WHERE infohash = ?", (infohash,))
+                        self._infohashes.discard(infohash)
+                        continue
+                    settings, metainfo, resume_data = entry
+                    connection.execute("INSERT OR REPLACE INTO checkpoint VALUES (?, ?, ?)",
+                                       (infohash, settings, resume_data))
+                    if metainfo is not None:
+                        connection.execute("INSERT OR REPLACE INTO metainfo VALUES (?, ?)", (infohash, metainfo))
+                    self._infohashes.add(infohash)
+
+    def _requeue(self, batch):
+        """
+        Queue a batch that could not be written again. Newer checkpoints that have been queued in the meantime take
+        precedence, but keep the metainfo of the batch if they do not have any.
+        """
+        for infohash, entry in self._pending.items():
+            previous = batch.get(infohash)
+            if entry is not None and entry[1] is None and previous is not None:
+                entry = (entry[0], previous[1], entry[2])
+            batch[infohash] = entry
+        self._pending = batch
+
+    async def flush(self):
+        """
+        Write all queued checkpoints to disk in a single transaction.
+
+        :return: True if all queued checkpoints have been written, False otherwise.
+        """
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def _flush(self):
+        if not self._pending:
+            return True
+        if self._closed:
+            self._logger.warning("Not writing %d checkpoints, the store is closed", len(self._pending))
+            return False
+        batch, self._pending = self._pending, {}
+        self._writing = batch
+        write = get_event_loop().run_in_executor(None, self._write, batch)
+        try:
+            await shield(write)
+        except CancelledError:
+            # The batch is written anyway, wait for it so that the next flush does not overlap with this one
+            await wait([write])
+            if write.exception() is not None:
+                self._requeue(batch)
+            raise
+        except sqlite3.Error:
+            self._logger.exception("Could not write %d checkpoints", len(batch))
+            self._requeue(batch)
+            return False
+        finally:
+            self._writing = {}
+        return True
+
+    def _read(self, infohash=None):
+        query = ("SELECT c.infohash, c.settings, m.metainfo, c.resume_data "
+                 "FROM checkpoint c LEFT JOIN metainfo m ON c.infohash = m.infohash")
+        with self._lock:
+            connection = self._connect()
+            if infohash is None:
+                return connection.execute(query).fetchall()
+            return connection.execute(query + " WHERE c.infohash = ?", (infohash,)).fetchall()
+
+    async def load_all(self):
+        """
+        Read all checkpoints in one go.
+
+        :return: a list of (infohash, settings, metainfo, resume_data) tuples, with metainfo and resume_data as
+                 bencoded bytes.
+        """
+        return await get_event_loop().run_in_executor(None, self._read)
+
+    async def get_config(self, infohash):
+        """
+        Build a full DownloadConfig, including the state section, for the given infohash.
+
+        :return: the DownloadConfig, or None if there is no checkpoint for this infohash.
+        """
+        rows = await get_event_loop().run_in_executor(None, self._read, infohash)
+        # Checkpoints that have not been written yet take precedence over the ones we read
+        pending = self._pending.get(infohash, self._writing.get(infohash, False))
+        if pending is None:
+            return None
+        if pending:
+            settings, metainfo, resume_data = pending
+            metainfo = metainfo if metainfo is not None or not rows else rows[0][2]
+        elif rows:
+            _, settings, metainfo, resume_data = rows[0]
+        else:
+            return None
+        return DownloadConfig.from_checkpoint(settings, metainfo, resume_data)
+
+    async def export_conf(self, infohash, filename):
+        """
+        Write the checkpoint of the given infohash to a legacy .conf file.
+
+        :return: True if the checkpoint was exported, False if there is no checkpoint for this infohash.
+        """
+        config = await self.get_config(infohash)
+        if config is None:
+            return False
+        await get_event_loop().run_in_executor(None, config.write, str(filename))
+        return True
+
+    async def close(self):
+        async with self._flush_lock:
+            await self._flush()
+            self._closed = True
+            with self._lock:
+                if self._connection is not None:
+                    self._connection.close()
+                    self._connection = None
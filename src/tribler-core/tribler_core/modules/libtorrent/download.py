@@ -55,6 +55,8 @@ class Download(TaskManager):
         self.checkpoint_after_next_hashcheck = False
         self.tracker_status = {}  # {url: [num_peers, status_str]}
         self.checkpoint_disabled = self.dummy
+        # The TorrentDef whose metainfo has been written to the checkpoint store
+        self.checkpointed_tdef = None
 
         self.futures = defaultdict(list)
         self.alert_handlers = defaultdict(list)
@@ -75,7 +77,8 @@ class Download(TaskManager):
                           'state_changed_alert': self.on_state_changed_alert,
                           'torrent_error_alert': self.on_torrent_error_alert,
                           'add_torrent_alert': self.on_add_torrent_alert,
-                          'torrent_removed_alert': self.on_torrent_removed_alert}
+                          'torrent_removed_alert': self.on_torrent_removed_alert,
+                          'piece_finished_alert': self.on_piece_finished_alert}
 
         for alert_type, alert_handler in alert_handlers.items():
             self.register_alert_handler(alert_type, alert_handler)
@@ -154,10 +157,7 @@ class Download(TaskManager):
 
         resume_data = self.config.get_engineresumedata()
         if not isinstance(self.tdef, TorrentDefNoMetainfo):
-            metainfo = self.tdef.get_metainfo()
-            torrentinfo = lt.torrent_info(metainfo)
-
-            atp["ti"] = torrentinfo
+            atp["ti"] = self.tdef.get_torrent_info()
             if resume_data and isinstance(resume_data, dict):
                 # Rewrite save_path as a global path, if it is given as a relative path
                 save_path = (ensure_unicode(resume_data[b"save_path"], 'utf8') if b"save_path" in resume_data
@@ -265,7 +265,7 @@ class Download(TaskManager):
     def on_save_resume_data_alert(self, alert):
         """
         Callback for the alert that contains the resume data of a specific download.
-        This resume data will be written to a file on disk.
+        This resume data will be queued for writing to the checkpoint store.
         """
         self._logger.debug(f'On save resume data alert: {alert}')
         if self.checkpoint_disabled:
@@ -278,21 +278,20 @@ class Download(TaskManager):
             if save_path.exists():
                 resume_data[b'save_path'] = str(save_path.normalize_to(self.state_dir))
 
-        metainfo = {
-            'infohash': self.tdef.get_infohash(),
-            'name': self.tdef.get_name_as_unicode(),
-            'url': self.tdef.get_url()
-        } if isinstance(self.tdef, TorrentDefNoMetainfo) else self.tdef.get_metainfo()
+        # The metainfo only has to be stored again when the TorrentDef has been replaced
+        metainfo = None
+        if self.tdef is not self.checkpointed_tdef:
+            metainfo = {
+                'infohash': self.tdef.get_infohash(),
+                'name': self.tdef.get_name_as_unicode(),
+                'url': self.tdef.get_url()
+            } if isinstance(self.tdef, TorrentDefNoMetainfo) else self.tdef.get_metainfo()
+            self.checkpointed_tdef = self.tdef
 
-        self.config.set_metainfo(metainfo)
         self.config.set_engineresumedata(resume_data)
-
-        # Save it to file
-        basename = hexlify(resume_data[b'info-hash']) + '.conf'
-        filename = self.dlmgr.get_checkpoint_dir() / basename
         self.config.config['download_defaults']['name'] = self.tdef.get_name_as_unicode()  # store name (for debugging)
-        self.config.write(str(filename))
-        self._logger.debug('Saving download config to file %s', filename)
+        self.dlmgr.checkpoint_store.save(self.tdef.get_infohash(), self.config, metainfo, resume_data)
+        self._logger.debug('Queued checkpoint of %s', hexlify(self.tdef.get_infohash()))
 
     def on_tracker_reply_alert(self, alert):
         self.tracker_status[alert.url] = [alert.num_peers, 'Working']
@@ -383,6 +382,9 @@ class Download(TaskManager):
             self.checkpoint_after_next_hashcheck = False
             self.checkpoint()
 
+    def on_piece_finished_alert(self, alert):
+        self.stream.on_piece_finished(alert.piece_index)
+
     @check_handle()
     def on_torrent_finished_alert(self, _):
         self.update_lt_status(self.handle.status())
@@ -637,9 +639,7 @@ class Download(TaskManager):
         if not self.handle or not self.handle.is_valid():
             # Libtorrent hasn't received or initialized this download yet
             # 1. Check if we have data for this infohash already (don't overwrite it if we do!)
-            basename = hexlify(self.tdef.get_infohash()) + '.conf'
-            filename = Path(self.dlmgr.get_checkpoint_dir() / basename)
-            if not filename.is_file():
+            if self.tdef.get_infohash() not in self.dlmgr.checkpoint_store:
                 # 2. If there is no saved data for this infohash, checkpoint it without data so we do not
                 #    lose it when we crash or restart before the download becomes known.
                 resume_data = self.config.get_engineresumedata() or {
@@ -648,8 +648,6 @@ class Download(TaskManager):
                     b'info-hash': self.tdef.get_infohash()
                 }
                 self.post_alert('save_resume_data_alert', dict(resume_data=resume_data))
-            else:
-                self._logger.warning("Either file does not exist or is not file")
             return succeed(None)
         return self.save_resume_data()
 
@@ -741,6 +739,10 @@ class Download(TaskManager):
     def set_piece_deadline(self, piece, deadline, flags=0):
         self.handle.set_piece_deadline(piece, deadline, flags)
 
+    @check_handle(False)
+    def have_piece(self, piece):
+        return self.handle.have_piece(piece)
+
     @check_handle([])
     def get_file_priorities(self):
         return self.handle.file_priorities()
@@ -41,6 +41,30 @@ class DownloadConfig:
         return DownloadConfig(ConfigObj(infile=Path.fix_win_long_file(config_path), file_error=True,
                                         configspec=str(CONFIG_SPEC_PATH), default_encoding='utf-8'))
 
+    @staticmethod
+    def from_checkpoint(settings, metainfo=None, resume_data=None):
+        """
+        Create a DownloadConfig from an entry of the checkpoint store.
+
+        :param settings: the download settings, as returned by get_settings_text
+        :param metainfo: the bencoded metainfo, if any
+        :param resume_data: the bencoded libtorrent resume data, if any
+        """
+        config = DownloadConfig(ConfigObj(infile=settings.splitlines(), configspec=str(CONFIG_SPEC_PATH),
+                                          default_encoding='utf-8'))
+        if metainfo:
+            config.config['state']['metainfo'] = base64.b64encode(metainfo).decode('utf-8')
+        if resume_data:
+            config.config['state']['engineresumedata'] = base64.b64encode(resume_data).decode('utf-8')
+        return config
+
+    def get_settings_text(self):
+        """
+        Serialize the download settings, without the state section, to ConfigObj text.
+        """
+        return '\n'.join(ConfigObj({'download_defaults': self.config['download_defaults']},
+                                   default_encoding='utf-8').write())
+
     def copy(self):
         return DownloadConfig(ConfigObj(self.config, configspec=str(CONFIG_SPEC_PATH), default_encoding='utf-8'),
                               state_dir=self.state_dir)
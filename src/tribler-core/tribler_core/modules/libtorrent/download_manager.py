@@ -6,9 +6,11 @@ Author(s): Egbert Bouman
 import asyncio
 import logging
 import os
+import socket
 import time as timemod
-from asyncio import CancelledError, gather, iscoroutine, shield, sleep, wait_for
+from asyncio import CancelledError, gather, get_event_loop, iscoroutine, shield, sleep, wait_for
 from binascii import unhexlify
+from contextlib import suppress
 from copy import deepcopy
 from distutils.version import LooseVersion
 from shutil import rmtree
@@ -18,9 +20,12 @@ from tribler_common.network_utils import NetworkUtils
 from tribler_common.simpledefs import DLSTATUS_SEEDING, MAX_LIBTORRENT_RATE_LIMIT, STATEDIR_CHECKPOINT_DIR
 from tribler_common.utilities import uri_to_path
 from tribler_core.modules.dht_health_manager import DHTHealthManager
+from tribler_core.modules.libtorrent.checkpoint_store import CHECKPOINT_STORE_FILENAME, CheckpointStore
 from tribler_core.modules.libtorrent.download import Download
 from tribler_core.modules.libtorrent.download_config import DownloadConfig
+from tribler_core.modules.libtorrent.metainfo_cache import METAINFO_CACHE_FILENAME, MetainfoCache
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef, TorrentDefNoMetainfo
+from tribler_core.modules.metrics import default_registry
 from tribler_core.session import Session
 from tribler_core.utilities import path_util, torrent_utils
 from tribler_core.utilities.libtorrent_helper import libtorrent as lt
@@ -30,7 +35,20 @@ from tribler_core.utilities.utilities import bdecode_compat, has_bep33_support,
 from tribler_core.version import version_id
 
 LTSTATE_FILENAME = "lt.state"
-METAINFO_CACHE_PERIOD = 5 * 60
+# Maximum number of hidden downloads that are used for fetching metainfo at the same time
+MAX_CONCURRENT_METAINFO_LOOKUPS = 8
+CHECKPOINT_FLUSH_INTERVAL = 5
+# Alerts are normally processed as soon as libtorrent signals them, polling is only a fallback
+ALERT_POLL_INTERVAL = 5
+# Upper bounds of the buckets of the histogram with the number of alerts per batch
+ALERT_BATCH_BUCKETS = (1, 10, 100, 1000, 10000)
+# Changes to the IP filter of an anonymous session are pushed to libtorrent at most once per this many seconds
+IP_FILTER_UPDATE_INTERVAL = 0.5
+CHECKPOINT_RESTORE_BATCH_SIZE = 100
+RESTORE_PRIORITY_VISIBLE = 0
+RESTORE_PRIORITY_HIDDEN = 1
+RESTORE_PRIORITY_FINISHED = 2
+RESTORE_PRIORITY_STOPPED = 3
 DEFAULT_DHT_ROUTERS = [
     ("dht.libtorrent.org", 25401),
     ("router.bittorrent.com", 6881),
@@ -43,6 +61,31 @@ DEFAULT_LT_EXTENSIONS = [
 ]
 
 
+def infohash_to_bytes(info_hash):
+    """
+    Convert the infohash of a libtorrent alert to bytes, without going through its hexadecimal representation if
+    libtorrent gives us a sha1_hash.
+    """
+    if isinstance(info_hash, lt.sha1_hash):
+        return info_hash.to_bytes()
+    return unhexlify(str(info_hash))
+
+
+def get_restore_priority(config, resume_data):
+    """
+    Determine in which order a download is restored at startup. Downloads the user is waiting for come first,
+    finished and stopped downloads last. Channel and bootstrap downloads are never deferred, since the components
+    that start right after the checkpoints are loaded expect them to exist.
+    """
+    if config.get_channel_download() or config.get_bootstrap_download():
+        return RESTORE_PRIORITY_HIDDEN
+    if config.get_user_stopped():
+        return RESTORE_PRIORITY_STOPPED
+    if resume_data and (resume_data.get(b'finished_time') or resume_data.get(b'seed_mode')):
+        return RESTORE_PRIORITY_FINISHED
+    return RESTORE_PRIORITY_VISIBLE
+
+
 def encode_atp(atp):
     for k, v in atp.items():
         if isinstance(v, str):
@@ -62,6 +105,10 @@ class DownloadManager(TaskManager):
         self.tribler_session = tribler_session
         self.ltsettings = {}  # Stores a copy of the settings dict for each libtorrent session
         self.ltsessions = {}
+        # Hops -> IP filter of the anonymous libtorrent sessions, updated incrementally for hidden seeding
+        self.ip_filters = {}
+        # Number of hops -> loop time at which the IP filter was last pushed to libtorrent
+        self.ip_filter_push_times = {}
         self.dht_health_manager = None
         self.listen_ports = {}
 
@@ -72,24 +119,52 @@ class DownloadManager(TaskManager):
         self.set_download_rate_limit(0)
 
         self.downloads = {}
+        self.checkpoint_store = CheckpointStore(self.get_checkpoint_dir() / CHECKPOINT_STORE_FILENAME)
 
         self.metadata_tmpdir = None
         # Dictionary that maps infohashes to download instances. These include only downloads that have
         # been made specifically for fetching metainfo, and will be removed afterwards.
         self.metainfo_requests = {}
-        self.metainfo_cache = {}  # Dictionary that maps infohashes to cached metainfo items
+        self.metainfo_cache = MetainfoCache(self.tribler_session.config.state_dir / METAINFO_CACHE_FILENAME)
+        # Dictionary that maps infohashes to running lookups, so that concurrent requests share a single lookup
+        self.metainfo_lookups = {}
+        # Dictionary that maps infohashes to the loop time until which the running lookup should keep trying, which is
+        # the deadline of the request that is willing to wait the longest
+        self.metainfo_deadlines = {}
+        self.metainfo_lookup_slots = asyncio.Semaphore(MAX_CONCURRENT_METAINFO_LOOKUPS)
 
         self.default_alert_mask = lt.alert.category_t.error_notification | lt.alert.category_t.status_notification | \
                                   lt.alert.category_t.storage_notification | lt.alert.category_t.performance_warning | \
-                                  lt.alert.category_t.tracker_notification | lt.alert.category_t.debug_notification
+                                  lt.alert.category_t.tracker_notification | lt.alert.category_t.debug_notification | \
+                                  lt.alert.category_t.piece_progress_notification
         self.session_stats_callback = None
         self.state_cb_count = 0
 
         # Status of libtorrent session to indicate if it can safely close and no pending writes to disk exists.
         self.lt_session_shutdown_ready = {}
         self._dht_ready_task = None
+
+        # Socket pairs through which libtorrent signals pending alerts, per hop count
+        self.alert_readers = {}
+        self.alert_writers = {}
+        # Alert class -> (alert type, whether the alert refers to a torrent handle)
+        self.alert_classes = {}
+        self.session_alert_handlers = {'state_update_alert': self.on_state_update_alert,
+                                       'listen_succeeded_alert': self.on_listen_succeeded_alert,
+                                       'peer_disconnected_alert': self.on_peer_disconnected_alert,
+                                       'session_stats_alert': self.on_session_stats_alert,
+                                       'dht_pkt_alert': self.on_dht_pkt_alert}
         self.dht_readiness_timeout = self.config.libtorrent.dht_readiness_timeout if not self.dummy_mode else 0
 
+        self.alerts_processed = default_registry.counter('libtorrent_alerts', 'Number of processed libtorrent alerts')
+        self.alert_batch_size = default_registry.histogram('libtorrent_alert_batch_size',
+                                                           'Number of libtorrent alerts that were pending per batch',
+                                                           buckets=ALERT_BATCH_BUCKETS)
+        self.alert_batch_time = default_registry.histogram('libtorrent_alert_batch_seconds',
+                                                           'Time spent processing a batch of libtorrent alerts')
+        self.num_downloads = default_registry.gauge('downloads', 'Number of downloads')
+        self.num_metainfo_requests = default_registry.gauge('metainfo_requests', 'Number of running metainfo lookups')
+
     async def _check_dht_ready(self, min_dht_peers=60):
         # Checks whether we got enough DHT peers. If the number of DHT peers is low,
         # checking for a bunch of torrents in a short period of time may result in several consecutive requests
@@ -113,21 +188,25 @@ class DownloadManager(TaskManager):
         self.metadata_tmpdir = Path.mkdtemp(suffix='tribler_metainfo_tmpdir')
 
         # Register tasks
-        self.register_task("process_alerts", self._task_process_alerts, interval=1)
+        self.register_task("process_alerts", self._task_process_alerts, interval=ALERT_POLL_INTERVAL)
         if self.dht_readiness_timeout > 0:
             self._dht_ready_task = self.register_task("check_dht_ready", self._check_dht_ready)
         self.register_task("request_torrent_updates", self._request_torrent_updates, interval=1)
-        self.register_task('task_cleanup_metacache', self._task_cleanup_metainfo_cache, interval=60, delay=0)
+        self.register_task('flush_checkpoints', self.checkpoint_store.flush, interval=CHECKPOINT_FLUSH_INTERVAL)
 
         self.set_download_states_callback(self.sesscb_states_callback)
 
     async def shutdown(self, timeout=30):
+        self.cancel_pending_task('resume_deferred_checkpoints')
         if self.downloads:
             self.tribler_session.notify_shutdown_state("Checkpointing Downloads...")
             await gather(*[download.stop() for download in self.downloads.values()], return_exceptions=True)
             self.tribler_session.notify_shutdown_state("Shutting down Downloads...")
             await gather(*[download.shutdown() for download in self.downloads.values()], return_exceptions=True)
 
+        self.cancel_pending_task('flush_checkpoints')
+        await self.checkpoint_store.close()
+
         self.tribler_session.notify_shutdown_state("Shutting down Libtorrent Manager...")
         # If libtorrent session has pending disk io, wait until timeout (default: 30 seconds) to let it finish.
         # In between ask for session stats to check if state is clean for shutdown.
@@ -138,6 +217,8 @@ class DownloadManager(TaskManager):
             await asyncio.sleep(1)
 
         await self.shutdown_task_manager()
+        self.disable_alert_notify()
+        await self.metainfo_cache.close()
 
         if self.dht_health_manager:
             await self.dht_health_manager.shutdown_task_manager()
@@ -219,8 +300,7 @@ class DownloadManager(TaskManager):
             if LooseVersion(self.get_libtorrent_version()) >= LooseVersion("1.1.0"):
                 settings["listen_interfaces"] = "0.0.0.0:%d" % anon_port
 
-            # By default block all IPs except 1.1.1.1 (which is used to ensure libtorrent makes a connection to us)
-            self.update_ip_filter(ltsession, ['1.1.1.1'])
+            ltsession.set_ip_filter(self.get_ip_filter(hops))
 
         self.set_session_settings(ltsession, settings)
         ltsession.set_alert_mask(self.default_alert_mask)
@@ -265,11 +345,47 @@ class DownloadManager(TaskManager):
                 ltsession.add_dht_router(*router)
             ltsession.start_lsd()
 
+        if not self.dummy_mode:
+            self.enable_alert_notify(ltsession, hops)
+
         self._logger.debug("Started libtorrent session for %d hops on port %d", hops, ltsession.listen_port())
         self.lt_session_shutdown_ready[hops] = False
 
         return ltsession
 
+    def enable_alert_notify(self, ltsession, hops):
+        """
+        Let libtorrent wake up the event loop as soon as alerts are pending, so we do not have to wait for the next
+        poll. Libtorrent writes a byte to the given socket whenever its alert queue goes from empty to non-empty.
+        """
+        if not hasattr(ltsession, 'set_alert_fd'):
+            return
+        reader, writer = socket.socketpair()
+        reader.setblocking(False)
+        writer.setblocking(False)
+        ltsession.set_alert_fd(writer.fileno())
+        get_event_loop().add_reader(reader.fileno(), self.on_alert_notify, reader, hops)
+        self.alert_readers[hops] = reader
+        self.alert_writers[hops] = writer
+
+    def on_alert_notify(self, reader, hops):
+        try:
+            while reader.recv(1024):
+                pass
+        except BlockingIOError:
+            pass
+        ltsession = self.ltsessions.get(hops) if self.ltsessions else None
+        if ltsession:
+            self.process_alerts(ltsession, hops)
+
+    def disable_alert_notify(self):
+        for reader in self.alert_readers.values():
+            get_event_loop().remove_reader(reader.fileno())
+            reader.close()
+        self.alert_readers.clear()
+        # The writing ends stay open as long as we hold them, since libtorrent may still write to them until
+        # the sessions are gone.
+
     def has_session(self, hops=0):
         return hops in self.ltsessions
 
@@ -341,20 +457,16 @@ class DownloadManager(TaskManager):
         return 0 if libtorrent_rate == -1 else (-1 if libtorrent_rate == 1 else libtorrent_rate / 1024)
 
     def process_alert(self, alert, hops=0):
-        alert_type = alert.__class__.__name__
-
-        # Periodically, libtorrent will send us a state_update_alert, which contains the torrent status of
-        # all torrents changed since the last time we received this alert.
-        if alert_type == 'state_update_alert':
-            for status in alert.status:
-                infohash = unhexlify(str(status.info_hash))
-                if infohash not in self.downloads:
-                    self._logger.debug("Got state_update for unknown torrent %s", hexlify(infohash))
-                    continue
-                self.downloads[infohash].update_lt_status(status)
-
-        infohash = unhexlify(str(alert.handle.info_hash() if hasattr(alert, 'handle') and alert.handle.is_valid()
-                                 else getattr(alert, 'info_hash', '')))
+        alert_class = alert.__class__
+        alert_info = self.alert_classes.get(alert_class)
+        if alert_info is None:
+            alert_info = self.alert_classes[alert_class] = (alert_class.__name__, hasattr(alert, 'handle'))
+        alert_type, has_handle = alert_info
+
+        if has_handle and alert.handle.is_valid():
+            infohash = infohash_to_bytes(alert.handle.info_hash())
+        else:
+            infohash = infohash_to_bytes(getattr(alert, 'info_hash', ''))
         download = self.downloads.get(infohash)
         if download:
             is_process_alert = (download.handle and download.handle.is_valid()) \
@@ -367,77 +479,175 @@ class DownloadManager(TaskManager):
         elif infohash:
             self._logger.debug("Got alert for unknown download %s: %s", hexlify(infohash), alert)
 
-        if alert_type == 'listen_succeeded_alert':
-            # The ``port`` attribute was added in libtorrent 1.1.14.
-            # Older versions (most notably libtorrent 1.1.13 - the default  on Ubuntu 20.04) do not have this attribute.
-            # We use the now-deprecated ``endpoint`` attribute for these older versions.
-            self.listen_ports[hops] = getattr(alert, "port", alert.endpoint[1])
+        handler = self.session_alert_handlers.get(alert_type)
+        if handler:
+            handler(alert, hops)
 
-        elif alert_type == 'peer_disconnected_alert' and \
-                self.tribler_session and self.tribler_session.payout_manager:
+    def on_state_update_alert(self, alert, _):
+        # Periodically, libtorrent will send us a state_update_alert, which contains the torrent status of
+        # all torrents changed since the last time we received this alert.
+        for status in alert.status:
+            infohash = infohash_to_bytes(status.info_hash)
+            if infohash not in self.downloads:
+                self._logger.debug("Got state_update for unknown torrent %s", hexlify(infohash))
+                continue
+            self.downloads[infohash].update_lt_status(status)
+
+    def on_listen_succeeded_alert(self, alert, hops):
+        # The ``port`` attribute was added in libtorrent 1.1.14.
+        # Older versions (most notably libtorrent 1.1.13 - the default  on Ubuntu 20.04) do not have this attribute.
+        # We use the now-deprecated ``endpoint`` attribute for these older versions.
+        self.listen_ports[hops] = getattr(alert, "port", alert.endpoint[1])
+
+    def on_peer_disconnected_alert(self, alert, _):
+        if self.tribler_session and self.tribler_session.payout_manager:
             self.tribler_session.payout_manager.do_payout(alert.pid.to_bytes())
 
-        elif alert_type == 'session_stats_alert':
-            queued_disk_jobs = alert.values['disk.queued_disk_jobs']
-            queued_write_bytes = alert.values['disk.queued_write_bytes']
-            num_write_jobs = alert.values['disk.num_write_jobs']
+    def on_session_stats_alert(self, alert, hops):
+        queued_disk_jobs = alert.values['disk.queued_disk_jobs']
+        queued_write_bytes = alert.values['disk.queued_write_bytes']
+        num_write_jobs = alert.values['disk.num_write_jobs']
 
-            if queued_disk_jobs == queued_write_bytes == num_write_jobs == 0:
-                self.lt_session_shutdown_ready[hops] = True
+        if queued_disk_jobs == queued_write_bytes == num_write_jobs == 0:
+            self.lt_session_shutdown_ready[hops] = True
 
-            if self.session_stats_callback:
-                self.session_stats_callback(alert)
+        if self.session_stats_callback:
+            self.session_stats_callback(alert)
 
-        elif alert_type == "dht_pkt_alert":
-            # Unfortunately, the Python bindings don't have a direction attribute.
-            # So, we'll have to resort to using the string representation of the alert instead.
-            incoming = str(alert).startswith('<==')
-            decoded = bdecode_compat(alert.pkt_buf)
-            if not decoded:
-                return
+    def on_dht_pkt_alert(self, alert, _):
+        # Unfortunately, the Python bindings don't have a direction attribute.
+        # So, we'll have to resort to using the string representation of the alert instead.
+        incoming = str(alert).startswith('<==')
+        decoded = bdecode_compat(alert.pkt_buf)
+        if not decoded:
+            return
+
+        # We are sending a raw DHT message - notify the DHTHealthManager of the outstanding request.
+        if not incoming and decoded.get(b'y') == b'q' \
+                and decoded.get(b'q') == b'get_peers' and decoded[b'a'].get(b'scrape') == 1:
+            self.dht_health_manager.requesting_bloomfilters(decoded[b't'],
+                                                            decoded[b'a'][b'info_hash'])
 
-            # We are sending a raw DHT message - notify the DHTHealthManager of the outstanding request.
-            if not incoming and decoded.get(b'y') == b'q' \
-                    and decoded.get(b'q') == b'get_peers' and decoded[b'a'].get(b'scrape') == 1:
-                self.dht_health_manager.requesting_bloomfilters(decoded[b't'],
-                                                                decoded[b'a'][b'info_hash'])
+        # We received a raw DHT message - decode it and check whether it is a BEP33 message.
+        if incoming and b'r' in decoded and b'BFsd' in decoded[b'r'] and b'BFpe' in decoded[b'r']:
+            self.dht_health_manager.received_bloomfilters(decoded[b't'],
+                                                          bytearray(decoded[b'r'][b'BFsd']),
+                                                          bytearray(decoded[b'r'][b'BFpe']))
 
-            # We received a raw DHT message - decode it and check whether it is a BEP33 message.
-            if incoming and b'r' in decoded and b'BFsd' in decoded[b'r'] and b'BFpe' in decoded[b'r']:
-                self.dht_health_manager.received_bloomfilters(decoded[b't'],
-                                                              bytearray(decoded[b'r'][b'BFsd']),
-                                                              bytearray(decoded[b'r'][b'BFpe']))
+    def get_ip_filter(self, hops):
+        """
+        Get the IP filter of the anonymous session with the given number of hops.
+        """
+        ip_filter = self.ip_filters.get(hops)
+        if ip_filter is None:
+            # By default block all IPs except 1.1.1.1 (which is used to ensure libtorrent makes a connection to us)
+            ip_filter = self.ip_filters[hops] = lt.ip_filter()
+            ip_filter.add_rule('0.0.0.0', '255.255.255.255', 1)
+            ip_filter.add_rule('1.1.1.1', '1.1.1.1', 0)
+        return ip_filter
+
+    def allow_ip(self, hops, ip):
+        """
+        Allow connections from the given IP in the anonymous session with the given number of hops.
+        """
+        self.get_ip_filter(hops).add_rule(ip, ip, 0)
+        self.schedule_ip_filter_update(hops)
+
+    def block_ip(self, hops, ip):
+        """
+        Block connections from the given IP in the anonymous session with the given number of hops.
+        """
+        self.get_ip_filter(hops).add_rule(ip, ip, 1)
+        self.schedule_ip_filter_update(hops)
+
+    def schedule_ip_filter_update(self, hops):
+        """
+        Push the IP filter to libtorrent right away, unless it was pushed less than IP_FILTER_UPDATE_INTERVAL seconds
+        ago. In that case, the changes are pushed together at the end of the interval.
+        """
+        name = f'update_ip_filter_{hops}'
+        if self.is_pending_task_active(name):
+            return
+        last_push = self.ip_filter_push_times.get(hops)
+        delay = last_push + IP_FILTER_UPDATE_INTERVAL - get_event_loop().time() if last_push is not None else 0
+        if delay > 0:
+            self.register_task(name, self.apply_ip_filter, hops, delay=delay)
+        else:
+            self.apply_ip_filter(hops)
 
-    def update_ip_filter(self, lt_session, ip_addresses):
-        self._logger.debug('Updating IP filter %s', ip_addresses)
-        ip_filter = lt.ip_filter()
-        ip_filter.add_rule('0.0.0.0', '255.255.255.255', 1)
-        for ip in ip_addresses:
-            ip_filter.add_rule(ip, ip, 0)
-        lt_session.set_ip_filter(ip_filter)
+    def apply_ip_filter(self, hops):
+        ltsession = self.ltsessions.get(hops) if self.ltsessions else None
+        if ltsession:
+            self._logger.debug('Updating IP filter of the session with %d hop(s)', hops)
+            ltsession.set_ip_filter(self.ip_filters[hops])
+            self.ip_filter_push_times[hops] = get_event_loop().time()
 
-    async def get_metainfo(self, infohash, timeout=30, hops=None, url=None):
+    async def get_metainfo(self, infohash, timeout=30, hops=None, url=None, use_cache=True, retry_failed=False):
         """
         Lookup metainfo for a given infohash. The mechanism works by joining the swarm for the infohash connecting
         to a few peers, and downloading the metadata for the torrent.
         :param infohash: The (binary) infohash to lookup metainfo for.
-        :param timeout: A timeout in seconds.
+        :param timeout: A timeout in seconds, which includes the time spent waiting for other lookups to finish.
         :param hops: the number of tunnel hops to use for this lookup. If None, use config default.
         :param url: Optional URL. Can contain trackers info, etc.
+        :param use_cache: whether previously retrieved metainfo may be returned.
+        :param retry_failed: whether to look up the metainfo even if an earlier lookup failed recently.
         :return: The metainfo
         """
         infohash_hex = hexlify(infohash)
-        if infohash in self.metainfo_cache:
-            self._logger.info('Returning metainfo from cache for %s', infohash_hex)
-            return self.metainfo_cache[infohash]['meta_info']
-
-        self._logger.info('Trying to fetch metainfo for %s', infohash_hex)
-        if infohash in self.metainfo_requests:
-            download = self.metainfo_requests[infohash][0]
-            self.metainfo_requests[infohash][1] += 1
-        elif infohash in self.downloads:
-            download = self.downloads[infohash]
+        if use_cache:
+            metainfo = await self.metainfo_cache.lookup(infohash)
+            if metainfo is not None:
+                self._logger.info('Returning metainfo from cache for %s', infohash_hex)
+                return metainfo
+
+        lookup = self.metainfo_lookups.get(infohash)
+        if lookup is None:
+            if not retry_failed:
+                backoff = await self.metainfo_cache.get_backoff(infohash)
+                if backoff:
+                    self._logger.info('Not fetching metainfo for %s, retrying in %d seconds', infohash_hex, backoff)
+                    return None
+            # Another request may have started the lookup while we were checking the cache
+            lookup = self.metainfo_lookups.get(infohash)
+
+        deadline = get_event_loop().time() + timeout
+        if lookup is None:
+            self.metainfo_deadlines[infohash] = deadline
+            lookup = self.register_anonymous_task('metainfo_lookup', self._lookup_metainfo, infohash, hops, url)
+            self.metainfo_lookups[infohash] = lookup
+            lookup.add_done_callback(lambda _: self._on_metainfo_lookup_done(infohash))
         else:
+            self.metainfo_deadlines[infohash] = max(self.metainfo_deadlines[infohash], deadline)
+
+        try:
+            return await wait_for(shield(lookup), timeout)
+        except asyncio.TimeoutError:
+            self._logger.info('Gave up waiting for the metainfo of %s', infohash_hex)
+            return None
+
+    def _on_metainfo_lookup_done(self, infohash):
+        self.metainfo_lookups.pop(infohash, None)
+        self.metainfo_deadlines.pop(infohash, None)
+
+    def _get_metainfo_time_left(self, infohash):
+        return self.metainfo_deadlines.get(infohash, 0) - get_event_loop().time()
+
+    async def _lookup_metainfo(self, infohash, hops, url):
+        download = self.downloads.get(infohash)
+        if download is not None:
+            return await self._wait_for_metainfo(download, infohash)
+
+        # Every lookup joins a swarm, so limit the number of lookups that run at the same time
+        async with self.metainfo_lookup_slots:
+            if self._get_metainfo_time_left(infohash) <= 0:
+                # All requests gave up while we were waiting for the other lookups
+                return None
+            self._logger.info('Trying to fetch metainfo for %s', hexlify(infohash))
+            download = self.downloads.get(infohash)
+            if download is not None:
+                return await self._wait_for_metainfo(download, infohash)
+
             tdef = TorrentDefNoMetainfo(infohash, 'metainfo request', url=url)
             dcfg = DownloadConfig()
             dcfg.set_hops(hops or self.config.download_defaults.number_hops)
@@ -446,33 +656,40 @@ class DownloadManager(TaskManager):
             try:
                 download = self.start_download(tdef=tdef, config=dcfg, hidden=True, checkpoint_disabled=True)
             except TypeError:
-                return
+                return None
             self.metainfo_requests[infohash] = [download, 1]
 
+            try:
+                return await self._wait_for_metainfo(download, infohash)
+            finally:
+                # The request may have been taken over by a regular download in the meantime
+                if self.metainfo_requests.get(infohash, [None])[0] is download:
+                    self.metainfo_requests.pop(infohash)
+                    await self.remove_download(download, remove_content=True)
+
+    async def _wait_for_metainfo(self, download, infohash):
+        infohash_hex = hexlify(infohash)
+        metainfo = download.tdef.get_metainfo()
         try:
-            metainfo = download.tdef.get_metainfo() or await wait_for(shield(download.future_metainfo), timeout)
-            self._logger.info('Successfully retrieved metainfo for %s', infohash_hex)
-            self.metainfo_cache[infohash] = {'time': timemod.time(), 'meta_info': metainfo}
-        except (CancelledError, asyncio.TimeoutError):
-            metainfo = None
+            # Requests that join the lookup while we are waiting may extend its deadline
+            while metainfo is None:
+                time_left = self._get_metainfo_time_left(infohash)
+                if time_left <= 0:
+                    raise asyncio.TimeoutError()
+                with suppress(asyncio.TimeoutError):
+                    metainfo = await wait_for(shield(download.future_metainfo), time_left)
+        except asyncio.TimeoutError:
             self._logger.info('Failed to retrieve metainfo for %s', infohash_hex)
-
-        if infohash in self.metainfo_requests:
-            self.metainfo_requests[infohash][1] -= 1
-            if self.metainfo_requests[infohash][1] <= 0:
-                await self.remove_download(download, remove_content=True)
-                self.metainfo_requests.pop(infohash)
-
+            await self.metainfo_cache.add_failure(infohash)
+            return None
+        except CancelledError:
+            self._logger.info('Metainfo request for %s was cancelled', infohash_hex)
+            return None
+
+        self._logger.info('Successfully retrieved metainfo for %s', infohash_hex)
+        await self.metainfo_cache.store(infohash, metainfo)
         return metainfo
 
-    def _task_cleanup_metainfo_cache(self):
-        oldest_time = timemod.time() - METAINFO_CACHE_PERIOD
-
-        for info_hash, cache_entry in list(self.metainfo_cache.items()):
-            last_time = cache_entry['time']
-            if last_time < oldest_time:
-                del self.metainfo_cache[info_hash]
-
     def _request_torrent_updates(self):
         for ltsession in self.ltsessions.values():
             if ltsession:
@@ -485,8 +702,17 @@ class DownloadManager(TaskManager):
     def _task_process_alerts(self):
         for hops, ltsession in list(self.ltsessions.items()):
             if ltsession:
-                for alert in ltsession.pop_alerts():
-                    self.process_alert(alert, hops=hops)
+                self.process_alerts(ltsession, hops)
+
+    def process_alerts(self, ltsession, hops):
+        with self.alert_batch_time.time():
+            alerts = ltsession.pop_alerts()
+            for alert in alerts:
+                self.process_alert(alert, hops=hops)
+        self.alert_batch_size.observe(len(alerts))
+        self.alerts_processed.inc(len(alerts))
+        self.num_downloads.set(len(self.downloads))
+        self.num_metainfo_requests.set(len(self.metainfo_requests))
 
     def _map_call_on_ltsessions(self, hops, funcname, *args, **kwargs):
         if hops is None:
@@ -503,8 +729,9 @@ class DownloadManager(TaskManager):
             name, infohash, _ = parse_magnetlink(uri)
             if infohash is None:
                 raise RuntimeError("Missing infohash")
-            if infohash in self.metainfo_cache:
-                tdef = TorrentDef.load_from_dict(self.metainfo_cache[infohash]['meta_info'])
+            metainfo = self.metainfo_cache.get(infohash)
+            if metainfo is not None:
+                tdef = TorrentDef.load_from_dict(metainfo)
             else:
                 tdef = TorrentDefNoMetainfo(infohash, "Unknown name" if name is None else name, url=uri)
             return self.start_download(tdef=tdef, config=config)
@@ -790,58 +1017,135 @@ class DownloadManager(TaskManager):
                 self.tribler_session.tunnel_community.monitor_downloads(states_list)
 
     async def load_checkpoints(self):
-        for filename in self.get_checkpoint_dir().glob('*.conf'):
+        """
+        Restore the downloads from the checkpoint store.
+
+        The checkpoints are decoded in batches on worker threads. Active downloads, and all channel and bootstrap
+        downloads, are started before this method returns, while the other finished and stopped downloads are restored
+        in the background afterwards.
+        """
+        rows = await self.checkpoint_store.load_all()
+        batch_size = CHECKPOINT_RESTORE_BATCH_SIZE
+        batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+        loop = get_event_loop()
+        decoded = await gather(*[loop.run_in_executor(None, self.decode_checkpoints, batch) for batch in batches])
+        checkpoints = sorted((checkpoint for batch in decoded for checkpoint in batch), key=lambda c: c[0])
+
+        active = [checkpoint for checkpoint in checkpoints if checkpoint[0] < RESTORE_PRIORITY_FINISHED]
+        deferred = checkpoints[len(active):]
+        self._logger.info("Restoring %d active downloads, deferring %d finished or stopped downloads",
+                          len(active), len(deferred))
+        await self.resume_checkpoints(active)
+        if deferred:
+            self.register_task('resume_deferred_checkpoints', self.resume_checkpoints, deferred)
+
+        # Legacy .conf checkpoints are imported into the checkpoint store and removed afterwards
+        conf_files = list(self.get_checkpoint_dir().glob('*.conf'))
+        for filename in conf_files:
             self.load_checkpoint(filename)
-            await sleep(.01)
+        if conf_files:
+            if not await self.checkpoint_store.flush():
+                self._logger.warning("Could not import the legacy checkpoints, keeping the .conf files")
+                return
+            for filename in conf_files:
+                try:
+                    infohash = unhexlify(filename.stem)
+                except ValueError:
+                    continue
+                if self.checkpoint_store.is_stored(infohash):
+                    self._logger.info("Imported checkpoint %s into the checkpoint store", filename)
+                    os.remove(filename)
+
+    def decode_checkpoints(self, rows):
+        """
+        Decode rows of the checkpoint store. This method does not touch any shared state and runs on a worker thread.
+
+        :param rows: a list of (infohash, settings, metainfo, resume_data) tuples
+        :return: a list of (priority, source, config, tdef) tuples
+        """
+        checkpoints = []
+        for infohash, settings, metainfo, resume_data in rows:
+            source = hexlify(infohash)
+            try:
+                config = DownloadConfig.from_checkpoint(settings, resume_data=resume_data)
+                metainfo = bdecode_compat(metainfo) if metainfo else None
+                resume_data = bdecode_compat(resume_data) if resume_data else None
+            except Exception:
+                self._logger.exception("Could not decode checkpoint %s", source)
+                continue
+            tdef = self.create_tdef(metainfo, source)
+            if tdef is not None:
+                checkpoints.append((get_restore_priority(config, resume_data), source, config, tdef))
+        return checkpoints
+
+    async def resume_checkpoints(self, checkpoints):
+        """
+        Start the downloads of decoded checkpoints, yielding to the event loop after every batch.
+        """
+        for index, (_, source, config, tdef) in enumerate(checkpoints, 1):
+            download = self.resume_checkpoint(config, tdef, source)
+            if download:
+                # The stored metainfo is still up to date, so there is no need to write it again
+                download.checkpointed_tdef = tdef
+            if index % CHECKPOINT_RESTORE_BATCH_SIZE == 0:
+                await sleep(0)
 
     def load_checkpoint(self, filename):
+        """
+        Load a download from a legacy .conf checkpoint file.
+        """
         try:
             config = DownloadConfig.load(filename)
         except Exception:
             self._logger.exception("Could not open checkpoint file %s", filename)
-            return
+            return None
+        tdef = self.create_tdef(config.get_metainfo(), filename)
+        return self.resume_checkpoint(config, tdef, filename) if tdef else None
 
-        metainfo = config.get_metainfo()
+    def create_tdef(self, metainfo, source):
         if not metainfo:
-            self._logger.error("Could not resume checkpoint %s; metainfo not found", filename)
-            return
+            self._logger.error("Could not resume checkpoint %s; metainfo not found", source)
+            return None
         if not isinstance(metainfo, dict):
             self._logger.error("Could not resume checkpoint %s; metainfo is not dict %s %s",
-                               filename, type(metainfo), repr(metainfo))
-            return
+                               source, type(metainfo), repr(metainfo))
+            return None
 
         try:
             url = metainfo.get(b'url', None)
             url = url.decode('utf-8') if url else url
-            tdef = (TorrentDefNoMetainfo(metainfo[b'infohash'], metainfo[b'name'], url)
+            return (TorrentDefNoMetainfo(metainfo[b'infohash'], metainfo[b'name'], url)
                     if b'infohash' in metainfo else TorrentDef.load_from_dict(metainfo))
         except (KeyError, ValueError) as e:
             self._logger.exception("Could not restore tdef from metainfo dict: %s %s ", e, metainfo)
-            return
+            return None
 
+    def resume_checkpoint(self, config, tdef, source):
         if config.get_bootstrap_download():
             infohash = self.config.bootstrap.infohash
             if hexlify(tdef.get_infohash()) != infohash:
                 self.remove_config(tdef.get_infohash())
-                return
+                return None
 
         config.state_dir = self.tribler_session.config.state_dir
         if config.get_dest_dir() == '':  # removed torrent ignoring
-            self._logger.info("Removing checkpoint %s destdir is %s", filename, config.get_dest_dir())
-            os.remove(filename)
-            return
+            self._logger.info("Removing checkpoint %s destdir is %s", source, config.get_dest_dir())
+            self.remove_config(tdef.get_infohash())
+            return None
 
         try:
             if self.download_exists(tdef.get_infohash()):
                 self._logger.info("Not resuming checkpoint because download has already been added")
             else:
-                self.start_download(tdef=tdef, config=config)
+                return self.start_download(tdef=tdef, config=config)
         except Exception:
             self._logger.exception("Not resume checkpoint due to exception while adding download")
+        return None
 
     def remove_config(self, infohash):
         if infohash not in self.downloads:
             try:
+                self.checkpoint_store.remove(infohash)
                 basename = hexlify(infohash) + '.conf'
                 filename = self.get_checkpoint_dir() / basename
                 self._logger.debug("Removing download checkpoint %s", filename)
@@ -146,6 +146,13 @@ class DownloadState:
         seeds = self.lt_status.list_seeds
         return seeds, total - seeds
 
+    def get_num_connected_peers(self):
+        """
+        Returns the number of peers we are connected to, without building the peer list.
+        @return The number of connected peers
+        """
+        return self.lt_status.num_peers if self.lt_status else 0
+
     def get_pieces_complete(self):
         """ Returns a list of booleans indicating whether we have completely
         received that piece of the content. The list of pieces for which
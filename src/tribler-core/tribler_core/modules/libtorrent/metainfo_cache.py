@@ -0,0 +1,208 @@
+"""
+A size-bounded cache for metainfo lookups, backed by a SQLite file.
+"""
+import logging
+import sqlite3
+import time
+from asyncio import get_event_loop
+from collections import OrderedDict
+from threading import Lock
+
+from tribler_core.utilities.libtorrent_helper import libtorrent as lt
+from tribler_core.utilities.path_util import Path
+from tribler_core.utilities.utilities import bdecode_compat
+
+METAINFO_CACHE_FILENAME = 'metainfo_cache.db'
+# Maximum number of bytes of bencoded metainfo that is kept in memory
+MAX_MEMORY_CACHE_SIZE = 32 * 1024 * 1024
+# Maximum number of metainfo entries that is kept on disk
+MAX_STORED_METAINFO = 5000
+# A failed lookup is not retried for FAILURE_BACKOFF_BASE * 2 ^ (failures - 1) seconds, up to FAILURE_BACKOFF_MAX
+FAILURE_BACKOFF_BASE = 60
+FAILURE_BACKOFF_MAX = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metainfo (
+    infohash BLOB PRIMARY KEY,
+    metainfo BLOB NOT NULL,
+    added REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metainfo_added ON metainfo (added);
+CREATE TABLE IF NOT EXISTS failure (
+    infohash BLOB PRIMARY KEY,
+    failures INTEGER NOT NULL,
+    retry_after REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def get_failure_backoff(failures):
+    return min(FAILURE_BACKOFF_BASE * 2 ** (failures - 1), FAILURE_BACKOFF_MAX)
+
+
+class MetainfoCache:
+    """
+    Remembers the outcome of metainfo lookups.
+
+    Resolved metainfo is kept in an in-memory LRU that is bounded by the bencoded size of the metainfo, and in a
+    SQLite file that is bounded by the number of entries. Failed lookups are stored as well, so that a lookup that
+    keeps timing out is retried with an exponential backoff instead of joining the swarm over and over again.
+    All disk I/O happens on a worker thread.
+    """
+
+    def __init__(self, db_path, max_memory_size=MAX_MEMORY_CACHE_SIZE, max_stored=MAX_STORED_METAINFO):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.db_path = Path(db_path)
+        self.max_memory_size = max_memory_size
+        self.max_stored = max_stored
+        self.memory_size = 0
+        self._connection = None
+        self._lock = Lock()
+        # infohash -> (metainfo, bencoded size), least recently used first
+        self._entries = OrderedDict()
+        # infohash -> (failures, retry_after), loaded from disk when the database is opened
+        self._failures = None
+
+    def _connect(self):
+        if self._connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute("PRAGMA synchronous = NORMAL")
+            self._connection.executescript(SCHEMA)
+            with self._connection:
+                # Failures that have expired a long time ago are no longer relevant for the backoff
+                self._connection.execute("DELETE FROM failure WHERE retry_after < ?",
+                                         (time.time() - FAILURE_BACKOFF_MAX,))
+            self._failures = {infohash: (failures, retry_after) for infohash, failures, retry_after
+                              in self._connection.execute("SELECT infohash, failures, retry_after FROM failure")}
+        return self._connection
+
+    async def _run(self, func, *args):
+        return await get_event_loop().run_in_executor(None, func, *args)
+
+    def __contains__(self, infohash):
+        return infohash in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, infohash):
+        """
+        Get the metainfo for the given infohash from memory.
+
+        :return: the metainfo dictionary, or None if it is not in memory.
+        """
+        entry = self._entries.get(infohash)
+        if entry is None:
+            return None
+        self._entries.move_to_end(infohash)
+        return entry[0]
+
+    def put(self, infohash, metainfo, size=None):
+        """
+        Add metainfo to the in-memory LRU, evicting the least recently used entries if needed.
+        """
+        if size is None:
+            size = len(lt.bencode(metainfo))
+        self._discard(infohash)
+        if size > self.max_memory_size:
+            return
+        self._entries[infohash] = (metainfo, size)
+        self.memory_size += size
+        while self.memory_size > self.max_memory_size:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.memory_size -= evicted_size
+
+    def _discard(self, infohash):
+        entry = self._entries.pop(infohash, None)
+        if entry is not None:
+            self.memory_size -= entry[1]
+
+    def _read(self, infohash):
+        with self._lock:
+            row = self._connect().execute("SELECT metainfo FROM metainfo WHERE infohash = ?", (infohash,)).fetchone()
+        return row[0] if row else None
+
+    async def lookup(self, infohash):
+        """
+        Get the metainfo for the given infohash, from memory or from disk.
+
+        :return: the metainfo dictionary, or None if it is not cached.
+        """
+        metainfo = self.get(infohash)
+        if metainfo is not None:
+            return metainfo
+        try:
+            encoded = await self._run(self._read, infohash)
+        except sqlite3.Error:
+            self._logger.exception("Could not read cached metainfo")
+            return None
+        metainfo = bdecode_compat(encoded) if encoded else None
+        if metainfo is not None:
+            self.put(infohash, metainfo, len(encoded))
+        return metainfo
+
+    def _write(self, infohash, encoded):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO metainfo VALUES (?, ?, ?)", (infohash, encoded, time.time()))
+                connection.execute("DELETE FROM failure WHERE infohash = ?", (infohash,))
+                connection.execute("DELETE FROM metainfo WHERE infohash IN "
+                                   "(SELECT infohash FROM metainfo ORDER BY added DESC LIMIT -1 OFFSET ?)",
+                                   (self.max_stored,))
+            self._failures.pop(infohash, None)
+
+    async def store(self, infohash, metainfo):
+        """
+        Cache the result of a successful lookup, both in memory and on disk.
+        """
+        encoded = lt.bencode(metainfo)
+        self.put(infohash, metainfo, len(encoded))
+        try:
+            await self._run(self._write, infohash, encoded)
+        except sqlite3.Error:
+            self._logger.exception("Could not store metainfo")
+
+    def _write_failure(self, infohash):
+        with self._lock:
+            connection = self._connect()
+            failures = self._failures.get(infohash, (0, 0))[0] + 1
+            retry_after = time.time() + get_failure_backoff(failures)
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO failure VALUES (?, ?, ?)",
+                                   (infohash, failures, retry_after))
+            self._failures[infohash] = (failures, retry_after)
+
+    async def add_failure(self, infohash):
+        """
+        Record a failed lookup for the given infohash, which doubles the time until the next lookup is allowed.
+        """
+        try:
+            await self._run(self._write_failure, infohash)
+        except sqlite3.Error:
+            self._logger.exception("Could not store metainfo lookup failure")
+
+    async def get_backoff(self, infohash):
+        """
+        :return: the number of seconds until the metainfo for the given infohash may be looked up again.
+        """
+        if self._failures is None:
+            try:
+                await self._run(self._connect_locked)
+            except sqlite3.Error:
+                self._logger.exception("Could not open the metainfo cache")
+                return 0
+        failure = self._failures.get(infohash)
+        return max(0, failure[1] - time.time()) if failure else 0
+
+    def _connect_locked(self):
+        with self._lock:
+            self._connect()
+
+    async def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -396,6 +396,9 @@ async def test_stream_download(enable_api, mock_dlmgr, mock_handle, test_downloa
     stream.seek = lambda _: succeed(None)
     stream.iterpieces = lambda *_, **__: [1]
     stream.prebuffsize = 0
+    stream.readaheadsize = 0
+    stream.wait_for_piece = lambda _: succeed(True)
+    stream.availablebytes = lambda *_: 500
     stream.lastpiece = 1
     stream.bytetopiece = lambda _: 1
     stream.pieceshave = [1, 2]
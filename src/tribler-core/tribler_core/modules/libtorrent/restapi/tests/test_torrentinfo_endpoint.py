@@ -13,7 +13,13 @@ import pytest
 
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef
 from tribler_core.restapi.base_api_test import do_request
-from tribler_core.tests.tools.common import TESTS_DATA_DIR, TESTS_DIR, TORRENT_UBUNTU_FILE, UBUNTU_1504_INFOHASH
+from tribler_core.tests.tools.common import (
+    TESTS_DATA_DIR,
+    TESTS_DIR,
+    TORRENT_UBUNTU_FILE,
+    TORRENT_VIDEO_FILE,
+    UBUNTU_1504_INFOHASH,
+)
 from tribler_core.utilities.unicode import hexlify
 
 SAMPLE_CHANNEL_FILES_DIR = TESTS_DIR / "data" / "sample_channel"
@@ -62,7 +68,7 @@ async def test_get_torrentinfo(enable_chant, enable_api, mock_dlmgr, tmpdir, fil
 
     hops_list = []
 
-    def get_metainfo(infohash, timeout=20, hops=None, url=None):
+    def get_metainfo(infohash, timeout=20, hops=None, url=None, **_):
         if hops is not None:
             hops_list.append(hops)
         with open(TESTS_DATA_DIR / "ubuntu-15.04-desktop-amd64.iso.torrent", mode='rb') as torrent_file:
@@ -132,3 +138,55 @@ async def test_on_got_invalid_metainfo(enable_api, mock_dlmgr, session):
 
     res = await do_request(session, f'torrentinfo?uri={path}', expected_code=500)
     assert "error" in res
+
+
+@pytest.mark.asyncio
+async def test_get_torrentinfo_fields(enable_chant, enable_api, mock_dlmgr, session):
+    """
+    Test whether only the requested fields are returned, with a pageable file list
+    """
+    session.dlmgr.downloads = {}
+    session.dlmgr.metainfo_requests = {}
+    session.dlmgr.shutdown = lambda: succeed(None)
+    tdef = TorrentDef.load(TORRENT_VIDEO_FILE)
+    path = "file:" + urllib.request.pathname2url(str(TORRENT_VIDEO_FILE))
+
+    result = await do_request(session, f'torrentinfo?uri={path}&fields=name,size', expected_code=200)
+    assert result == {'name': tdef.get_name_as_unicode(), 'size': tdef.get_length(), 'download_exists': False}
+
+    result = await do_request(session, f'torrentinfo?uri={path}&fields=infohash,files,trackers', expected_code=200)
+    assert result['infohash'] == hexlify(tdef.get_infohash())
+    assert result['num_files'] == len(tdef.get_files())
+    assert [(file['name'], file['size']) for file in result['files']] == \
+           [(str(name), size) for name, size in tdef.get_files_with_length()]
+    assert result['trackers'] == [tracker.decode() for tracker in tdef.get_trackers_as_single_tuple()]
+
+    result = await do_request(session, f'torrentinfo?uri={path}&fields=files&files_offset=1&files_limit=1',
+                              expected_code=200)
+    assert result['num_files'] == len(tdef.get_files())
+    assert [file['index'] for file in result['files']] == [1]
+
+    await do_request(session, f'torrentinfo?uri={path}&fields=pieces', expected_code=400)
+    await do_request(session, f'torrentinfo?uri={path}&fields=files&files_limit=-1', expected_code=400)
+    await do_request(session, f'torrentinfo?uri={path}&fields=files&files_offset=a', expected_code=400)
+
+
+@pytest.mark.asyncio
+async def test_get_torrentinfo_cached(enable_chant, enable_api, mock_dlmgr, session):
+    """
+    Test whether the decoded torrent is reused for subsequent requests for the same magnet link
+    """
+    session.dlmgr.downloads = {}
+    session.dlmgr.metainfo_requests = {}
+    session.dlmgr.shutdown = lambda: succeed(None)
+    metainfo = TorrentDef.load(TORRENT_UBUNTU_FILE).get_metainfo()
+    session.dlmgr.get_metainfo = Mock(return_value=succeed(metainfo))
+    path = quote_plus(f'magnet:?xt=urn:btih:{hexlify(UBUNTU_1504_INFOHASH)}&dn=test torrent')
+
+    await do_request(session, f'torrentinfo?uri={path}&fields=files&files_limit=1', expected_code=200)
+    await do_request(session, f'torrentinfo?uri={path}&fields=files&files_offset=1', expected_code=200)
+    assert session.dlmgr.get_metainfo.call_count == 1
+
+    # Looking up the metainfo through a different number of hops is a different request
+    await do_request(session, f'torrentinfo?uri={path}&hops=1', expected_code=200)
+    assert session.dlmgr.get_metainfo.call_count == 2
@@ -1,6 +1,6 @@
-import hashlib
 import json
-from copy import deepcopy
+from asyncio import get_event_loop
+from collections import OrderedDict
 
 from aiohttp import ClientResponseError, ClientSession, ServerConnectionError, web
 
@@ -8,41 +8,146 @@ from aiohttp_apispec import docs
 
 from ipv8.REST.schema import schema
 
-from marshmallow.fields import String
+from marshmallow.fields import Boolean, Integer, List, String
 
 from tribler_common.utilities import uri_to_path
 
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef
 from tribler_core.modules.metadata_store.orm_bindings.torrent_metadata import tdef_to_metadata_dict
 from tribler_core.restapi.rest_endpoint import HTTP_BAD_REQUEST, HTTP_INTERNAL_SERVER_ERROR, RESTEndpoint, RESTResponse
-from tribler_core.utilities.libtorrent_helper import libtorrent as lt
-from tribler_core.utilities.unicode import hexlify, recursive_unicode
+from tribler_core.utilities.path_util import Path
+from tribler_core.utilities.unicode import ensure_unicode, hexlify, recursive_unicode
 from tribler_core.utilities.utilities import bdecode_compat, parse_magnetlink
 
+# Number of decoded torrents that is kept around, so that paging through the files of a torrent is cheap
+TORRENT_DEF_CACHE_SIZE = 8
+# Fields that can be requested with the 'fields' parameter
+TORRENT_INFO_FIELDS = ('infohash', 'name', 'size', 'files', 'trackers')
+
+
+def encode_metainfo(metainfo):
+    """
+    Encode the full metainfo as a hex-encoded JSON string, for the legacy response.
+    """
+    # Only the info dictionary is modified, so copying the top-level dictionaries suffices
+    encoded_metainfo = dict(metainfo)
+    encoded_metainfo[b'info'] = info = dict(metainfo[b'info'])
+    # FIXME: json.dumps garbles binary data that is used by the 'pieces' field
+    # However, this is fine as long as the GUI does not use this field.
+    if b'pieces' in info:
+        info[b'pieces'] = hexlify(info[b'pieces']).encode('utf-8')
+    return hexlify(json.dumps(recursive_unicode(encoded_metainfo, ignore_errors=True), ensure_ascii=False)
+                   .encode('utf-8'))
+
+
+def get_torrent_info_fields(tdef, fields, files_offset=0, files_limit=None):
+    """
+    Get the requested fields of a torrent, with the file list limited to the given page.
+    """
+    result = {}
+    if 'infohash' in fields:
+        result['infohash'] = hexlify(tdef.get_infohash())
+    if 'name' in fields:
+        result['name'] = tdef.get_name_as_unicode()
+    if 'size' in fields:
+        result['size'] = tdef.get_length()
+    if 'files' in fields:
+        file_table = tdef.get_file_table()
+        files_end = len(file_table) if files_limit is None else files_offset + files_limit
+        result['num_files'] = len(file_table)
+        result['files'] = [{"index": index, "name": str(Path(file_table.names[index])),
+                            "size": file_table.lengths[index]}
+                           for index in range(files_offset, min(files_end, len(file_table)))
+                           if file_table.names[index] is not None]
+    if 'trackers' in fields:
+        result['trackers'] = [ensure_unicode(tracker, 'utf-8', errors='ignore')
+                              for tracker in tdef.get_trackers_as_single_tuple()]
+    return result
+
 
 class TorrentInfoEndpoint(RESTEndpoint):
     """
     This endpoint is responsible for handing all requests regarding torrent info in Tribler.
     """
 
+    def __init__(self, session):
+        super().__init__(session)
+        # Cache key -> TorrentDef, least recently used first
+        self.torrent_defs = OrderedDict()
+
     def setup_routes(self):
         self.app.add_routes([web.get('', self.get_torrent_info)])
 
+    @staticmethod
+    def get_cache_key(uri, hops):
+        """
+        Get the key under which the decoded torrent for an URI is cached. Torrent files are cached for as long as
+        they are not modified.
+        """
+        if not uri.startswith('file:'):
+            return uri, hops
+        try:
+            stat = uri_to_path(uri).stat()
+        except (OSError, ValueError):
+            return None
+        return uri, stat.st_mtime_ns, stat.st_size
+
+    def cache_torrent_def(self, key, tdef):
+        if key is None:
+            return
+        self.torrent_defs[key] = tdef
+        self.torrent_defs.move_to_end(key)
+        while len(self.torrent_defs) > TORRENT_DEF_CACHE_SIZE:
+            self.torrent_defs.popitem(last=False)
+
+    def add_to_gigachannel(self, tdef):
+        # Add the torrent to GigaChannel as a free-for-all entry, so others can search it
+        self.session.mds.TorrentMetadata.add_ffa_from_dict(tdef_to_metadata_dict(tdef))
+
     @docs(
         tags=["Libtorrent"],
         summary="Return metainfo from a torrent found at a provided URI.",
         parameters=[{
             'in': 'query',
-            'name': 'torrent',
+            'name': 'uri',
             'description': 'URI for which to return torrent information. This URI can either represent '
                            'a file location, a magnet link or a HTTP(S) url.',
             'type': 'string',
             'required': True
+        }, {
+            'in': 'query',
+            'name': 'fields',
+            'description': 'Comma-separated list of fields to return instead of the full metainfo. '
+                           'Possible values are: ' + ', '.join(TORRENT_INFO_FIELDS) + '.',
+            'type': 'string',
+            'required': False
+        }, {
+            'in': 'query',
+            'name': 'files_offset',
+            'description': 'Index of the first file to return, if the files are requested.',
+            'type': 'integer',
+            'required': False
+        }, {
+            'in': 'query',
+            'name': 'files_limit',
+            'description': 'Maximum number of files to return, if the files are requested.',
+            'type': 'integer',
+            'required': False
         }],
         responses={
             200: {
-                'description': 'Return a hex-encoded json-encoded string with torrent metainfo',
-                "schema": schema(GetMetainfoResponse={'metainfo': String})
+                'description': 'Return a hex-encoded json-encoded string with torrent metainfo, or the requested '
+                               'fields if the fields parameter is given',
+                "schema": schema(GetMetainfoResponse={'metainfo': String,
+                                                      'download_exists': Boolean,
+                                                      'infohash': String,
+                                                      'name': String,
+                                                      'size': Integer,
+                                                      'num_files': Integer,
+                                                      'files': [schema(TorrentInfoFile={'index': Integer,
+                                                                                        'name': String,
+                                                                                        'size': Integer})],
+                                                      'trackers': List(String)})
             }
         }
     )
@@ -57,64 +162,88 @@ class TorrentInfoEndpoint(RESTEndpoint):
                 return RESTResponse({"error": f"wrong value of 'hops' parameter: {repr(args['hops'])}"},
                                     status=HTTP_BAD_REQUEST)
 
+        fields = None
+        if 'fields' in args:
+            fields = {field for field in args['fields'].split(',') if field}
+            unknown_fields = fields.difference(TORRENT_INFO_FIELDS)
+            if unknown_fields:
+                return RESTResponse({"error": f"unknown fields: {', '.join(sorted(unknown_fields))}"},
+                                    status=HTTP_BAD_REQUEST)
+
+        try:
+            files_offset = int(args.get('files_offset', 0))
+            files_limit = int(args['files_limit']) if 'files_limit' in args else None
+        except ValueError:
+            return RESTResponse({"error": "files_offset and files_limit should be integers"}, status=HTTP_BAD_REQUEST)
+        if files_offset < 0 or (files_limit is not None and files_limit < 0):
+            return RESTResponse({"error": "files_offset and files_limit should not be negative"},
+                                status=HTTP_BAD_REQUEST)
+
         if 'uri' not in args or not args['uri']:
             return RESTResponse({"error": "uri parameter missing"}, status=HTTP_BAD_REQUEST)
 
         uri = args['uri']
-        if uri.startswith('file:'):
-            try:
-                filename = uri_to_path(uri)
-                tdef = TorrentDef.load(filename)
-                metainfo = tdef.get_metainfo()
-            except (TypeError, RuntimeError):
-                return RESTResponse({"error": "error while decoding torrent file"}, status=HTTP_INTERNAL_SERVER_ERROR)
-        elif uri.startswith('http'):
-            try:
-                async with ClientSession(raise_for_status=True) as session:
-                    response = await session.get(uri)
-                    response = await response.read()
-            except (ServerConnectionError, ClientResponseError) as e:
-                return RESTResponse({"error": str(e)}, status=HTTP_INTERNAL_SERVER_ERROR)
-
-            if response.startswith(b'magnet'):
-                _, infohash, _ = parse_magnetlink(response)
-                if infohash:
-                    metainfo = await self.session.dlmgr.get_metainfo(infohash, timeout=60, hops=hops, url=response)
-            else:
-                metainfo = bdecode_compat(response)
-        elif uri.startswith('magnet'):
-            infohash = parse_magnetlink(uri)[1]
-            if infohash is None:
-                return RESTResponse({"error": "missing infohash"}, status=HTTP_BAD_REQUEST)
-            metainfo = await self.session.dlmgr.get_metainfo(infohash, timeout=60, hops=hops, url=uri)
+        cache_key = self.get_cache_key(uri, hops)
+        tdef = self.torrent_defs.get(cache_key) if cache_key is not None else None
+        if tdef is not None:
+            self.torrent_defs.move_to_end(cache_key)
         else:
-            return RESTResponse({"error": "invalid uri"}, status=HTTP_BAD_REQUEST)
+            metainfo = None
+            if uri.startswith('file:'):
+                try:
+                    filename = uri_to_path(uri)
+                    tdef = await get_event_loop().run_in_executor(None, TorrentDef.load, filename)
+                    metainfo = tdef.get_metainfo()
+                except (TypeError, ValueError, RuntimeError):
+                    return RESTResponse({"error": "error while decoding torrent file"},
+                                        status=HTTP_INTERNAL_SERVER_ERROR)
+            elif uri.startswith('http'):
+                try:
+                    async with ClientSession(raise_for_status=True) as session:
+                        response = await session.get(uri)
+                        response = await response.read()
+                except (ServerConnectionError, ClientResponseError) as e:
+                    return RESTResponse({"error": str(e)}, status=HTTP_INTERNAL_SERVER_ERROR)
+
+                if response.startswith(b'magnet'):
+                    _, infohash, _ = parse_magnetlink(response)
+                    if infohash:
+                        metainfo = await self.session.dlmgr.get_metainfo(infohash, timeout=60, hops=hops,
+                                                                         url=response, retry_failed=True)
+                else:
+                    metainfo = bdecode_compat(response)
+            elif uri.startswith('magnet'):
+                infohash = parse_magnetlink(uri)[1]
+                if infohash is None:
+                    return RESTResponse({"error": "missing infohash"}, status=HTTP_BAD_REQUEST)
+                metainfo = await self.session.dlmgr.get_metainfo(infohash, timeout=60, hops=hops, url=uri,
+                                                                 retry_failed=True)
+            else:
+                return RESTResponse({"error": "invalid uri"}, status=HTTP_BAD_REQUEST)
 
-        if not metainfo:
-            return RESTResponse({"error": "metainfo error"}, status=HTTP_INTERNAL_SERVER_ERROR)
+            if not metainfo:
+                return RESTResponse({"error": "metainfo error"}, status=HTTP_INTERNAL_SERVER_ERROR)
 
-        if not isinstance(metainfo, dict) or b'info' not in metainfo:
-            self._logger.warning("Received metainfo is not a valid dictionary")
-            return RESTResponse({"error": "invalid response"}, status=HTTP_INTERNAL_SERVER_ERROR)
+            if not isinstance(metainfo, dict) or b'info' not in metainfo:
+                self._logger.warning("Received metainfo is not a valid dictionary")
+                return RESTResponse({"error": "invalid response"}, status=HTTP_INTERNAL_SERVER_ERROR)
 
-        # Add the torrent to GigaChannel as a free-for-all entry, so others can search it
-        self.session.mds.TorrentMetadata.add_ffa_from_dict(
-            tdef_to_metadata_dict(TorrentDef.load_from_dict(metainfo)))
+            if tdef is None:
+                tdef = await get_event_loop().run_in_executor(None, TorrentDef.load_from_dict, metainfo)
 
-        # TODO(Martijn): store the stuff in a database!!!
-        # TODO(Vadim): this means cache the downloaded torrent in a binary storage, like LevelDB
-        infohash = hashlib.sha1(lt.bencode(metainfo[b'info'])).digest()
+            await self.session.mds.run_threaded(self.add_to_gigachannel, tdef)
+            self.cache_torrent_def(cache_key, tdef)
 
-        download = self.session.dlmgr.downloads.get(infohash)
-        metainfo_request = self.session.dlmgr.metainfo_requests.get(infohash, [None])[0]
+        download = self.session.dlmgr.downloads.get(tdef.infohash)
+        metainfo_request = self.session.dlmgr.metainfo_requests.get(tdef.infohash, [None])[0]
         download_is_metainfo_request = download == metainfo_request
+        download_exists = bool(download and not download_is_metainfo_request)
 
-        # Check if the torrent is already in the downloads
-        encoded_metainfo = deepcopy(metainfo)
+        if fields is not None:
+            result = await get_event_loop().run_in_executor(None, get_torrent_info_fields, tdef, fields,
+                                                            files_offset, files_limit)
+            result["download_exists"] = download_exists
+            return RESTResponse(result)
 
-        # FIXME: json.dumps garbles binary data that is used by the 'pieces' field
-        # However, this is fine as long as the GUI does not use this field.
-        encoded_metainfo[b'info'][b'pieces'] = hexlify(encoded_metainfo[b'info'][b'pieces']).encode('utf-8')
-        encoded_metainfo = hexlify(json.dumps(recursive_unicode(encoded_metainfo, ignore_errors=True), ensure_ascii=False).encode('utf-8'))
-        return RESTResponse({"metainfo": encoded_metainfo,
-                             "download_exists": download and not download_is_metainfo_request})
+        encoded_metainfo = await get_event_loop().run_in_executor(None, encode_metainfo, tdef.get_metainfo())
+        return RESTResponse({"metainfo": encoded_metainfo, "download_exists": download_exists})
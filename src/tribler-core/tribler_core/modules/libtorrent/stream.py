@@ -9,8 +9,9 @@ the file in this state. The state of this static buffering can be observed over
 2-DYNMAIC PRIORITISATION: When the static prio is finished then the client can start playing the file,
 When a client starts playing the file over http, it will request a chunk, each requested chunk will initiate a
 dynmaic buffer according to the current read position of the file mapped to related piece of the torrent file.
-The undownloaded pieces starting from the current read position with the length of prebuffsize will be prioritised
-with the DEADLINE_PRIO_MAP sequence and will be deadlined with the indexes of the same map.
+The undownloaded pieces starting from the current read position with the length of readaheadsize will be prioritised
+with the DEADLINE_PRIO_MAP sequence and will be deadlined with the indexes of the same map. The read-ahead size covers
+READAHEAD_TIME seconds of playback, based on the rate at which the client consumes the stream.
 Rest of the pieces are to prio: 1 and no deadline. Note that, the prio, deadline and the actual pieces impacted
 will be dynamically updated eachtime more chunks are readed, until EOF.
 Each chunk will have its own prio applied, and there can be multiple concurrent chucks
@@ -18,7 +19,10 @@ for a given fileindex of a torrent
 """
 
 import logging
-from asyncio import sleep
+import time
+from asyncio import Future, TimeoutError as AsyncTimeoutError, get_event_loop, shield, sleep, wait_for
+from contextlib import suppress
+from threading import Lock
 
 from tribler_common.simpledefs import DLSTATUS_DOWNLOADING, DLSTATUS_SEEDING
 
@@ -29,8 +33,25 @@ from tribler_core.utilities.torrent_utils import get_info_from_handle
 # Without below pieces are ready, streamer should not start
 HEADER_SIZE = 5 * 1024 * 1024
 FOOTER_SIZE = 1 * 1024 * 1024
-# the percent of the file size to be used as moving or static prebufferng size
-PREBUFF_PERCENT = 0.05
+# The number of seconds of playback that is buffered before the client starts playing (static prebuffering), and
+# that is kept buffered ahead of each read position (dynamic buffering)
+PREBUFF_TIME = 10
+READAHEAD_TIME = 30
+MIN_READAHEAD_SIZE = 4 * 1024 * 1024
+# The bitrate (in bytes per second) of a stream is estimated from the rate at which the client reads it.
+# Until we know better, we assume an 8 Mbit/s stream.
+DEFAULT_BITRATE = 1024 * 1024
+MAX_BITRATE = 8 * 1024 * 1024
+BITRATE_SMOOTHING = 0.2
+# Reads that follow each other too quickly (the client is filling its buffer) or too slowly (the client paused)
+# say nothing about the bitrate
+MIN_BITRATE_SAMPLE_TIME = 0.05
+MAX_BITRATE_SAMPLE_TIME = 10
+# The maximum number of bytes that a chunk reads from disk at once
+MAX_READ_SIZE = 2 * 1024 * 1024
+# Waiting for a piece relies on piece_finished_alerts, which may get lost if the alert queue overflows.
+# Therefore, we check whether we have the piece once in a while.
+PIECE_WAIT_TIMEOUT = 5
 # Below map defines the priority/deadline sequence for pieces. List index represents the deadline, and
 # actual value in the index represents the priority of the piece sequence in the torrent file.
 # Minimum prio must be 2, because prio 1 is used for not relevant pieces in streaming
@@ -88,6 +109,19 @@ class Stream: # pylint: disable=too-many-instance-attributes
         # {int:startbyte: [bool:ispaused, list:piecestobuffer 'according to the cursor of the related chunk']
         self.cursorpiecemap = {}
         self.fileindex = None
+        # piece -> Future, resolved when the piece has been downloaded
+        self.piecewaiters = {}
+        # The pieces of the enabled file that we have, kept up to date with piece_finished alerts
+        self.havepieces = set()
+        # The first piece of the enabled file that we do not have
+        self.consecend = None
+        # piece -> priority, for all pieces that have a streaming specific priority
+        self.scheduledprios = {}
+        # The priority of all other pieces of the enabled file, None if unknown
+        self.defaultprio = None
+        # (name, consec) -> progress
+        self.progresscache = {}
+        self.bitrate = DEFAULT_BITRATE
         # when first initiate this instance does not have related callback ready,
         # this coro will be awaited when the stream is enabled. If never enabled,
         # this coro will be closed.
@@ -97,12 +131,9 @@ class Stream: # pylint: disable=too-many-instance-attributes
         # wait for an handle first
         await download.get_handle()
         self.destdir = download.get_content_dest()
-        metainfo = None
-        while not metainfo:
+        if not download.get_def().get_metainfo():
             # Wait for an actual tdef with an actual metadata is available
-            metainfo = download.get_def().get_metainfo()
-            if not metainfo:
-                await sleep(1)
+            await shield(download.future_metainfo)
         tdef = download.get_def()
         self.piecelen = tdef.get_piece_length()
         self.files = tdef.get_files_with_length()
@@ -116,6 +147,8 @@ class Stream: # pylint: disable=too-many-instance-attributes
         # an other approach would be using self.__download = download but
         # below method looks cleaner
         self.__lt_state = download.get_state
+        self.__waitforstatus = download.wait_for_status
+        self.__havepiece = download.have_piece
         self.__getpieceprios = download.get_piece_priorities
         self.__setpieceprios = download.set_piece_priorities
         self.__getfileprios = download.get_file_priorities
@@ -139,12 +172,11 @@ class Stream: # pylint: disable=too-many-instance-attributes
         # if downlaod is stopped for some reason, resume it.
         self.__resumedownload()
 
-        # wait until dlstate is downloading or seeding
-        while True:
-            status = self.__lt_state().get_status()
-            if status in [DLSTATUS_DOWNLOADING, DLSTATUS_SEEDING]:
-                break
-            await sleep(1)
+        # wait until dlstate is downloading or seeding. Besides the state_changed_alert, the state also gets updated
+        # periodically, so check it at least once per second.
+        while self.__lt_state().get_status() not in [DLSTATUS_DOWNLOADING, DLSTATUS_SEEDING]:
+            with suppress(AsyncTimeoutError):
+                await wait_for(self.__waitforstatus(DLSTATUS_DOWNLOADING, DLSTATUS_SEEDING), 1)
 
         # the streaming status is tracked based on the infohash, if there is already no streaming
         # or there is already a streaming for a fileindex but we need a new one, reinitialize the
@@ -152,6 +184,7 @@ class Stream: # pylint: disable=too-many-instance-attributes
         # which means after below line, stream.enaled = True
         if fileindex != self.fileindex:
             self.fileindex = fileindex
+            self.resolvewaiters()
         elif self.enabled:
             # if already there is a state with the same file index do nothing
             if prebufpos is not None:
@@ -159,6 +192,7 @@ class Stream: # pylint: disable=too-many-instance-attributes
                 currrent_prebuf = list(self.prebuffpieces)
                 currrent_prebuf.extend(self.bytestopieces(prebufpos, self.prebuffsize))
                 self.prebuffpieces = sorted(list(set(currrent_prebuf)))
+                self.progresscache.clear()
             return
 
         # update the file name and size with the file index
@@ -173,14 +207,37 @@ class Stream: # pylint: disable=too-many-instance-attributes
         self.__setselectedfiles([fileindex], 7, True)
         # Get the piece map of the file
         self.firstpiece = self.bytetopiece(0)  # inclusive
-        self.lastpiece = min(self.bytetopiece(self.filesize), len(self.pieceshave) - 1)  # inclusive
-        # prebuffer size PREBUFF_PERCENT of the file size
-        self.prebuffsize = int(self.filesize * PREBUFF_PERCENT)
+        pieceshave = self.pieceshave
+        self.lastpiece = min(self.bytetopiece(self.filesize), len(pieceshave) - 1)  # inclusive
+        # From now on, we keep track of the pieces that we have using piece_finished alerts
+        self.havepieces = {piece for piece in range(self.firstpiece, self.lastpiece + 1) if pieceshave[piece]}
+        self.consecend = self.firstpiece
+        self.scheduledprios = {}
+        self.defaultprio = None
+        self.progresscache.clear()
+        # prebuffer PREBUFF_TIME seconds of playback
+        self.prebuffsize = min(int(self.bitrate * PREBUFF_TIME), self.filesize)
         # calculate static buffer pieces
         self.headerpieces = self.bytestopieces(0, HEADER_SIZE)
         self.footerpieces = self.bytestopieces(-FOOTER_SIZE, 0)
         self.prebuffpieces = [] if prebufpos is None else self.bytestopieces(prebufpos, self.prebuffsize)
 
+    @property
+    def readaheadsize(self):
+        """
+        The number of bytes to buffer ahead of a read position, based on the estimated bitrate
+        """
+        return min(max(int(self.bitrate * READAHEAD_TIME), MIN_READAHEAD_SIZE), self.filesize or 0)
+
+    def update_bitrate(self, numbytes, seconds):
+        """
+        Update the bitrate estimate with the time that the client needed to consume numbytes bytes
+        """
+        if not MIN_BITRATE_SAMPLE_TIME <= seconds <= MAX_BITRATE_SAMPLE_TIME:
+            return
+        sample = min(numbytes / seconds, MAX_BITRATE)
+        self.bitrate = BITRATE_SMOOTHING * sample + (1 - BITRATE_SMOOTHING) * self.bitrate
+
     @property
     def enabled(self):
         """
@@ -194,7 +251,7 @@ class Stream: # pylint: disable=too-many-instance-attributes
         """
         Get current progress of downloaded header pieces of the enabled stream, if not enabled returns 0
         """
-        return self.calculateprogress(self.headerpieces, False)
+        return self.cachedprogress('header', self.headerpieces, False)
 
     @property
     @check_vod(0)
@@ -202,7 +259,7 @@ class Stream: # pylint: disable=too-many-instance-attributes
         """
         Get current progress of downloaded footer pieces of the enabled stream, if not enabled returns 0
         """
-        return self.calculateprogress(self.footerpieces, False)
+        return self.cachedprogress('footer', self.footerpieces, False)
 
     @property
     @check_vod(0)
@@ -210,7 +267,7 @@ class Stream: # pylint: disable=too-many-instance-attributes
         """
         Get current progress of downloaded prebuff pieces of the enabled stream, if not enabled returns 0
         """
-        return self.calculateprogress(self.prebuffpieces, False)
+        return self.cachedprogress('prebuff', self.prebuffpieces, False)
 
     @property
     @check_vod(0)
@@ -218,7 +275,7 @@ class Stream: # pylint: disable=too-many-instance-attributes
         """
         Get current progress of cosequently downloaded prebuff pieces of the enabled stream, if not enabled returns 0
         """
-        return self.calculateprogress(self.prebuffpieces, True)
+        return self.cachedprogress('prebuff', self.prebuffpieces, True)
 
     @property
     @check_vod([])
@@ -238,6 +295,8 @@ class Stream: # pylint: disable=too-many-instance-attributes
         self.footerpieces = []
         self.prebuffpieces = []
         self.cursorpiecemap = {}
+        self.progresscache.clear()
+        self.resolvewaiters()
         self.resetprios()
         self.__setselectedfiles(self.enabledfiles)
 
@@ -272,6 +331,74 @@ class Stream: # pylint: disable=too-many-instance-attributes
         piece = self.mapfile(self.fileindex, byte_begin, 0).piece
         return piece
 
+    @check_vod(0)
+    def availablebytes(self, byte_begin, max_bytes):
+        """
+        Returns the number of bytes starting at byte_begin that are available on disk, up to max_bytes
+        """
+        request = self.mapfile(self.fileindex, byte_begin, 0)
+        piece = request.piece
+        available = 0
+        end = self.piecelen - request.start
+        while piece <= self.lastpiece and available < max_bytes and self.havepiece(piece):
+            available = end
+            end += self.piecelen
+            piece += 1
+        return max(0, min(available, max_bytes, self.filesize - byte_begin))
+
+    def havepiece(self, piece):
+        """
+        Checks if the piece has been downloaded
+        """
+        return self.__havepiece(piece)
+
+    async def wait_for_piece(self, piece, timeout=PIECE_WAIT_TIMEOUT):
+        """
+        Waits until the piece has been downloaded, the stream changes or the timeout expires.
+        Returns True if the piece is available
+        """
+        if self.havepiece(piece):
+            # in case we missed the piece_finished_alert
+            self.havepieces.add(piece)
+            return True
+        future = self.piecewaiters.get(piece)
+        if future is None:
+            future = self.piecewaiters[piece] = Future()
+        with suppress(AsyncTimeoutError):
+            await wait_for(shield(future), timeout)
+        return self.havepiece(piece)
+
+    def on_piece_finished(self, piece):
+        """
+        Updates the administration of the pieces that we have, and wakes up the chunks that wait for the piece.
+        Called by the download upon a piece_finished_alert
+        """
+        self.havepieces.add(piece)
+        self.scheduledprios.pop(piece, None)
+        self.progresscache.clear()
+        future = self.piecewaiters.pop(piece, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def resolvewaiters(self):
+        """
+        Wakes up all waiting chunks, so they can reconsider what to read
+        """
+        waiters, self.piecewaiters = self.piecewaiters, {}
+        for future in waiters.values():
+            if not future.done():
+                future.set_result(None)
+
+    def cachedprogress(self, name, pieces, consec):
+        """
+        Returns the progress of a named piece list, which is only recalculated after we get a new piece
+        """
+        key = (name, consec)
+        progress = self.progresscache.get(key)
+        if progress is None:
+            progress = self.progresscache[key] = self.calculateprogress(pieces, consec)
+        return progress
+
     @check_vod(0)
     def calculateprogress(self, pieces, consec):
         """
@@ -280,13 +407,21 @@ class Stream: # pylint: disable=too-many-instance-attributes
         """
         if not pieces:
             return 1.0
-        have = 0.0
-        for piece in self.iterpieces(have=True, consec=consec):
-            if have >= len(pieces):
-                break
-            if piece in pieces:
-                have += 1
-        return have / len(pieces) if pieces else 0.0
+        if consec:
+            firstmissing = self.firstmissingpiece()
+            have = sum(1 for piece in pieces if piece < firstmissing)
+        else:
+            have = sum(1 for piece in pieces if piece in self.havepieces)
+        return have / len(pieces)
+
+    @check_vod(-1)
+    def firstmissingpiece(self):
+        """
+        Returns the first piece of the active fileindex that we do not have
+        """
+        while self.consecend <= self.lastpiece and self.consecend in self.havepieces:
+            self.consecend += 1
+        return self.consecend
 
     @check_vod([])
     def iterpieces(self, have=None, consec=False, startfrom=None):
@@ -296,109 +431,89 @@ class Stream: # pylint: disable=too-many-instance-attributes
         @param consec: True: sequentially, False: all pieces
         @param startfrom: int: start form index, None: start from first piece
         """
-        if have is not None:
-            pieces_have = self.pieceshave
-        for piece in range(self.firstpiece, self.lastpiece + 1):
-            if startfrom is not None and piece < startfrom:
-                continue
-            if have is None:
-                yield piece
-            elif have and pieces_have[piece]:
-                yield piece
-            elif not have and not pieces_have[piece]:
+        startfrom = self.firstpiece if startfrom is None else max(startfrom, self.firstpiece)
+        for piece in range(startfrom, self.lastpiece + 1):
+            if have is None or (piece in self.havepieces) == have:
                 yield piece
             elif consec:
                 break
 
-    async def updateprios(self):  # pylint: disable=too-many-branches
+    def staticprios(self):
+        """
+        Returns a piece -> (priority, deadline) dictionary for the missing header, footer and prebuffer pieces
+        """
+        prios = {}
+        for deadline, pieces in ((2, self.prebuffpieces), (1, self.headerpieces), (0, self.footerpieces)):
+            for piece in pieces:
+                if piece not in self.havepieces:
+                    prios[piece] = (7, deadline)
+        return prios
+
+    def cursorprios(self):
+        """
+        Returns a piece -> (priority, deadline) dictionary for the missing pieces in the buffers of the active chunks.
+        If multiple chunks buffer the same piece, the chunk that needs the piece first determines its priority.
+        """
+        prios = {}
+        for paused, cursorpieces in self.cursorpiecemap.values():
+            if paused:
+                continue
+            for deadline, piece in enumerate(cursorpieces):
+                if piece in self.havepieces or (piece in prios and prios[piece][1] <= deadline):
+                    continue
+                # if the deadline is outside of the map, the piece gets prio 1 with the deadline
+                prios[piece] = (DEADLINE_PRIO_MAP[deadline] if deadline < len(DEADLINE_PRIO_MAP) else 1, deadline)
+        return prios
+
+    async def updateprios(self):
         """
         This async function controls how the individual piece priority and deadline is configured.
         This method is called when a stream in enabled, and when a chunk reads the stream each time.
-        The performance of this method is crucical since it gets called quite frequently
+        The performance of this method is crucical since it gets called quite frequently. Therefore, only
+        the pieces in the static and dynamic buffers are considered, and only pieces with a changed priority
+        are passed to libtorrent.
         """
-        if not self.enabled:
+        if not self.enabled or not self.__getfileprios():
+            # the latter case might happen when hop count is changing.
             return
 
-        def _updateprio(piece, prio, deadline=None):
-            """
-            Utility function to update piece priorities
-            """
-            if not curr_prio == prio:
-                piecepriorities[piece] = prio
-                if deadline is not None:
-                    # it is cool to step deadlines with 10ms interval but in realty there is no need.
-                    self.__setdeadline(piece, deadline * 10)
-                    diffmap[piece] = f"{piece}:{deadline * 10}:{curr_prio}->{prio}"
-                else:
-                    self.__resetdeadline(piece)
-                    diffmap[piece] = f"{piece}:-:{curr_prio}->{prio}"
-
-        def _find_deadline(piece):
-            """
-            Find the cursor which has this piece closest to its start
-            Returns the deadline for the piece and the cursor startbyte
-            """
-            # if piece is not in piecemaps, then there is no deadline
-            # if piece in piecemaps, then the deadline is the index of the related piecemap
-            deadline = None
-            cursor = None
-            for startbyte in self.cursorpiecemap:
-                paused, cursorpieces = self.cursorpiecemap[startbyte]
-                if not paused and piece in cursorpieces and \
-                        (deadline is None or cursorpieces.index(piece) < deadline):
-                    deadline = cursorpieces.index(piece)
-                    cursor = startbyte
-            return deadline, cursor
-
-        # current priorities
-        piecepriorities = self.__getpieceprios()
-        if not piecepriorities:
-            # this case might happen when hop count is changing.
-            return
-        # a map holds the changes, used only for logging purposes
-        diffmap = {}
-        # flag that holds if we are in static buffering phase of dynamic buffering
-        staticbuff = False
-        for piece in self.iterpieces(have=False):
-            # current piece prio
-            curr_prio = piecepriorities[piece]
-            if piece in self.footerpieces:
-                _updateprio(piece, 7, 0)
-                staticbuff = True
-            elif piece in self.headerpieces:
-                _updateprio(piece, 7, 1)
-                staticbuff = True
-            elif piece in self.prebuffpieces:
-                _updateprio(piece, 7, 2)
-                staticbuff = True
+        # while static buffering, only the static pieces are downloaded
+        wantedprios = self.staticprios()
+        defaultprio = 0 if wantedprios else MIN_PIECE_PRIO
+        if not wantedprios:
+            wantedprios = self.cursorprios()
+
+        # if the default priority changes, all missing pieces of the file need an update
+        refresh = defaultprio != self.defaultprio
+        changes = dict.fromkeys(self.iterpieces(have=False), defaultprio) if refresh else {}
+        deadlines = {}
+        for piece in self.scheduledprios:
+            if piece not in wantedprios:
+                changes[piece] = defaultprio
+                deadlines[piece] = None
+        for piece, (prio, deadline) in wantedprios.items():
+            if refresh or prio != self.scheduledprios.get(piece, defaultprio):
+                changes[piece] = prio
+                deadlines[piece] = deadline
+        self.scheduledprios = {piece: prio for piece, (prio, _) in wantedprios.items()}
+        self.defaultprio = defaultprio
+
+        for piece, deadline in deadlines.items():
+            if deadline is None:
+                self.__resetdeadline(piece)
             else:
-                if staticbuff:
-                    _updateprio(piece, 0)
-                else:
-                    # dynamic buffering
-                    deadline, cursor = _find_deadline(piece)
-                    if cursor is not None:
-                        if deadline < len(DEADLINE_PRIO_MAP):
-                            # get prio according to deadline
-                            _updateprio(piece, DEADLINE_PRIO_MAP[deadline], deadline)
-                        else:
-                            # the deadline is outside of map, set piece prio 1 with the deadline
-                            # buffer size is bigger then prio_map
-                            _updateprio(piece, 1, deadline)
-                    else:
-                        # the piece is not in buffer zone, set to min prio without deadline
-                        _updateprio(piece, MIN_PIECE_PRIO)
-        if diffmap:
-            # log stuff
-            self._logger.info("Piece Piority changed: %s", repr(diffmap))
+                # it is cool to step deadlines with 10ms interval but in realty there is no need.
+                self.__setdeadline(piece, deadline * 10)
+        if changes:
+            self._logger.info("Piece Piority changed: %s",
+                              {piece: f"{deadlines.get(piece)}:{prio}" for piece, prio in changes.items()
+                               if piece in deadlines})
             self._logger.debug("Header Pieces: %s", repr(self.headerpieces))
             self._logger.debug("Footer Pieces: %s", repr(self.footerpieces))
             self._logger.debug("Prebuff Pieces: %s", repr(self.prebuffpieces))
             for startbyte in self.cursorpiecemap:
                 self._logger.debug("Cursor '%s' Pieces: %s", startbyte, repr(self.cursorpiecemap[startbyte]))
-            # BELOW LINE WILL BE REMOVED, Most of the above are for debugging to be cleaned
-            self._logger.debug("Current Prios: %s", [(x, piecepriorities[x]) for x in self.iterpieces(have=False)])
-            self.__setpieceprios(piecepriorities)
+            self.__setpieceprios(list(changes.items()))
 
     def resetprios(self, pieces=None, prio=None):
         """
@@ -406,12 +521,21 @@ class Stream: # pylint: disable=too-many-instance-attributes
         If no pieces are provided, resets every piece for the fileindex
         """
         prio = prio if prio is not None else 4
-        piecepriorities = self.__getpieceprios()
         if pieces is None:
-            pieces = list(range(len(piecepriorities)))
+            numpieces = len(self.__getpieceprios())
+            for piece in range(numpieces):
+                self.__resetdeadline(piece)
+            self.__setpieceprios([prio] * numpieces)
+            self.scheduledprios = {}
+            self.defaultprio = None
+            return
         for piece in pieces:
             self.__resetdeadline(piece)
-        self.__setpieceprios([prio] * len(pieces))
+            if prio == self.defaultprio:
+                self.scheduledprios.pop(piece, None)
+            else:
+                self.scheduledprios[piece] = prio
+        self.__setpieceprios([(piece, prio) for piece in pieces])
 
 
 class StreamChunk:
@@ -430,8 +554,12 @@ class StreamChunk:
             raise NotStreamingError()
         self.stream = stream
         self.file = None
+        # Guards the file against being closed while a worker thread reads from it
+        self.file_lock = Lock()
         self.startpos = startpos
         self.__seekpos = self.startpos
+        # (time, number of bytes) of the last read, used for estimating the bitrate of the stream
+        self.lastread = None
 
     @property
     def seekpos(self):
@@ -452,10 +580,15 @@ class StreamChunk:
         """
         Opens the file in the filesystem until its ready and seeks to the seekpos position
         """
+        # libtorrent creates the file when it writes the first piece to it
         while not self.stream.filename.exists():
-            await sleep(1)
-        self.file = open(self.stream.filename, 'rb')
-        self.file.seek(self.seekpos)
+            piece = self.stream.bytetopiece(self.seekpos)
+            if piece >= 0:
+                await self.stream.wait_for_piece(piece)
+            # wait_for_piece returns immediately if we already have the piece, but the file may not be on disk yet
+            if not self.stream.filename.exists():
+                await sleep(1)
+        self.file = await get_event_loop().run_in_executor(None, open, self.stream.filename, 'rb')
 
     @property
     def isclosed(self):
@@ -517,9 +650,10 @@ class StreamChunk:
         buffersize = 0
         pospiece = self.stream.bytetopiece(positionbyte)
         pieces = []
-        # note that piece buffer is based the undownloaded piece up the size of prebuffsize
+        readaheadsize = self.stream.readaheadsize
+        # note that piece buffer is based the undownloaded piece up the size of readaheadsize
         for piece in self.stream.iterpieces(have=False, startfrom=pospiece):
-            if buffersize < self.stream.prebuffsize:
+            if buffersize < readaheadsize:
                 pieces.append(piece)
                 buffersize += self.stream.piecelen
             else:
@@ -538,17 +672,30 @@ class StreamChunk:
         Closes the chunk grecefully, also unregisters the cursor pieces from the stream instance
         and resets the releavent piece prios.
         """
-        if self.file:
-            self.file.close()
-            self.file = None
+        with self.file_lock:
+            if self.file:
+                self.file.close()
+                self.file = None
         if self.isstarted:
             pieces = self.stream.cursorpiecemap.pop(self.startpos)
             self.stream.resetprios(pieces[1], MIN_PIECE_PRIO)
 
+    def _readfile(self, position, size):
+        with self.file_lock:
+            if self.isclosed:
+                return b''
+            self.file.seek(position)
+            return self.file.read(size)
+
     async def read(self):
         """
-        Reads 1 piece that contains the seekpos.
+        Reads the piece that contains the seekpos, together with any directly following pieces that are already
+        available, up to MAX_READ_SIZE bytes.
         """
+        if self.lastread:
+            readtime, numbytes = self.lastread
+            self.stream.update_bitrate(numbytes, time.time() - readtime)
+
         if not self.file and self.isstarted:
             await self.open()
 
@@ -562,20 +709,19 @@ class StreamChunk:
             return b''
 
         # wait until we download what we want, then read the localfile
-        # experiment a garbage write mechanism here if the torrent read is too slow
-        piece = self.stream.bytetopiece(self.seekpos)
-        while True:
-            pieces_have = self.stream.pieceshave
-            if piece == -1:
-                self.close()
-                return b''
-            if (0 <= piece < len(pieces_have) and pieces_have[piece]) or not self.isstarted:
-                break
+        if piece == -1:
+            self.close()
+            return b''
+        while self.isstarted and not await self.stream.wait_for_piece(piece):
             self._logger.debug('Chunk %s, Waiting piece %s', self.startpos, piece)
-            await sleep(1)
+        if self.isclosed or not self.isstarted:
+            self.close()
+            return b''
 
-        result = self.file.read(self.stream.piecelen)
+        size = self.stream.availablebytes(self.seekpos, MAX_READ_SIZE) or self.stream.piecelen
+        result = await get_event_loop().run_in_executor(None, self._readfile, self.seekpos, size)
         self._logger.debug('Chunk %s: Got bytes %s-%s, %s bytes, piecelen: %s',
-                          self.startpos, self.seekpos, self.seekpos + len(result), len(result), self.stream.piecelen)
-        self.__seekpos = self.file.tell()
+                           self.startpos, self.seekpos, self.seekpos + len(result), len(result), self.stream.piecelen)
+        self.__seekpos += len(result)
+        self.lastread = (time.time(), len(result))
         return result
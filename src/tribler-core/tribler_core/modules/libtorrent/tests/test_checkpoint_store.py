@@ -0,0 +1,147 @@
+import sqlite3
+from asyncio import ensure_future, sleep
+from unittest.mock import Mock
+
+import pytest
+
+from tribler_core.modules.libtorrent.checkpoint_store import CHECKPOINT_STORE_FILENAME, CheckpointStore
+from tribler_core.modules.libtorrent.download_config import DownloadConfig
+from tribler_core.utilities.utilities import bdecode_compat
+
+INFOHASH = b'a' * 20
+METAINFO = {b'info': {b'name': b'test'}}
+RESUME_DATA = {b'info-hash': INFOHASH, b'file-format': b'libtorrent resume file'}
+
+
+@pytest.fixture(name='store')
+async def fixture_store(tmpdir):
+    store = CheckpointStore(tmpdir / CHECKPOINT_STORE_FILENAME)
+    yield store
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_save_and_load(store, tmpdir):
+    config = DownloadConfig(state_dir=tmpdir)
+    config.set_hops(2)
+    store.save(INFOHASH, config, METAINFO, RESUME_DATA)
+    assert INFOHASH in store
+
+    await store.flush()
+    await store.close()
+
+    reopened = CheckpointStore(store.db_path)
+    assert INFOHASH in reopened
+    [(infohash, settings, metainfo, resume_data)] = await reopened.load_all()
+    await reopened.close()
+    assert infohash == INFOHASH
+    assert bdecode_compat(metainfo) == METAINFO
+    assert bdecode_compat(resume_data) == RESUME_DATA
+    assert DownloadConfig.from_checkpoint(settings).get_hops() == 2
+
+
+@pytest.mark.asyncio
+async def test_metainfo_written_once(store, tmpdir):
+    """
+    Test whether checkpoints without metainfo keep the previously stored metainfo
+    """
+    config = DownloadConfig(state_dir=tmpdir)
+    store.save(INFOHASH, config, METAINFO, RESUME_DATA)
+    store.save(INFOHASH, config, None, RESUME_DATA)
+    await store.flush()
+    store.save(INFOHASH, config, None, {b'info-hash': INFOHASH})
+    await store.flush()
+
+    config = await store.get_config(INFOHASH)
+    assert config.get_metainfo() == METAINFO
+    assert config.get_engineresumedata() == {b'info-hash': INFOHASH}
+
+
+@pytest.mark.asyncio
+async def test_remove(store, tmpdir):
+    store.save(INFOHASH, DownloadConfig(state_dir=tmpdir), METAINFO, RESUME_DATA)
+    await store.flush()
+    store.remove(INFOHASH)
+    assert INFOHASH not in store
+    await store.flush()
+    assert INFOHASH not in store
+    assert not await store.load_all()
+    assert await store.get_config(INFOHASH) is None
+
+
+@pytest.mark.asyncio
+async def test_export_conf(store, tmpdir):
+    assert not await store.export_conf(INFOHASH, tmpdir / 'missing.conf')
+
+    config = DownloadConfig(state_dir=tmpdir)
+    config.set_selected_files([0, 2])
+    store.save(INFOHASH, config, METAINFO, RESUME_DATA)
+    assert await store.export_conf(INFOHASH, tmpdir / 'export.conf')
+
+    exported = DownloadConfig.load(tmpdir / 'export.conf')
+    assert exported.get_selected_files() == [0, 2]
+    assert exported.get_metainfo() == METAINFO
+    assert exported.get_engineresumedata() == RESUME_DATA
+
+
+@pytest.mark.asyncio
+async def test_contains_while_writing(store, tmpdir):
+    """
+    Test whether a checkpoint that is being written to disk is known to the store
+    """
+    await store.load_all()
+    store.save(INFOHASH, DownloadConfig(state_dir=tmpdir), METAINFO, RESUME_DATA)
+
+    flush = ensure_future(store.flush())
+    await sleep(0)
+    assert not store._pending  # pylint: disable=protected-access
+    assert INFOHASH in store
+    await flush
+    assert INFOHASH in store
+
+
+@pytest.mark.asyncio
+async def test_flush_failed(store, tmpdir):
+    """
+    Test whether a batch that could not be written is queued again, without losing its metainfo
+    """
+    config = DownloadConfig(state_dir=tmpdir)
+    store.save(INFOHASH, config, METAINFO, RESUME_DATA)
+    write = store._write  # pylint: disable=protected-access
+
+    def fail_write(batch):
+        # A newer checkpoint without metainfo is queued while the batch is being written
+        store.save(INFOHASH, config, None, {b'info-hash': INFOHASH})
+        raise sqlite3.OperationalError()
+
+    store._write = Mock(side_effect=fail_write)  # pylint: disable=protected-access
+    assert not await store.flush()
+    assert INFOHASH in store
+    assert not store.is_stored(INFOHASH)
+
+    store._write = write  # pylint: disable=protected-access
+    assert await store.flush()
+    assert store.is_stored(INFOHASH)
+    config = await store.get_config(INFOHASH)
+    assert config.get_metainfo() == METAINFO
+    assert config.get_engineresumedata() == {b'info-hash': INFOHASH}
+
+
+@pytest.mark.asyncio
+async def test_flush_serialized(store, tmpdir):
+    """
+    Test whether flushes do not overlap, and nothing is written after the store is closed
+    """
+    store.save(INFOHASH, DownloadConfig(state_dir=tmpdir), METAINFO, RESUME_DATA)
+    first = ensure_future(store.flush())
+    await sleep(0)
+    store.save(b'b' * 20, DownloadConfig(state_dir=tmpdir), METAINFO, RESUME_DATA)
+    second = ensure_future(store.flush())
+    await sleep(0)
+    assert b'b' * 20 in store._pending  # pylint: disable=protected-access
+    assert await first and await second
+    assert store.is_stored(b'b' * 20)
+
+    await store.close()
+    store.save(INFOHASH, DownloadConfig(state_dir=tmpdir), METAINFO, RESUME_DATA)
+    assert not await store.flush()
@@ -10,11 +10,9 @@ from libtorrent import bencode
 import pytest
 
 from tribler_core.exceptions import SaveResumeDataError
-from tribler_core.modules.libtorrent.download_config import DownloadConfig
 from tribler_core.tests.tools.base_test import MockObject
 from tribler_core.tests.tools.common import TESTS_DATA_DIR
 from tribler_core.utilities.torrent_utils import get_info_from_handle
-from tribler_core.utilities.unicode import hexlify
 from tribler_core.utilities.utilities import bdecode_compat
 
 
@@ -50,10 +48,10 @@ async def test_save_resume(mock_handle, test_download, test_tdef):
 
     alert = Mock(resume_data={b'info-hash': test_tdef.get_infohash()})
     await test_download.save_resume_data()
-    basename = hexlify(test_tdef.get_infohash()) + '.conf'
-    filename = test_download.dlmgr.get_checkpoint_dir() / basename
-    dcfg = DownloadConfig.load(str(filename))
-    assert test_tdef.get_infohash(), dcfg.get_engineresumedata().get(b'info-hash')
+    await test_download.dlmgr.checkpoint_store.flush()
+    dcfg = await test_download.dlmgr.checkpoint_store.get_config(test_tdef.get_infohash())
+    assert dcfg.get_engineresumedata().get(b'info-hash') == test_tdef.get_infohash()
+    assert dcfg.get_metainfo() == test_tdef.get_metainfo()
 
 
 def test_move_storage(mock_handle, test_download, test_tdef, test_tdef_no_metainfo):
@@ -80,9 +78,7 @@ def test_move_storage(mock_handle, test_download, test_tdef, test_tdef_no_metain
 @pytest.mark.asyncio
 async def test_save_checkpoint(test_download, test_tdef):
     await test_download.checkpoint()
-    basename = hexlify(test_tdef.get_infohash()) + '.conf'
-    filename = Path(test_download.dlmgr.get_checkpoint_dir() / basename)
-    assert filename.is_file()
+    assert test_tdef.get_infohash() in test_download.dlmgr.checkpoint_store
 
 
 def test_selected_files(mock_handle, test_download):
@@ -1,4 +1,6 @@
-from asyncio import Future, gather, get_event_loop, sleep
+import shutil
+import sqlite3
+from asyncio import Future, ensure_future, gather, get_event_loop, sleep, wait_for
 from unittest.mock import Mock
 
 from ipv8.util import succeed
@@ -10,7 +12,17 @@ import pytest
 from tribler_common.simpledefs import DLSTATUS_SEEDING
 from tribler_core.config.tribler_config import TriblerConfig
 
-from tribler_core.modules.libtorrent.download_manager import DownloadManager
+from tribler_core.modules.libtorrent.download_config import DownloadConfig
+from tribler_core.modules.libtorrent.download_manager import (
+    DownloadManager,
+    IP_FILTER_UPDATE_INTERVAL,
+    MAX_CONCURRENT_METAINFO_LOOKUPS,
+    RESTORE_PRIORITY_FINISHED,
+    RESTORE_PRIORITY_HIDDEN,
+    RESTORE_PRIORITY_STOPPED,
+    RESTORE_PRIORITY_VISIBLE,
+    get_restore_priority,
+)
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef, TorrentDefNoMetainfo
 from tribler_core.notifier import Notifier
 from tribler_core.tests.tools.common import TESTS_DATA_DIR, TORRENT_UBUNTU_FILE
@@ -140,9 +152,103 @@ async def test_get_metainfo_cache(fake_dlmgr):
     Testing whether cached metainfo is returned, if available
     """
     fake_dlmgr.initialize()
-    fake_dlmgr.metainfo_cache[b"a" * 20] = {'meta_info': 'test', 'time': 0}
+    fake_dlmgr.metainfo_cache.put(b"a" * 20, {b'info': b'test'})
 
-    assert await fake_dlmgr.get_metainfo(b"a" * 20) == "test"
+    assert await fake_dlmgr.get_metainfo(b"a" * 20) == {b'info': b'test'}
+
+
+@pytest.mark.asyncio
+async def test_get_metainfo_failure_backoff(fake_dlmgr):
+    """
+    Testing whether a failed lookup is not retried immediately, unless explicitly requested
+    """
+    download_impl = Mock()
+    download_impl.tdef.get_metainfo = lambda: None
+    download_impl.future_metainfo = Future()
+
+    fake_dlmgr.initialize()
+    fake_dlmgr.start_download = Mock(return_value=download_impl)
+    fake_dlmgr.remove_download = Mock(return_value=succeed(None))
+
+    assert await fake_dlmgr.get_metainfo(b"a" * 20, timeout=0.01) is None
+    assert await fake_dlmgr.get_metainfo(b"a" * 20, timeout=0.01) is None
+    fake_dlmgr.start_download.assert_called_once()
+
+    assert await fake_dlmgr.get_metainfo(b"a" * 20, timeout=0.01, retry_failed=True) is None
+    assert fake_dlmgr.start_download.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_get_metainfo_duplicate_request_timeout(fake_dlmgr):
+    """
+    Test whether every request that shares a lookup waits for its own timeout
+    """
+    download_impl = Mock()
+    download_impl.tdef.get_metainfo = lambda: None
+    download_impl.future_metainfo = Future()
+
+    fake_dlmgr.initialize()
+    fake_dlmgr.start_download = Mock(return_value=download_impl)
+    fake_dlmgr.remove_download = Mock(return_value=succeed(None))
+
+    short_request = ensure_future(fake_dlmgr.get_metainfo(b"a" * 20, timeout=0.01))
+    long_request = ensure_future(fake_dlmgr.get_metainfo(b"a" * 20, timeout=10))
+    assert await short_request is None
+    assert not long_request.done()
+
+    download_impl.future_metainfo.set_result({b'info': b'test'})
+    assert await long_request == {b'info': b'test'}
+    fake_dlmgr.start_download.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_metainfo_timeout_includes_queueing(fake_dlmgr):
+    """
+    Test whether the timeout of a request includes the time it waits for other lookups to finish
+    """
+    fake_dlmgr.initialize()
+    fake_dlmgr.start_download = Mock()
+    for _ in range(MAX_CONCURRENT_METAINFO_LOOKUPS):
+        await fake_dlmgr.metainfo_lookup_slots.acquire()
+
+    assert await wait_for(fake_dlmgr.get_metainfo(b"a" * 20, timeout=0.01), timeout=5) is None
+    for _ in range(MAX_CONCURRENT_METAINFO_LOOKUPS):
+        fake_dlmgr.metainfo_lookup_slots.release()
+    await sleep(0.01)
+    fake_dlmgr.start_download.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_metainfo_concurrency_limit(fake_dlmgr):
+    """
+    Testing whether the number of simultaneous metainfo lookups is bounded
+    """
+    futures = []
+
+    def start_download(tdef=None, **_):
+        download = Mock()
+        download.tdef.get_metainfo = lambda: None
+        download.future_metainfo = Future()
+        futures.append((download.future_metainfo, tdef.get_infohash()))
+        return download
+
+    fake_dlmgr.initialize()
+    fake_dlmgr.start_download = start_download
+    fake_dlmgr.remove_download = Mock(return_value=succeed(None))
+
+    infohashes = [bytes([i]) * 20 for i in range(MAX_CONCURRENT_METAINFO_LOOKUPS + 2)]
+    lookups = gather(*[fake_dlmgr.get_metainfo(infohash) for infohash in infohashes])
+    while len(futures) < MAX_CONCURRENT_METAINFO_LOOKUPS:
+        await sleep(0.01)
+    await sleep(0.1)
+    assert len(futures) == MAX_CONCURRENT_METAINFO_LOOKUPS
+
+    while len(futures) < len(infohashes) or any(not future.done() for future, _ in futures):
+        for future, infohash in futures:
+            if not future.done():
+                future.set_result({b'info': infohash})
+        await sleep(0.01)
+    assert await lookups == [{b'info': infohash} for infohash in infohashes]
 
 
 @pytest.mark.asyncio
@@ -356,6 +462,28 @@ def test_payout_on_disconnect(fake_dlmgr):
     fake_dlmgr.tribler_session.payout_manager.do_payout.is_called_with(b'a' * 20)
 
 
+@pytest.mark.asyncio
+async def test_alert_notify(fake_dlmgr):
+    """
+    Test whether alerts are processed as soon as libtorrent signals that they are pending
+    """
+    disconnect_alert = type('peer_disconnected_alert', (object,), dict(pid=Mock(to_bytes=lambda: b'a' * 20)))()
+    fake_dlmgr.tribler_session.payout_manager = Mock()
+    mock_ltsession = Mock()
+    mock_ltsession.pop_alerts = lambda: [disconnect_alert]
+    fake_dlmgr.ltsessions[0] = mock_ltsession
+
+    fake_dlmgr.enable_alert_notify(mock_ltsession, 0)
+    writer = fake_dlmgr.alert_writers[0]
+    mock_ltsession.set_alert_fd.assert_called_once_with(writer.fileno())
+
+    writer.send(b'\x00')
+    await sleep(0.1)
+    fake_dlmgr.tribler_session.payout_manager.do_payout.assert_called_once_with(b'a' * 20)
+    fake_dlmgr.disable_alert_notify()
+    writer.close()
+
+
 @pytest.mark.asyncio
 async def test_post_session_stats(fake_dlmgr):
     """
@@ -408,6 +536,87 @@ def test_load_empty_checkpoint(fake_dlmgr, tmpdir):
     fake_dlmgr.start_download.assert_not_called()
 
 
+@pytest.mark.asyncio
+async def test_load_checkpoints_from_store(fake_dlmgr):
+    """
+    Test whether we are resuming downloads from the checkpoint store, and import legacy .conf files into it
+    """
+    fake_dlmgr.start_download = Mock()
+    conf_file = TESTS_DATA_DIR / "config_files/13a25451c761b1482d3e85432f07c4be05ca8a56.conf"
+    config = DownloadConfig.load(conf_file)
+    infohash = TorrentDef.load_from_dict(config.get_metainfo()).get_infohash()
+    fake_dlmgr.checkpoint_store.save(infohash, config, config.get_metainfo(), config.get_engineresumedata())
+    await fake_dlmgr.checkpoint_store.flush()
+
+    await fake_dlmgr.load_checkpoints()
+    # This download has finished, so it is restored in the background
+    await gather(*fake_dlmgr.get_tasks())
+    fake_dlmgr.start_download.assert_called_once()
+    assert fake_dlmgr.start_download.call_args[1]['tdef'].get_infohash() == infohash
+
+    # A legacy .conf file is removed once its checkpoint is in the store
+    legacy_file = fake_dlmgr.get_checkpoint_dir() / conf_file.name
+    shutil.copy(conf_file, legacy_file)
+    await fake_dlmgr.load_checkpoints()
+    assert not legacy_file.exists()
+
+
+@pytest.mark.asyncio
+async def test_load_checkpoints_keep_legacy_file(fake_dlmgr):
+    """
+    Test whether a legacy .conf file is kept if its checkpoint could not be written to the checkpoint store
+    """
+    fake_dlmgr.start_download = Mock()
+    conf_file = TESTS_DATA_DIR / "config_files/13a25451c761b1482d3e85432f07c4be05ca8a56.conf"
+    config = DownloadConfig.load(conf_file)
+    infohash = TorrentDef.load_from_dict(config.get_metainfo()).get_infohash()
+    fake_dlmgr.checkpoint_store.save(infohash, config, config.get_metainfo(), config.get_engineresumedata())
+    fake_dlmgr.checkpoint_store._write = Mock(side_effect=sqlite3.OperationalError)  # pylint: disable=protected-access
+
+    fake_dlmgr.get_checkpoint_dir().mkdir(parents=True, exist_ok=True)
+    legacy_file = fake_dlmgr.get_checkpoint_dir() / conf_file.name
+    shutil.copy(conf_file, legacy_file)
+    await fake_dlmgr.load_checkpoints()
+    assert infohash in fake_dlmgr.checkpoint_store
+    assert legacy_file.exists()
+
+
+def test_restore_priority():
+    config = DownloadConfig()
+    assert get_restore_priority(config, {}) == RESTORE_PRIORITY_VISIBLE
+    assert get_restore_priority(config, {b'finished_time': 10}) == RESTORE_PRIORITY_FINISHED
+    config.set_user_stopped(True)
+    assert get_restore_priority(config, {b'finished_time': 10}) == RESTORE_PRIORITY_STOPPED
+
+    # Channel downloads are restored before load_checkpoints returns, even if they are finished or stopped
+    config.set_channel_download(True)
+    assert get_restore_priority(config, {}) == RESTORE_PRIORITY_HIDDEN
+    assert get_restore_priority(config, {b'seed_mode': True}) == RESTORE_PRIORITY_HIDDEN
+    assert get_restore_priority(config, {b'finished_time': 10}) == RESTORE_PRIORITY_HIDDEN
+
+
+@pytest.mark.asyncio
+async def test_load_checkpoints_active_first(fake_dlmgr, tmpdir):
+    """
+    Test whether active downloads are restored before load_checkpoints returns, and stopped downloads afterwards
+    """
+    started = []
+    fake_dlmgr.start_download = lambda tdef, config: started.append(tdef.get_infohash())
+
+    for index, user_stopped in enumerate([True, False]):
+        tdef = TorrentDefNoMetainfo(bytes([index]) * 20, f'test{index}')
+        config = DownloadConfig(state_dir=tmpdir)
+        config.set_user_stopped(user_stopped)
+        metainfo = {'infohash': tdef.get_infohash(), 'name': tdef.get_name()}
+        fake_dlmgr.checkpoint_store.save(tdef.get_infohash(), config, metainfo, {})
+    await fake_dlmgr.checkpoint_store.flush()
+
+    await fake_dlmgr.load_checkpoints()
+    assert started == [b'\x01' * 20]
+    await gather(*fake_dlmgr.get_tasks())
+    assert started == [b'\x01' * 20, b'\x00' * 20]
+
+
 @pytest.mark.asyncio
 async def test_load_checkpoints(fake_dlmgr, tmpdir):
     """
@@ -463,3 +672,37 @@ async def test_check_for_dht_ready(fake_dlmgr):
     fake_dlmgr.get_session().status().dht_nodes = 1000
     # If the session has enough peers, it should finish instantly
     await fake_dlmgr._check_dht_ready()
+
+
+@pytest.mark.asyncio
+async def test_ip_filter_updates_coalesced(fake_dlmgr):
+    """
+    Test whether changes to the IP filter are applied incrementally, and whether the changes that follow a push are
+    pushed to libtorrent in one go
+    """
+    ltsession = Mock()
+    fake_dlmgr.ltsessions[1] = ltsession
+
+    # The first change is pushed immediately
+    fake_dlmgr.allow_ip(1, '5.5.5.5')
+    ip_filter = fake_dlmgr.get_ip_filter(1)
+    ltsession.set_ip_filter.assert_called_once_with(ip_filter)
+    ltsession.set_ip_filter.reset_mock()
+
+    fake_dlmgr.allow_ip(1, '2.2.2.2')
+    fake_dlmgr.allow_ip(1, '3.3.3.3')
+    fake_dlmgr.block_ip(1, '2.2.2.2')
+    assert ip_filter.access('1.1.1.1') == 0
+    assert ip_filter.access('2.2.2.2') == 1
+    assert ip_filter.access('3.3.3.3') == 0
+    assert ip_filter.access('4.4.4.4') == 1
+    ltsession.set_ip_filter.assert_not_called()
+
+    await sleep(IP_FILTER_UPDATE_INTERVAL + 0.1)
+    ltsession.set_ip_filter.assert_called_once_with(ip_filter)
+    ltsession.set_ip_filter.reset_mock()
+
+    # After a quiet interval, a change is pushed immediately again
+    await sleep(IP_FILTER_UPDATE_INTERVAL + 0.1)
+    fake_dlmgr.block_ip(1, '3.3.3.3')
+    ltsession.set_ip_filter.assert_called_once_with(ip_filter)
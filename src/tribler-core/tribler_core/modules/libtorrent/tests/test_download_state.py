@@ -44,6 +44,7 @@ def test_getters_setters_1(mock_download):
     assert download_state.get_current_speed(UPLOAD) == 0
     assert download_state.get_total_transferred(UPLOAD) == 0
     assert download_state.get_num_seeds_peers() == (0, 0)
+    assert download_state.get_num_connected_peers() == 0
     assert download_state.get_peerlist() == []
 
     mock_download.config.get_hops = lambda: 1
@@ -65,6 +66,8 @@ def test_getters_setters_2(mock_download, mock_lt_status):
     assert download_state.get_seeding_ratio() == 0.5
     assert download_state.get_eta() == 0.25
     assert download_state.get_num_seeds_peers() == (5, 5)
+    mock_lt_status.num_peers = 3
+    assert download_state.get_num_connected_peers() == 3
     assert download_state.get_pieces_complete() == []
     assert download_state.get_pieces_total_complete() == (0, 0)
     assert download_state.get_seeding_time() == 10
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from tribler_core.modules.libtorrent.metainfo_cache import (
+    FAILURE_BACKOFF_BASE,
+    FAILURE_BACKOFF_MAX,
+    METAINFO_CACHE_FILENAME,
+    MetainfoCache,
+    get_failure_backoff,
+)
+from tribler_core.utilities.libtorrent_helper import libtorrent as lt
+
+INFOHASH = b'a' * 20
+METAINFO = {b'info': {b'name': b'test'}}
+
+
+@pytest.fixture(name='cache')
+async def fixture_cache(tmpdir):
+    cache = MetainfoCache(tmpdir / METAINFO_CACHE_FILENAME)
+    yield cache
+    await cache.close()
+
+
+def test_lru_bounded_by_size(tmpdir):
+    size = len(lt.bencode(METAINFO))
+    cache = MetainfoCache(tmpdir / METAINFO_CACHE_FILENAME, max_memory_size=size * 2)
+    cache.put(b'a' * 20, METAINFO)
+    cache.put(b'b' * 20, METAINFO)
+    assert cache.get(b'a' * 20) == METAINFO
+
+    cache.put(b'c' * 20, METAINFO)
+    assert b'a' * 20 in cache
+    assert b'b' * 20 not in cache
+    assert cache.memory_size == size * 2
+
+    cache.put(b'd' * 20, {b'info': b'x' * size * 2})
+    assert b'd' * 20 not in cache
+    assert len(cache) == 2
+
+
+@pytest.mark.asyncio
+async def test_store_persistent(cache):
+    await cache.store(INFOHASH, METAINFO)
+    await cache.close()
+
+    reopened = MetainfoCache(cache.db_path)
+    assert INFOHASH not in reopened
+    assert await reopened.lookup(INFOHASH) == METAINFO
+    assert INFOHASH in reopened
+    assert await reopened.lookup(b'b' * 20) is None
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_stored_entries_bounded(tmpdir):
+    cache = MetainfoCache(tmpdir / METAINFO_CACHE_FILENAME, max_memory_size=0, max_stored=2)
+    for i in range(3):
+        await cache.store(bytes([i]) * 20, METAINFO)
+    assert await cache.lookup(b'\x00' * 20) is None
+    assert await cache.lookup(b'\x02' * 20) == METAINFO
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_failure_backoff(cache):
+    assert await cache.get_backoff(INFOHASH) == 0
+
+    await cache.add_failure(INFOHASH)
+    assert 0 < await cache.get_backoff(INFOHASH) <= FAILURE_BACKOFF_BASE
+    await cache.add_failure(INFOHASH)
+    assert FAILURE_BACKOFF_BASE < await cache.get_backoff(INFOHASH) <= FAILURE_BACKOFF_BASE * 2
+    await cache.close()
+
+    reopened = MetainfoCache(cache.db_path)
+    assert await reopened.get_backoff(INFOHASH) > FAILURE_BACKOFF_BASE
+    await reopened.store(INFOHASH, METAINFO)
+    assert await reopened.get_backoff(INFOHASH) == 0
+    await reopened.close()
+
+
+def test_get_failure_backoff():
+    assert get_failure_backoff(1) == FAILURE_BACKOFF_BASE
+    assert get_failure_backoff(3) == FAILURE_BACKOFF_BASE * 4
+    assert get_failure_backoff(100) == FAILURE_BACKOFF_MAX
+
+
+@pytest.mark.asyncio
+async def test_expired_failures_removed(cache):
+    await cache.add_failure(INFOHASH)
+    await cache.close()
+    with cache._connect():
+        cache._connection.execute("UPDATE failure SET retry_after = ?", (time.time() - FAILURE_BACKOFF_MAX - 1,))
+    await cache.close()
+
+    reopened = MetainfoCache(cache.db_path)
+    assert await reopened.get_backoff(INFOHASH) == 0
+    assert not reopened._failures
+    await reopened.close()
@@ -0,0 +1,189 @@
+from asyncio import ensure_future, sleep, wait_for
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from tribler_core.modules.libtorrent.stream import (
+    DEFAULT_BITRATE,
+    MAX_BITRATE,
+    MIN_PIECE_PRIO,
+    MIN_READAHEAD_SIZE,
+    READAHEAD_TIME,
+    StreamChunk,
+)
+
+
+@pytest.mark.asyncio
+async def test_wait_for_piece(test_download):
+    """
+    Test whether waiting for a piece ends as soon as the piece_finished_alert arrives
+    """
+    stream = test_download.stream
+    pieces = set()
+    stream.havepiece = lambda piece: piece in pieces
+
+    waiter = ensure_future(stream.wait_for_piece(3, timeout=10))
+    await sleep(0.01)
+    assert not waiter.done()
+
+    pieces.add(3)
+    test_download.post_alert('piece_finished_alert', {'piece_index': 3})
+    assert await waiter
+    assert not stream.piecewaiters
+
+
+@pytest.mark.asyncio
+async def test_wait_for_piece_timeout(test_download):
+    stream = test_download.stream
+    stream.havepiece = lambda _: False
+    assert not await stream.wait_for_piece(3, timeout=0.01)
+
+
+@pytest.mark.asyncio
+async def test_resolve_waiters(test_download):
+    stream = test_download.stream
+    stream.havepiece = lambda _: False
+
+    waiter = ensure_future(stream.wait_for_piece(3, timeout=10))
+    await sleep(0.01)
+    stream.resolvewaiters()
+    assert not await waiter
+
+
+def test_readahead_follows_bitrate(test_download):
+    stream = test_download.stream
+    stream.filesize = 10 ** 10
+    assert stream.readaheadsize == DEFAULT_BITRATE * READAHEAD_TIME
+
+    # Reads that are too close to each other are ignored
+    stream.update_bitrate(1024 * 1024, 0.001)
+    assert stream.bitrate == DEFAULT_BITRATE
+
+    for _ in range(50):
+        stream.update_bitrate(64 * 1024, 1)
+    assert stream.readaheadsize == MIN_READAHEAD_SIZE
+
+    for _ in range(50):
+        stream.update_bitrate(100 * 1024 * 1024, 1)
+    assert stream.bitrate == pytest.approx(MAX_BITRATE, rel=1e-3)
+
+    stream.filesize = 1000
+    assert stream.readaheadsize == 1000
+
+
+@pytest.fixture(name='stream')
+def fixture_stream(test_download):
+    """
+    A stream for the first file of a download, covering pieces 0-99
+    """
+    stream = test_download.stream
+    stream.infohash = b'a' * 20
+    stream.fileindex = 0
+    stream.firstpiece = 0
+    stream.lastpiece = 99
+    stream.consecend = 0
+    stream._Stream__getfileprios = lambda: [7]
+    stream._Stream__getpieceprios = lambda: [4] * 100
+    stream._Stream__setpieceprios = Mock()
+    stream._Stream__setdeadline = Mock()
+    stream._Stream__resetdeadline = Mock()
+    stream._Stream__setselectedfiles = Mock()
+    return stream
+
+
+def get_prio_changes(stream):
+    changes = dict(stream._Stream__setpieceprios.call_args[0][0])
+    stream._Stream__setpieceprios.reset_mock()
+    return changes
+
+
+@pytest.mark.asyncio
+async def test_updateprios_static_buffer(stream):
+    """
+    Test whether only the header and footer pieces are downloaded while static buffering
+    """
+    stream.headerpieces = [0, 1]
+    stream.footerpieces = [99]
+    await stream.updateprios()
+
+    changes = get_prio_changes(stream)
+    assert len(changes) == 100
+    assert changes[0] == changes[1] == changes[99] == 7
+    assert changes[50] == 0
+    stream._Stream__setdeadline.assert_any_call(99, 0)
+
+    # Nothing changed, so nothing should be passed to libtorrent
+    await stream.updateprios()
+    stream._Stream__setpieceprios.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_updateprios_sliding_window(stream):
+    """
+    Test whether moving the buffer of a reader only updates the pieces that changed
+    """
+    stream.cursorpiecemap[0] = [False, [2, 3, 4]]
+    await stream.updateprios()
+    changes = get_prio_changes(stream)
+    assert len(changes) == 100
+    assert (changes[2], changes[3], changes[4], changes[5]) == (7, 6, 6, MIN_PIECE_PRIO)
+
+    stream.on_piece_finished(2)
+    stream.cursorpiecemap[0] = [False, [3, 4, 5]]
+    await stream.updateprios()
+    assert get_prio_changes(stream) == {3: 7, 5: 6}
+
+    # A second reader further on in the file
+    stream.cursorpiecemap[50] = [False, [50, 4]]
+    await stream.updateprios()
+    assert get_prio_changes(stream) == {50: 7}
+
+    # Pieces that leave the buffers get the default priority again
+    stream.cursorpiecemap.pop(0)
+    await stream.updateprios()
+    assert get_prio_changes(stream) == {3: MIN_PIECE_PRIO, 5: MIN_PIECE_PRIO}
+    stream._Stream__resetdeadline.assert_any_call(3)
+
+
+def test_cached_progress(stream):
+    stream.headerpieces = [0, 1, 2, 3]
+    stream.prebuffpieces = [1, 2]
+    assert stream.headerprogress == 0
+
+    stream.on_piece_finished(1)
+    stream.on_piece_finished(2)
+    assert stream.headerprogress == 0.5
+    assert stream.prebuffprogress == 1
+    assert stream.prebuffprogress_consec == 0
+
+    stream.on_piece_finished(0)
+    assert stream.prebuffprogress_consec == 1
+    assert list(stream.iterpieces(have=True, consec=True)) == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_chunk_open_waits_for_file(tmpdir):
+    """
+    Test whether opening a chunk keeps yielding to the event loop while the file is not on disk yet, even if the
+    piece is already available
+    """
+    async def wait_for_piece(_):
+        return True
+
+    stream = Mock(enabled=True, filename=Path(tmpdir) / 'video.mp4', wait_for_piece=wait_for_piece)
+    stream.bytetopiece = lambda _: 0
+    stream.cursorpiecemap = {}
+    chunk = StreamChunk(stream)
+
+    opener = ensure_future(chunk.open())
+    await sleep(0.01)
+    assert not opener.done()
+
+    stream.filename.write_bytes(b'data')
+    await wait_for(opener, timeout=5)
+    assert chunk._readfile(0, 4) == b'data'
+
+    # Reading from a chunk that has been closed in the meantime returns nothing
+    chunk.close()
+    assert chunk._readfile(0, 4) == b''
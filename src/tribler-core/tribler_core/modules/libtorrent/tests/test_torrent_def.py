@@ -1,4 +1,5 @@
 import shutil
+from hashlib import sha1
 
 from aiohttp import ClientResponseError
 
@@ -6,7 +7,7 @@ from libtorrent import bencode
 
 import pytest
 
-from tribler_core.modules.libtorrent.torrentdef import TorrentDef, TorrentDefNoMetainfo
+from tribler_core.modules.libtorrent.torrentdef import FileTable, TorrentDef, TorrentDefNoMetainfo
 from tribler_core.tests.tools.common import TESTS_DATA_DIR, TORRENT_UBUNTU_FILE
 from tribler_core.utilities.path_util import Path
 from tribler_core.utilities.utilities import bdecode_compat
@@ -183,6 +184,20 @@ def test_load_from_dict():
     assert TorrentDef.load_from_dict(bdecode_compat(encoded_metainfo))
 
 
+def test_get_torrent_info():
+    """
+    Test whether the torrent_info built during validation is reused once, and has the same infohash
+    """
+    with open(TESTS_DATA_DIR / "bak_single.torrent", mode='rb') as torrent_file:
+        metainfo = bdecode_compat(torrent_file.read())
+    tdef = TorrentDef.load_from_dict(metainfo)
+    assert tdef.get_infohash() == sha1(bencode(metainfo[b'info'])).digest()
+
+    torrent_info = tdef.get_torrent_info()
+    assert torrent_info.info_hash().to_bytes() == tdef.get_infohash()
+    assert tdef.get_torrent_info() is not torrent_info
+
+
 def test_torrent_no_metainfo():
     tdef = TorrentDefNoMetainfo(b"12345678901234567890", VIDEO_FILE_NAME, "http://google.com")
     assert tdef.get_name() == VIDEO_FILE_NAME
@@ -258,3 +273,49 @@ def test_get_files_with_length(tdef):
     tdef.metainfo = {b'info': {b'files': [{b'path.utf-8': [b'test\xff' + name_bytes], b'length': 123},
                                        {b'path': [b'file.txt'], b'length': 456}]}}
     assert tdef.get_files_with_length() == [(Path('file.txt'), 456)]
+
+
+def test_file_table_piece_mapping():
+    """
+    Test the mapping between files and pieces of the file table
+    """
+    file_table = FileTable([Path('a.txt'), Path('b.mkv'), Path('c.txt'), Path('d.txt')], [10, 25, 0, 5],
+                           piece_length=16)
+    assert len(file_table) == 4
+    assert file_table.total_length == 40
+    assert list(file_table.offsets) == [0, 10, 35, 35, 40]
+    assert file_table.get_files_with_length(exts=['mkv']) == [(Path('b.mkv'), 25)]
+
+    assert file_table.get_file_piece_range(0) == range(0, 1)
+    assert file_table.get_file_piece_range(1) == range(0, 3)
+    assert not file_table.get_file_piece_range(2)
+    assert file_table.get_file_piece_range(3) == range(2, 3)
+
+    assert file_table.get_piece_file_range(0) == range(0, 2)
+    assert file_table.get_piece_file_range(1) == range(1, 2)
+    assert list(file_table.get_piece_file_range(2)) == [1, 2, 3]
+
+
+def test_file_table_no_piece_length():
+    """
+    Test whether the file table maps files and pieces to empty ranges if the piece length is unknown
+    """
+    file_table = FileTable([Path('a.txt'), Path('b.txt')], [10, 0])
+    assert not file_table.get_file_piece_range(0)
+    assert not file_table.get_file_piece_range(1)
+    assert not file_table.get_piece_file_range(0)
+
+
+def test_file_table_cached(tdef):
+    """
+    Test whether the file table is cached until the metainfo is replaced
+    """
+    tdef.metainfo = {b'info': {b'files': [{b'path': [b'file.txt'], b'length': 456}], b'piece length': 2 ** 16}}
+    assert tdef.get_file_table() is tdef.get_file_table()
+    assert tdef.get_file_piece_range(0) == range(0, 1)
+    assert tdef.get_piece_file_range(0) == range(0, 1)
+
+    tdef.metainfo = {b'info': {b'files': [{b'path': [b'other.txt'], b'length': 123}]}}
+    assert tdef.get_files_with_length() == [(Path('other.txt'), 123)]
+    assert tdef.get_length() == 123
+    assert not tdef.get_file_piece_range(0)
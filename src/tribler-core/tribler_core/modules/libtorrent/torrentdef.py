@@ -2,7 +2,11 @@
 Author(s): Arno Bakker
 """
 import logging
+from array import array
+from binascii import unhexlify
+from bisect import bisect_left, bisect_right
 from hashlib import sha1
+from itertools import accumulate
 
 import aiohttp
 
@@ -39,6 +43,71 @@ def escape_as_utf8(string, encoding='utf8'):
             return string.encode('utf8', 'ignore').decode('utf8')
 
 
+class FileTable:
+    """
+    A compact, decoded representation of the files in a torrent.
+
+    The files are kept in parallel arrays, in the order of the metainfo, so the index of a file is the file index
+    libtorrent uses. Files whose name could not be decoded have None as name and are left out of the file lists.
+    """
+
+    __slots__ = ('names', 'extensions', 'lengths', 'offsets', 'piece_length')
+
+    def __init__(self, names, lengths, piece_length=0):
+        self.names = tuple(names)
+        self.extensions = tuple(get_extension(name) if name is not None else None for name in self.names)
+        self.lengths = array('q', lengths)
+        self.offsets = array('q', [0])
+        self.offsets.extend(accumulate(self.lengths))
+        self.piece_length = piece_length
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def total_length(self):
+        return sum(length for length in self.lengths if length > 0)
+
+    def get_files_with_length(self, exts=None):
+        return [(name, self.lengths[index]) for index, name in enumerate(self.names)
+                if name is not None and (exts is None or self.extensions[index] in exts)]
+
+    def get_file_piece_range(self, index):
+        """
+        Get the pieces that contain the data of a file.
+        :param index: The index of the file in the torrent
+        :return: A range of piece indices, which is empty for a zero-length file or an unknown piece length
+        """
+        if self.piece_length <= 0:
+            return range(0)
+        begin = self.offsets[index]
+        if self.lengths[index] <= 0:
+            return range(begin // self.piece_length, begin // self.piece_length)
+        return range(begin // self.piece_length, (begin + self.lengths[index] - 1) // self.piece_length + 1)
+
+    def get_piece_file_range(self, piece):
+        """
+        Get the files that have data in a piece.
+        :param piece: The index of the piece
+        :return: A range of file indices, which is empty for an unknown piece length
+        """
+        if self.piece_length <= 0:
+            return range(0)
+        begin = piece * self.piece_length
+        end = begin + self.piece_length
+        return range(max(bisect_right(self.offsets, begin) - 1, 0), min(bisect_left(self.offsets, end), len(self)))
+
+
+def get_extension(filename):
+    """
+    Get the lowercase extension of a filename, without the leading dot.
+    """
+    ext = path_util.Path(filename).suffix
+    if ext != "" and ext[0] == ".":
+        ext = ext[1:]
+    return ext.lower()
+
+
 class TorrentDef:
     """
     This object acts as a wrapper around some libtorrent metadata.
@@ -54,24 +123,58 @@ class TorrentDef:
         """
         self._logger = logging.getLogger(self.__class__.__name__)
         self.torrent_parameters = {}
-        self.metainfo = None
+        self._metainfo = None
+        self._file_table = None
+        self._name_as_unicode = None
         self.files_list = []
         self.infohash = None
+        # The torrent_info that was built while validating the metainfo, see get_torrent_info
+        self._torrent_info = None
 
         if metainfo is not None:
             # First, make sure the passed metainfo is valid
             if not ignore_validation:
                 try:
-                    lt.torrent_info(metainfo)
+                    self._torrent_info = lt.torrent_info(metainfo)
                 except RuntimeError as exc:
                     raise ValueError(str(exc))
             self.metainfo = metainfo
-            self.infohash = sha1(lt.bencode(self.metainfo[b'info'])).digest()
+            self.infohash = self._get_v1_infohash() or sha1(lt.bencode(self.metainfo[b'info'])).digest()
             self.copy_metainfo_to_torrent_parameters()
 
         elif torrent_parameters:
             self.torrent_parameters.update(torrent_parameters)
 
+    @property
+    def metainfo(self):
+        return self._metainfo
+
+    @metainfo.setter
+    def metainfo(self, metainfo):
+        self._metainfo = metainfo
+        # Values derived from the metainfo are decoded lazily and cached until the metainfo is replaced
+        self._file_table = None
+        self._name_as_unicode = None
+
+    def _get_v1_infohash(self):
+        """
+        Get the SHA1 infohash that libtorrent already computed while validating the metainfo, if any.
+        """
+        if self._torrent_info is None:
+            return None
+        if hasattr(self._torrent_info, 'info_hashes'):
+            info_hashes = self._torrent_info.info_hashes()
+            return unhexlify(str(info_hashes.v1)) if info_hashes.has_v1() else None
+        return unhexlify(str(self._torrent_info.info_hash()))
+
+    def get_torrent_info(self):
+        """
+        Get a libtorrent torrent_info for this torrent. The instance that was built during validation is handed
+        out only once, since libtorrent may modify it (e.g., when renaming files) after the torrent has been added.
+        """
+        torrent_info, self._torrent_info = self._torrent_info, None
+        return torrent_info or lt.torrent_info(self.metainfo)
+
     def copy_metainfo_to_torrent_parameters(self):
         """
         Populate the torrent_parameters dictionary with information from the metainfo.
@@ -264,6 +367,11 @@ class TorrentDef:
     def get_name_as_unicode(self):
         """ Returns the info['name'] field as Unicode string.
         @return Unicode string. """
+        if self._name_as_unicode is None:
+            self._name_as_unicode = self._decode_name()
+        return self._name_as_unicode
+
+    def _decode_name(self):
         if self.metainfo and b"name.utf-8" in self.metainfo[b"info"]:
             # There is an utf-8 encoded name.  We assume that it is
             # correctly encoded and use it normally
@@ -318,78 +426,83 @@ class TorrentDef:
         """
         torrent_dict = create_torrent_file(self.files_list, self.torrent_parameters, torrent_filepath=torrent_filepath)
         self.metainfo = bdecode_compat(torrent_dict['metainfo'])
+        self._torrent_info = None
         self.copy_metainfo_to_torrent_parameters()
         self.infohash = torrent_dict['infohash']
 
-    def _get_all_files_as_unicode_with_length(self):
-        """ Get a generator for files in the torrent def. No filtering
-        is possible and all tricks are allowed to obtain a unicode
-        list of filenames.
-        @return A unicode filename generator.
-        """
-        if self.metainfo and b"files" in self.metainfo[b"info"]:
-            # Multi-file torrent
-            files = self.metainfo[b"info"][b"files"]
-
-            for file_dict in files:
-                if b"path.utf-8" in file_dict:
-                    # This file has an utf-8 encoded list of elements.
-                    # We assume that it is correctly encoded and use
-                    # it normally
-                    try:
-                        yield (Path(*[ensure_unicode(element, "UTF-8") for element in file_dict[b"path.utf-8"]]),
-                               file_dict[b"length"])
-                        continue
-                    except UnicodeError:
-                        pass
-
-                if b"path" in file_dict:
-                    # Try to use the 'encoding' field.  If it exists,
-                    # it should contain something like 'utf-8'
-                    if b"encoding" in self.metainfo:
-                        encoding = ensure_unicode(self.metainfo[b"encoding"], "utf8")
-                        try:
-                            yield (Path(*[ensure_unicode(element, encoding) for element in file_dict[b"path"]]),
-                                   file_dict[b"length"])
-                            continue
-                        except UnicodeError:
-                            pass
-                        except LookupError:
-                            # Some encodings are not supported by
-                            # python.  For instance, the MBCS codec
-                            # which is used by Windows is not
-                            # supported (Jan 2010)
-                            pass
-
-                    # Try to convert the names in path to unicode,
-                    # assuming that it was encoded as utf-8
-                    try:
-                        yield (Path(*[ensure_unicode(element, "UTF-8") for element in file_dict[b"path"]]),
-                               file_dict[b"length"])
-                        continue
-                    except UnicodeError:
-                        pass
-
-                    # Convert the names in path to unicode by
-                    # replacing out all characters that may -even
-                    # remotely- cause problems with the '?' character
-                    try:
-                        def filter_characters(name):
-                            def filter_character(char):
-                                if 0 < char < 128:
-                                    return chr(char)
-                                self._logger.debug("Bad character 0x%X", char)
-                                return "?"
-                            return "".join([filter_character(char) for char in name])
-                        yield (Path(*[filter_characters(element) for element in file_dict[b"path"]]),
-                               file_dict[b"length"])
-                        continue
-                    except UnicodeError:
-                        pass
-
-        elif self.metainfo:
-            # Single-file torrent
-            yield self.get_name_as_unicode(), self.metainfo[b"info"][b"length"]
+    def _get_all_files_as_unicode(self):
+        """ Get the names of all files in a multi-file torrent def, in torrent order.
+        All tricks are allowed to obtain a unicode list of filenames.
+        @return A list of unicode paths, with None for files whose name could not be decoded.
+        """
+        encoding = None
+        if b"encoding" in self.metainfo:
+            encoding = ensure_unicode(self.metainfo[b"encoding"], "utf8")
+        return [self._decode_file_path(file_dict, encoding) for file_dict in self.metainfo[b"info"][b"files"]]
+
+    def _decode_file_path(self, file_dict, encoding):
+        if b"path.utf-8" in file_dict:
+            # This file has an utf-8 encoded list of elements.
+            # We assume that it is correctly encoded and use
+            # it normally
+            try:
+                return Path(*[ensure_unicode(element, "UTF-8") for element in file_dict[b"path.utf-8"]])
+            except UnicodeError:
+                pass
+
+        if b"path" in file_dict:
+            # Try to use the 'encoding' field.  If it exists,
+            # it should contain something like 'utf-8'
+            if encoding:
+                try:
+                    return Path(*[ensure_unicode(element, encoding) for element in file_dict[b"path"]])
+                except UnicodeError:
+                    pass
+                except LookupError:
+                    # Some encodings are not supported by
+                    # python.  For instance, the MBCS codec
+                    # which is used by Windows is not
+                    # supported (Jan 2010)
+                    pass
+
+            # Try to convert the names in path to unicode,
+            # assuming that it was encoded as utf-8
+            try:
+                return Path(*[ensure_unicode(element, "UTF-8") for element in file_dict[b"path"]])
+            except UnicodeError:
+                pass
+
+            # Convert the names in path to unicode by
+            # replacing out all characters that may -even
+            # remotely- cause problems with the '?' character
+            try:
+                def filter_characters(name):
+                    def filter_character(char):
+                        if 0 < char < 128:
+                            return chr(char)
+                        self._logger.debug("Bad character 0x%X", char)
+                        return "?"
+                    return "".join([filter_character(char) for char in name])
+                return Path(*[filter_characters(element) for element in file_dict[b"path"]])
+            except UnicodeError:
+                pass
+        return None
+
+    def get_file_table(self):
+        """
+        Get the decoded file table of this torrent. The file table is built once and cached.
+        """
+        if self._file_table is None:
+            names, lengths = [], []
+            if self.metainfo and b"files" in self.metainfo[b"info"]:
+                names = self._get_all_files_as_unicode()
+                lengths = [file_dict[b"length"] for file_dict in self.metainfo[b"info"][b"files"]]
+            elif self.metainfo:
+                names = [self.get_name_as_unicode()]
+                lengths = [self.metainfo[b"info"][b"length"]]
+            piece_length = self.metainfo[b"info"].get(b"piece length", 0) if self.metainfo else 0
+            self._file_table = FileTable(names, lengths, piece_length)
+        return self._file_table
 
     def get_files_with_length(self, exts=None):
         """ The list of files in the torrent def.
@@ -397,18 +510,23 @@ class TorrentDef:
         to search for.
         @return A list of filenames.
         """
-        videofiles = []
-        for filename, length in self._get_all_files_as_unicode_with_length():
-            ext = path_util.Path(filename).suffix
-            if ext != "" and ext[0] == ".":
-                ext = ext[1:]
-            if exts is None or ext.lower() in exts:
-                videofiles.append((filename, length))
-        return videofiles
+        return self.get_file_table().get_files_with_length(exts)
 
     def get_files(self, exts=None):
         return [filename for filename, _ in self.get_files_with_length(exts)]
 
+    def get_file_piece_range(self, index):
+        """
+        Returns the range of pieces that contain the data of the file with the given index.
+        """
+        return self.get_file_table().get_file_piece_range(index)
+
+    def get_piece_file_range(self, piece):
+        """
+        Returns the range of indices of the files that have data in the piece with the given index.
+        """
+        return self.get_file_table().get_piece_file_range(piece)
+
     def get_length(self, selectedfiles=None):
         """ Returns the total size of the content in the torrent. If the
         optional selectedfiles argument is specified, the method returns
@@ -416,6 +534,9 @@ class TorrentDef:
         @return A length (long)
         """
         if self.metainfo:
+            if not selectedfiles:
+                return self.get_file_table().total_length if self.is_multifile_torrent() \
+                    else self.metainfo[b'info'][b'length']
             return maketorrent.get_length_from_metainfo(self.metainfo, selectedfiles)
         return 0
 
@@ -12,11 +12,11 @@ from pony.orm import db_session
 from tribler_common.simpledefs import CHANNELS_VIEW_UUID, NTFY
 
 from tribler_core.modules.metadata_store.community.discovery_booster import DiscoveryBooster
+from tribler_core.modules.metadata_store.community.remote_search import REMOTE_SEARCH_TIMEOUT, RemoteSearch
 from tribler_core.modules.metadata_store.payload_checker import ObjState
 from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT
 from tribler_core.modules.metadata_store.utils import NoChannelSourcesException
 from tribler_core.modules.remote_query_community.community import RemoteQueryCommunity
-from tribler_core.utilities.unicode import hexlify
 
 minimal_blob_size = 200
 maximum_payload_size = 1024
@@ -120,9 +120,11 @@ class GigaChannelCommunity(RemoteQueryCommunity):
         def on_packet_callback(_, processing_results):
             # We use responses for requests about subscribed channels to bump our local channels ratings
             with db_session:
+                channel_keys = []
                 for c in (r.md_obj for r in processing_results if r.md_obj.metadata_type == CHANNEL_TORRENT):
-                    self.mds.vote_bump(c.public_key, c.id_, peer.public_key.key_to_bin()[10:])
+                    channel_keys.append((c.public_key, c.id_))
                     self.channels_peers.add(peer, c.public_key, c.id_)
+                self.mds.vote_bump_channels(channel_keys, peer.public_key.key_to_bin()[10:])
 
             # Notify GUI about the new channels
             results = [
@@ -160,18 +162,6 @@ class GigaChannelCommunity(RemoteQueryCommunity):
         # Send a remote query request to multiple random peers to search for some terms
         request_uuid = uuid.uuid4()
 
-        def notify_gui(request, processing_results):
-            results = [
-                r.md_obj.to_simple_dict()
-                for r in processing_results
-                if r.obj_state in (ObjState.NEW_OBJECT, ObjState.UPDATED_LOCAL_VERSION)
-            ]
-            if self.notifier:
-                self.notifier.notify(
-                    NTFY.REMOTE_QUERY_RESULTS,
-                    {"results": results, "uuid": str(request_uuid), "peer": hexlify(request.peer.mid)},
-                )
-
         # Try sending the request to at least some peers that we know have it
         if "channel_pk" in kwargs and "origin_id" in kwargs:
             peers_to_query = self.get_known_subscribed_peers_for_node(
@@ -180,8 +170,11 @@ class GigaChannelCommunity(RemoteQueryCommunity):
         else:
             peers_to_query = self.get_random_peers(self.rqc_settings.max_query_peers)
 
+        # The results of all peers are merged before they are pushed to the GUI
+        search = RemoteSearch(self, request_uuid, peers_to_query, self.settings.search_results_push_interval)
         for p in peers_to_query:
-            self.send_remote_select(p, **kwargs, processing_callback=notify_gui)
+            self.send_remote_select(p, **kwargs, processing_callback=search.on_results)
+        search.start(REMOTE_SEARCH_TIMEOUT)
 
         return request_uuid, peers_to_query
 
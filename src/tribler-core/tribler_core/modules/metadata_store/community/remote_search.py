@@ -0,0 +1,115 @@
+import time
+from asyncio import sleep
+
+from tribler_common.simpledefs import NTFY
+
+from tribler_core.modules.metadata_store.payload_checker import ObjState
+from tribler_core.modules.metadata_store.serialization import REGULAR_TORRENT
+from tribler_core.utilities.unicode import hexlify
+
+# Number of seconds after which the peers that did not respond to a search are reported as done. This matches the
+# timeout of the select requests.
+REMOTE_SEARCH_TIMEOUT = 10.0
+
+
+def get_entry_key(md_obj):
+    """
+    Torrents that are found through different peers or channels are the same torrent if they have the same infohash.
+    Other entries are identified by their public key and id.
+    """
+    if md_obj.metadata_type == REGULAR_TORRENT:
+        return md_obj.infohash
+    return md_obj.public_key, md_obj.id_
+
+
+def entries_to_dicts(entries):
+    return [md_obj.to_simple_dict() for md_obj in entries]
+
+
+class RemoteSearch:
+    """
+    Aggregates the responses of all peers that were sent the same search query.
+
+    New entries are deduplicated across peers and pushed to the GUI as merged REMOTE_QUERY_RESULTS events, at most
+    one event per push interval. Each event lists the peers that responded since the previous event. When all peers
+    responded, or the remaining peers timed out, the search is closed and the peers that never responded are reported
+    in a final event, so that the GUI does not have to wait for them.
+    """
+
+    def __init__(self, community, request_uuid, peers, push_interval):
+        self.community = community
+        self.uuid = request_uuid
+        self.push_interval = push_interval
+
+        self.unanswered_peers = {peer.mid for peer in peers}
+        # The peers that responded, and the entries that were received, since the last push
+        self.answered_peers = []
+        self.pending_entries = {}
+        # The keys of the entries that were received during this search
+        self.seen_keys = set()
+        self.last_push = 0
+        self.closed = False
+
+        self.push_task_name = f'remote_search_push:{request_uuid}'
+        self.close_task_name = f'remote_search_close:{request_uuid}'
+
+    def start(self, timeout):
+        """
+        Close the search after the given number of seconds, unless all peers responded before that.
+        """
+        if not self.closed and self.unanswered_peers:
+            self.community.register_task(self.close_task_name, self.close, delay=timeout)
+
+    def on_results(self, request, processing_results):
+        """
+        Add the results that a peer sent in response to the search query.
+        """
+        for result in processing_results:
+            if result.obj_state not in (ObjState.NEW_OBJECT, ObjState.UPDATED_LOCAL_VERSION):
+                continue
+            key = get_entry_key(result.md_obj)
+            # An entry that another peer already sent is only pushed again if it is an update of our local version
+            if key in self.seen_keys and result.obj_state == ObjState.NEW_OBJECT:
+                continue
+            self.seen_keys.add(key)
+            self.pending_entries[key] = result.md_obj
+
+        if request.peer.mid in self.unanswered_peers:
+            self.unanswered_peers.discard(request.peer.mid)
+            self.answered_peers.append(request.peer.mid)
+            if not self.unanswered_peers:
+                self.community.cancel_pending_task(self.close_task_name)
+                self.closed = True
+
+        self.schedule_push()
+
+    def close(self):
+        """
+        Stop waiting for the peers that did not respond yet and report them as done.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.answered_peers.extend(self.unanswered_peers)
+        self.unanswered_peers.clear()
+        self.schedule_push()
+
+    def schedule_push(self):
+        if (self.pending_entries or self.answered_peers) and not self.community.is_pending_task_active(
+            self.push_task_name
+        ):
+            self.community.register_task(self.push_task_name, self.push)
+
+    async def push(self):
+        while self.pending_entries or self.answered_peers:
+            await sleep(max(0.0, self.last_push + self.push_interval - time.time()))
+            entries, self.pending_entries = list(self.pending_entries.values()), {}
+            peers, self.answered_peers = self.answered_peers, []
+            self.last_push = time.time()
+
+            results = await self.community.mds.run_threaded(entries_to_dicts, entries) if entries else []
+            if self.community.notifier:
+                self.community.notifier.notify(
+                    NTFY.REMOTE_QUERY_RESULTS,
+                    {"results": results, "uuid": str(self.uuid), "peers": [hexlify(mid) for mid in peers]},
+                )
@@ -117,6 +117,8 @@ class TestGigaChannelUnits(TestBase):
         self.nodes[2].overlay.notifier = Notifier()
         self.nodes[2].overlay.notifier.notify = lambda sub, args: mock_notify(self.nodes[2].overlay, args)
 
+        # Push the merged results as soon as they arrive
+        self.nodes[2].overlay.settings.search_results_push_interval = 0
         self.nodes[2].overlay.send_search_request(**{"txt_filter": "ubuntu*"})
 
         await self.deliver_messages(timeout=0.5)
@@ -127,8 +129,9 @@ class TestGigaChannelUnits(TestBase):
                 self.nodes[2].overlay.mds.ChannelNode.select(lambda g: g.title in (U_CHANNEL, U_TORRENT)).count() == 2
             )
 
-        # Check that the notifier callback was called on both entries
-        assert [U_CHANNEL, U_TORRENT] == sorted([c["results"][0]["name"] for c in notification_calls])
+        # Check that the notifier callback was called on both entries, and that both peers are reported as done
+        assert [U_CHANNEL, U_TORRENT] == sorted(r["name"] for c in notification_calls for r in c["results"])
+        assert len([peer for c in notification_calls for peer in c["peers"]]) == 2
 
     def test_query_on_introduction(self):
         """
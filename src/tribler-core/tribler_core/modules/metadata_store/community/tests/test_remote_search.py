@@ -0,0 +1,99 @@
+from asyncio import sleep
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from ipv8.taskmanager import TaskManager
+
+import pytest
+
+from tribler_common.simpledefs import NTFY
+
+from tribler_core.modules.metadata_store.community.remote_search import RemoteSearch, get_entry_key
+from tribler_core.modules.metadata_store.payload_checker import ObjState
+from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT, REGULAR_TORRENT
+from tribler_core.utilities.unicode import hexlify
+
+
+class FakeEntry:
+    def __init__(self, metadata_type, public_key, id_, infohash=b''):
+        self.metadata_type = metadata_type
+        self.public_key = public_key
+        self.id_ = id_
+        self.infohash = infohash
+
+    def to_simple_dict(self):
+        return {"public_key": self.public_key, "id": self.id_}
+
+
+def make_request(mid):
+    return SimpleNamespace(peer=SimpleNamespace(mid=mid))
+
+
+def make_result(entry, obj_state=ObjState.NEW_OBJECT):
+    return SimpleNamespace(md_obj=entry, obj_state=obj_state)
+
+
+@pytest.fixture(name="community")
+async def fixture_community():
+    async def run_threaded(func, *args):
+        return func(*args)
+
+    community = TaskManager()
+    community.mds = Mock(run_threaded=run_threaded)
+    community.notifier = Mock()
+    yield community
+    await community.shutdown_task_manager()
+
+
+def get_notifications(community):
+    return [call.args[1] for call in community.notifier.notify.call_args_list
+            if call.args[0] == NTFY.REMOTE_QUERY_RESULTS]
+
+
+def test_get_entry_key():
+    assert get_entry_key(FakeEntry(REGULAR_TORRENT, b'a', 1, infohash=b'i')) == b'i'
+    assert get_entry_key(FakeEntry(CHANNEL_TORRENT, b'a', 1, infohash=b'i')) == (b'a', 1)
+
+
+@pytest.mark.asyncio
+async def test_merge_results(community):
+    """
+    Test whether the results of several peers are deduplicated and pushed at a bounded rate
+    """
+    peers = [SimpleNamespace(mid=b'1'), SimpleNamespace(mid=b'2')]
+    search = RemoteSearch(community, 'uuid', peers, push_interval=0.1)
+    search.start(10)
+
+    torrent = FakeEntry(REGULAR_TORRENT, b'a', 1, infohash=b'i')
+    same_torrent = FakeEntry(REGULAR_TORRENT, b'b', 2, infohash=b'i')
+    channel = FakeEntry(CHANNEL_TORRENT, b'c', 3)
+    search.on_results(make_request(b'1'), [make_result(torrent), make_result(channel, ObjState.LOCAL_VERSION_SAME)])
+    await sleep(0.01)
+    search.on_results(make_request(b'2'), [make_result(same_torrent), make_result(channel)])
+    assert search.closed
+    await sleep(0.01)
+
+    # The second batch waits for the push interval
+    assert len(get_notifications(community)) == 1
+    await sleep(0.15)
+    notifications = get_notifications(community)
+    assert notifications == [
+        {"results": [{"public_key": b'a', "id": 1}], "uuid": 'uuid', "peers": [hexlify(b'1')]},
+        {"results": [{"public_key": b'c', "id": 3}], "uuid": 'uuid', "peers": [hexlify(b'2')]},
+    ]
+    assert not community.get_tasks()
+
+
+@pytest.mark.asyncio
+async def test_close_on_timeout(community):
+    """
+    Test whether the peers that did not respond are reported as done when the search times out
+    """
+    peers = [SimpleNamespace(mid=b'1'), SimpleNamespace(mid=b'2')]
+    search = RemoteSearch(community, 'uuid', peers, push_interval=0.1)
+    search.start(0.05)
+
+    search.on_results(make_request(b'1'), [])
+    await sleep(0.2)
+    assert search.closed
+    assert [n["peers"] for n in get_notifications(community)] == [[hexlify(b'1')], [hexlify(b'2')]]
@@ -94,7 +94,9 @@ def define_binding(db):
                 self.health.trackers.add(tracker)
 
         def before_update(self):
-            self.add_tracker(self.tracker_info)
+            # Linking the tracker costs two queries, so only do it when the tracker has changed since loading
+            if self._dbvals_.get(TorrentMetadata.tracker_info) != self.tracker_info:
+                self.add_tracker(self.tracker_info)
 
         def get_magnet(self):
             return (f"magnet:?xt=urn:btih:{hexlify(self.infohash)}&dn={self.title}") + (
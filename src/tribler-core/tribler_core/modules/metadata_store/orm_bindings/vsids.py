@@ -5,6 +5,20 @@ from pony import orm
 from pony.orm import db_session
 
 from tribler_core.modules.metadata_store.orm_bindings.channel_node import LEGACY_ENTRY
+from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT
+
+
+def rescale_loaded(entity, attr, norm, condition=None):
+    """
+    Rescale the values of the given attribute for the objects of the entity that are already loaded in the current
+    db_session. This keeps these objects in sync with an UPDATE that was executed on the database directly.
+    """
+    cache = entity._database_._get_cache()  # pylint: disable=protected-access
+    for obj in cache.objects:
+        if not isinstance(obj, entity) or obj._status_ in ('deleted', 'cancelled') or attr not in obj._dbvals_:
+            continue
+        if condition is None or condition(obj):
+            obj._vals_[attr] = obj._dbvals_[attr] = obj._dbvals_[attr] / norm
 
 
 def define_binding(db):
@@ -46,10 +60,14 @@ def define_binding(db):
 
         @db_session
         def rescale(self, norm):
-            for channel in db.ChannelMetadata.select(lambda g: g.status != LEGACY_ENTRY):
-                channel.votes /= norm
-            for vote in db.ChannelVote.select():
-                vote.last_amount /= norm
+            # Rescale the votes with set-based UPDATEs instead of loading every channel and vote into Python
+            db.flush()
+            db.execute(f"UPDATE ChannelNode SET votes = votes / $norm "
+                       f"WHERE metadata_type = {CHANNEL_TORRENT} AND status != {LEGACY_ENTRY}")
+            db.execute("UPDATE ChannelVote SET last_amount = last_amount / $norm")
+            rescale_loaded(db.ChannelMetadata, db.ChannelMetadata.votes, norm,
+                           lambda obj: obj._vals_.get(db.ChannelMetadata.status) != LEGACY_ENTRY)
+            rescale_loaded(db.ChannelVote, db.ChannelVote.last_amount, norm)
 
             self.max_val /= norm
             self.total_activity /= norm
@@ -70,17 +88,25 @@ def define_binding(db):
 
         @db_session
         def bump_channel(self, channel, vote):
-            # Subtract the last vote by the same peer from the total vote amount for this channel.
-            # This effectively puts a cap of 1.0 vote from a peer on a channel
-            channel.votes -= vote.last_amount
-            self.total_activity -= vote.last_amount
+            self.bump_channels([(channel, vote)])
 
-            vote.last_amount = self.bump_amount
-            channel.votes += self.bump_amount
-            self.total_activity += self.bump_amount
-
-            if channel.votes > self.max_val:
-                self.max_val = channel.votes
+        @db_session
+        def bump_channels(self, channel_votes):
+            """
+            Bump a batch of channels, given as (channel, vote) tuples. The bumps happen at the same moment, so the
+            bump amount is scaled, and the votes are rescaled, at most once for the whole batch.
+            """
+            max_val = self.max_val
+            for channel, vote in channel_votes:
+                # Subtract the last vote by the same peer from the total vote amount for this channel.
+                # This effectively puts a cap of 1.0 vote from a peer on a channel
+                delta = self.bump_amount - vote.last_amount
+                vote.last_amount = self.bump_amount
+                channel.votes += delta
+                self.total_activity += delta
+                max_val = max(max_val, channel.votes)
+
+            self.max_val = max_val
             db.ChannelMetadata.votes_scaling = self.max_val
 
             bump_moment = datetime.utcnow()
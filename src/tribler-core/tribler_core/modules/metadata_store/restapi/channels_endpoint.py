@@ -385,7 +385,7 @@ class ChannelsEndpoint(ChannelsEndpointBase):
                 ):
                     return RESTResponse({"added": 1})
 
-                meta_info = await self.session.dlmgr.get_metainfo(xt, timeout=30, url=uri)
+                meta_info = await self.session.dlmgr.get_metainfo(xt, timeout=30, url=uri, retry_failed=True)
                 if not meta_info:
                     raise RuntimeError("Metainfo timeout")
                 tdef = TorrentDef.load_from_dict(meta_info)
@@ -1,4 +1,5 @@
 from binascii import unhexlify
+from collections import defaultdict
 
 from aiohttp import ContentTypeError, web
 
@@ -8,7 +9,9 @@ from ipv8.REST.schema import schema
 
 from marshmallow.fields import Integer, String
 
-from pony.orm import db_session
+from pony.orm import OperationWithDeletedObjectError, db_session, rollback
+
+from tribler_common.simpledefs import NTFY
 
 from tribler_core.modules.metadata_store.orm_bindings.channel_node import LEGACY_ENTRY
 from tribler_core.modules.metadata_store.restapi.metadata_endpoint_base import MetadataEndpointBase
@@ -17,29 +20,121 @@ from tribler_core.restapi.schema import HandledErrorSchema
 from tribler_core.utilities.unicode import hexlify
 
 TORRENT_CHECK_TIMEOUT = 20
+# Bulk operations on more entries than this report their progress through the events endpoint
+BULK_PROGRESS_INTERVAL = 1000
+# Maximum number of ids in a single query, to stay well below the SQLite host parameter limit
+BULK_QUERY_CHUNK_SIZE = 500
+
+ENTRY_NOT_FOUND_ERROR = "Object with the specified pk+id could not be found."
 
 
 class UpdateEntryMixin:
-    @db_session
-    def update_entry(self, public_key, id_, update_dict):
-        entry = self.session.mds.ChannelNode.get(public_key=public_key, id_=id_)
-        if not entry:
-            return HTTP_NOT_FOUND, {"error": "Object with the specified pk+id could not be found."}
+    @staticmethod
+    def check_update(entry, update_dict):
+        """
+        Check whether the given update can be applied to the entry.
 
+        :return: a tuple (error code, error message), or (None, None) if the update is allowed.
+        """
         signed_parameters_to_change = set(entry.payload_arguments).intersection(set(update_dict.keys()))
         if signed_parameters_to_change:
             if 'status' in update_dict:
-                return HTTP_BAD_REQUEST, {"error": "Cannot set status manually when changing signed attributes."}
+                return HTTP_BAD_REQUEST, "Cannot set status manually when changing signed attributes."
             if entry.status == LEGACY_ENTRY:
-                return HTTP_BAD_REQUEST, {"error": "Changing parameters of legacy entries is not supported."}
+                return HTTP_BAD_REQUEST, "Changing parameters of legacy entries is not supported."
             if not entry.is_personal:
-                return (
-                    HTTP_BAD_REQUEST,
-                    {"error": "Changing signed parameters in non-personal entries is not supported."},
-                )
+                return HTTP_BAD_REQUEST, "Changing signed parameters in non-personal entries is not supported."
+        return None, None
+
+    @db_session
+    def update_entry(self, public_key, id_, update_dict):
+        entry = self.session.mds.ChannelNode.get(public_key=public_key, id_=id_)
+        if not entry:
+            return HTTP_NOT_FOUND, {"error": ENTRY_NOT_FOUND_ERROR}
+
+        error, message = self.check_update(entry, update_dict)
+        if error:
+            return error, {"error": message}
 
         return None, entry.update_properties(update_dict).to_simple_dict()
 
+    def get_entries(self, keys):
+        """
+        Fetch the entries for a list of (public key, id) tuples, with one query per public key and chunk of ids.
+
+        :return: a dictionary (public key, id) -> entry, missing entries are left out.
+        """
+        ids_per_key = defaultdict(set)
+        for public_key, id_ in keys:
+            ids_per_key[public_key].add(id_)
+
+        entries = {}
+        for public_key, ids in ids_per_key.items():
+            ids = list(ids)
+            for start in range(0, len(ids), BULK_QUERY_CHUNK_SIZE):
+                chunk = ids[start : start + BULK_QUERY_CHUNK_SIZE]
+                query = self.session.mds.ChannelNode.select(lambda g: g.public_key == public_key and g.id_ in chunk)
+                entries.update(((entry.public_key, entry.id_), entry) for entry in query)
+        return entries
+
+    @db_session
+    def update_entries(self, updates, progress_callback=None):
+        """
+        Apply a list of (public key, id, update dictionary) tuples in a single transaction.
+        If any of the updates fails, none of them is applied.
+
+        :return: a tuple (errors, results), with errors a list of (public key, id, error code, error message) tuples.
+        """
+        entries = self.get_entries([(public_key, id_) for public_key, id_, _ in updates])
+
+        errors = []
+        for public_key, id_, update_dict in updates:
+            entry = entries.get((public_key, id_))
+            error, message = self.check_update(entry, update_dict) if entry else (HTTP_NOT_FOUND, ENTRY_NOT_FOUND_ERROR)
+            if error:
+                errors.append((public_key, id_, error, message))
+        if errors:
+            return errors, []
+
+        results = []
+        for index, (public_key, id_, update_dict) in enumerate(updates, 1):
+            try:
+                results.append(entries[(public_key, id_)].update_properties(update_dict).to_simple_dict())
+            except ValueError as e:
+                errors.append((public_key, id_, HTTP_BAD_REQUEST, str(e)))
+            if progress_callback and index % BULK_PROGRESS_INTERVAL == 0:
+                progress_callback(index, len(updates))
+        if errors:
+            rollback()
+            return errors, []
+        return errors, results
+
+    @db_session
+    def delete_entries(self, keys, progress_callback=None):
+        """
+        Delete the entries for a list of (public key, id) tuples in a single transaction.
+        If any of the entries is missing, nothing is deleted.
+
+        :return: a tuple (errors, results), with errors a list of (public key, id, error code, error message) tuples.
+        """
+        entries = self.get_entries(keys)
+        errors = [(public_key, id_, HTTP_BAD_REQUEST, "Entry %i not found" % id_)
+                  for public_key, id_ in keys if (public_key, id_) not in entries]
+        if errors:
+            return errors, []
+
+        results = []
+        for index, (public_key, id_) in enumerate(keys, 1):
+            try:
+                entries[(public_key, id_)].delete()
+            except OperationWithDeletedObjectError:
+                # The entry was already removed together with one of its parent collections
+                pass
+            results.append({"public_key": hexlify(public_key), "id": id_, "state": "Deleted"})
+            if progress_callback and index % BULK_PROGRESS_INTERVAL == 0:
+                progress_callback(index, len(keys))
+        return errors, results
+
 
 class MetadataEndpoint(MetadataEndpointBase, UpdateEntryMixin):
     """
@@ -64,7 +159,7 @@ class MetadataEndpoint(MetadataEndpointBase, UpdateEntryMixin):
 
     @docs(
         tags=['Metadata'],
-        summary='Update channel entries.',
+        summary='Update channel entries. Either all entries are updated, or none of them.',
         parameters=[
             {
                 'in': 'body',
@@ -83,22 +178,42 @@ class MetadataEndpoint(MetadataEndpointBase, UpdateEntryMixin):
     async def update_channel_entries(self, request):
         try:
             request_parsed = await request.json()
-        except (ContentTypeError, ValueError):
+            updates = [(unhexlify(entry.pop("public_key")), int(entry.pop("id")), entry) for entry in request_parsed]
+        except (ContentTypeError, ValueError, TypeError, KeyError, AttributeError):
             return RESTResponse({"error": "Bad JSON"}, status=HTTP_BAD_REQUEST)
-        results_list = []
-        for entry in request_parsed:
-            public_key = unhexlify(entry.pop("public_key"))
-            id_ = entry.pop("id")
-            error, result = self.update_entry(public_key, id_, entry)
-            # TODO: handle the results for a list that contains some errors in a smarter way
-            if error:
-                return RESTResponse(result, status=error)
-            results_list.append(result)
+
+        errors, results_list = await self.session.mds.run_threaded(
+            self.update_entries, updates, self.get_progress_callback("update")
+        )
+        if errors:
+            return self.bulk_error_response(errors)
         return RESTResponse(results_list)
 
+    def get_progress_callback(self, operation):
+        """
+        Get a callback that reports the progress of a bulk operation to the events endpoint. The notifier is
+        thread-safe, so the callback can be called from the worker thread that runs the operation.
+        """
+
+        def on_progress(done, total):
+            self.session.notifier.notify(
+                NTFY.METADATA_BULK_PROGRESS, {"operation": operation, "done": done, "total": total}
+            )
+
+        return on_progress
+
+    @staticmethod
+    def bulk_error_response(errors):
+        _, _, error_code, message = errors[0]
+        errors_list = [
+            {"public_key": hexlify(public_key), "id": id_, "error": error_message}
+            for public_key, id_, _, error_message in errors
+        ]
+        return RESTResponse({"error": message, "errors": errors_list}, status=error_code)
+
     @docs(
         tags=['Metadata'],
-        summary='Delete channel entries.',
+        summary='Delete channel entries. Either all entries are deleted, or none of them.',
         parameters=[
             {
                 'in': 'body',
@@ -114,19 +229,18 @@ class MetadataEndpoint(MetadataEndpointBase, UpdateEntryMixin):
         },
     )
     async def delete_channel_entries(self, request):
-        with db_session:
+        try:
             request_parsed = await request.json()
-            results_list = []
-            for entry in request_parsed:
-                public_key = unhexlify(entry.pop("public_key"))
-                id_ = entry.pop("id")
-                entry = self.session.mds.ChannelNode.get(public_key=public_key, id_=id_)
-                if not entry:
-                    return RESTResponse({"error": "Entry %i not found" % id_}, status=HTTP_BAD_REQUEST)
-                entry.delete()
-                result = {"public_key": hexlify(public_key), "id": id_, "state": "Deleted"}
-                results_list.append(result)
-            return RESTResponse(results_list)
+            keys = [(unhexlify(entry["public_key"]), int(entry["id"])) for entry in request_parsed]
+        except (ContentTypeError, ValueError, TypeError, KeyError):
+            return RESTResponse({"error": "Bad JSON"}, status=HTTP_BAD_REQUEST)
+
+        errors, results_list = await self.session.mds.run_threaded(
+            self.delete_entries, keys, self.get_progress_callback("delete")
+        )
+        if errors:
+            return self.bulk_error_response(errors)
+        return RESTResponse(results_list)
 
     @docs(
         tags=['Metadata'],
@@ -1,4 +1,5 @@
 import json
+from asyncio import sleep
 
 from ipv8.util import succeed
 
@@ -6,7 +7,10 @@ from pony.orm import db_session
 
 import pytest
 
+from tribler_common.simpledefs import NTFY
+
 from tribler_core.modules.metadata_store.orm_bindings.channel_node import COMMITTED, TODELETE, UPDATED
+from tribler_core.modules.metadata_store.restapi import metadata_endpoint
 from tribler_core.modules.metadata_store.restapi.metadata_endpoint import TORRENT_CHECK_TIMEOUT
 from tribler_core.modules.torrent_checker.torrent_checker import TorrentChecker
 from tribler_core.restapi.base_api_test import do_request
@@ -219,3 +223,71 @@ async def test_check_torrent_query(enable_chant, enable_api, session, udp_tracke
     """
     infohash = b'a' * 20
     await do_request(session, f"metadata/torrents/{infohash}/health?timeout=wrong_value&refresh=1", expected_code=400)
+
+
+@pytest.mark.asyncio
+async def test_update_multiple_metadata_entries_rollback(enable_chant, enable_api, session):
+    """
+    Test whether none of the entries is updated if one of the entries in a bulk PATCH request fails
+    """
+    with db_session:
+        md1 = session.mds.TorrentMetadata(title='old1', infohash=random_infohash(), status=COMMITTED)
+
+    patch_data = [
+        {'public_key': hexlify(md1.public_key), 'id': md1.id_, 'status': TODELETE},
+        {'public_key': hexlify(b'1' * 64), 'id': 111, 'status': TODELETE},
+    ]
+    result = await do_request(session, 'metadata', post_data=patch_data, expected_code=404, request_type='PATCH')
+    assert result['errors'] == [{'public_key': hexlify(b'1' * 64), 'id': 111, 'error': result['error']}]
+    with db_session:
+        assert session.mds.ChannelNode.get(rowid=md1.rowid).status == COMMITTED
+
+
+@pytest.mark.asyncio
+async def test_delete_multiple_metadata_entries_missing(enable_chant, enable_api, session):
+    """
+    Test whether none of the entries is deleted if one of the entries in a bulk DELETE request is missing
+    """
+    with db_session:
+        md1 = session.mds.TorrentMetadata(title='old1', infohash=random_infohash())
+
+    delete_data = [{'public_key': hexlify(md1.public_key), 'id': md1.id_}, {'public_key': hexlify(b'1' * 64), 'id': 111}]
+    await do_request(session, 'metadata', post_data=delete_data, expected_code=400, request_type='DELETE')
+    await do_request(session, 'metadata', expected_code=400, request_type='DELETE', post_data='abc')
+    with db_session:
+        assert session.mds.ChannelNode.select().count() == 1
+
+
+@pytest.mark.asyncio
+async def test_delete_collection_with_contents(enable_chant, enable_api, session):
+    """
+    Test deleting a collection together with an entry that is removed along with it
+    """
+    with db_session:
+        coll = session.mds.CollectionNode(title='coll')
+        md1 = session.mds.TorrentMetadata(title='old1', infohash=random_infohash(), origin_id=coll.id_)
+
+    delete_data = [{'public_key': hexlify(coll.public_key), 'id': coll.id_},
+                   {'public_key': hexlify(md1.public_key), 'id': md1.id_}]
+    result = await do_request(session, 'metadata', post_data=delete_data, expected_code=200, request_type='DELETE')
+    assert [entry['id'] for entry in result] == [coll.id_, md1.id_]
+    with db_session:
+        assert session.mds.ChannelNode.select().count() == 0
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_progress(enable_chant, enable_api, session, monkeypatch):
+    """
+    Test whether the progress of large bulk operations is reported through the notifier
+    """
+    monkeypatch.setattr(metadata_endpoint, 'BULK_PROGRESS_INTERVAL', 2)
+    progress = []
+    session.notifier.add_observer(NTFY.METADATA_BULK_PROGRESS, progress.append)
+    with db_session:
+        entries = [session.mds.TorrentMetadata(title='t%d' % i, infohash=random_infohash()) for i in range(5)]
+
+    patch_data = [{'public_key': hexlify(md.public_key), 'id': md.id_, 'status': TODELETE} for md in entries]
+    result = await do_request(session, 'metadata', post_data=patch_data, expected_code=200, request_type='PATCH')
+    assert len(result) == 5
+    await sleep(0.1)
+    assert progress == [{'operation': 'update', 'done': 2, 'total': 5}, {'operation': 'update', 'done': 4, 'total': 5}]
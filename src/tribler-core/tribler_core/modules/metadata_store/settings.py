@@ -14,3 +14,5 @@ class ChantSettings(TriblerConfigSection):
     # The maximum number of peers that we got from channels to peers mapping,
     # that must be queried in addition to randomly queried peers
     max_mapped_query_peers = 3
+    # The minimal number of seconds between two pushes of merged remote search results to the GUI
+    search_results_push_interval: float = 0.5
@@ -46,6 +46,7 @@ from tribler_core.modules.metadata_store.serialization import (
     REGULAR_TORRENT,
     read_payload_with_offset,
 )
+from tribler_core.modules.metrics import default_registry
 from tribler_core.utilities.path_util import Path
 from tribler_core.utilities.unicode import hexlify
 
@@ -154,6 +155,13 @@ class MetadataStore:
         self.reference_timedelta = timedelta(milliseconds=100)
         self.sleep_on_external_thread = 0.05  # sleep this amount of seconds between batches executed on external thread
 
+        self.threaded_calls = default_registry.histogram(
+            'metadata_store_threaded_seconds', 'Duration of database calls on worker threads, including queueing'
+        )
+        self.pending_threaded_calls = default_registry.gauge(
+            'metadata_store_threaded_pending', 'Number of database calls that are queued or running on worker threads'
+        )
+
         create_db = str(db_filename) == ":memory:" or not self.db_filename.is_file()
 
         # We have to dynamically define/init ORM-managed entities here to be able to support
@@ -232,7 +240,12 @@ class MetadataStore:
             finally:
                 self.disconnect_thread()
 
-        return await get_event_loop().run_in_executor(None, wrapper)
+        self.pending_threaded_calls.inc()
+        try:
+            with self.threaded_calls.time():
+                return await get_event_loop().run_in_executor(None, wrapper)
+        finally:
+            self.pending_threaded_calls.dec()
 
     def drop_indexes(self):
         cursor = self._db.get_connection().cursor()
@@ -292,12 +305,36 @@ class MetadataStore:
 
     @db_session
     def vote_bump(self, public_key, id_, voter_pk):
-        channel = self.ChannelMetadata.get_for_update(public_key=public_key, id_=id_)
-        if not channel:
+        self.vote_bump_channels([(public_key, id_)], voter_pk)
+
+    @db_session
+    def vote_bump_channels(self, channel_keys, voter_pk):
+        """
+        Bump the channels with the given (public_key, id_) keys with votes from a single voter, in one batch.
+        """
+        channels = []
+        for public_key, id_ in channel_keys:
+            channel = self.ChannelMetadata.get_for_update(public_key=public_key, id_=id_)
+            if channel:
+                channels.append(channel)
+        if not channels:
             return
-        vote = self.upsert_vote(channel, voter_pk)
 
-        self.Vsids[0].bump_channel(channel, vote)
+        voter = self.ChannelPeer.get_for_update(public_key=voter_pk)
+        if not voter:
+            voter = self.ChannelPeer(public_key=voter_pk)
+        votes = {vote.channel: vote for vote in voter.individual_votes}
+        now = datetime.utcnow()
+        channel_votes = []
+        for channel in channels:
+            vote = votes.get(channel)
+            if not vote:
+                vote = votes[channel] = self.ChannelVote(voter=voter, channel=channel)
+            else:
+                vote.vote_date = now
+            channel_votes.append((channel, vote))
+
+        self.Vsids[0].bump_channels(channel_votes)
 
     def shutdown(self):
         self._shutting_down = True
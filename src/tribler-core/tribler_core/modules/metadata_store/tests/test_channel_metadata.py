@@ -23,7 +23,13 @@ from tribler_core.modules.metadata_store.orm_bindings.channel_metadata import (
     MetadataCompressor,
     entries_to_chunk,
 )
-from tribler_core.modules.metadata_store.orm_bindings.channel_node import COMMITTED, NEW, TODELETE, UPDATED
+from tribler_core.modules.metadata_store.orm_bindings.channel_node import (
+    COMMITTED,
+    LEGACY_ENTRY,
+    NEW,
+    TODELETE,
+    UPDATED,
+)
 from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT, COLLECTION_NODE, REGULAR_TORRENT
 from tribler_core.modules.metadata_store.store import HealthItemsPayload
 from tribler_core.tests.tools.common import TESTS_DATA_DIR, TORRENT_UBUNTU_FILE
@@ -355,6 +361,55 @@ def test_vsids(metadata_store):
     assert channel.votes < 2.1
 
 
+@db_session
+def test_vsids_bump_channels(metadata_store):
+    """
+    Test bumping several channels with votes from a single voter at once.
+    """
+    voter_pk = default_eccrypto.generate_key("curve25519").pub().key_to_bin()[10:]
+    channels = [metadata_store.ChannelMetadata.create_channel(f'test{i}', 'test') for i in range(3)]
+    keys = [(channel.public_key, channel.id_) for channel in channels]
+
+    metadata_store.vote_bump_channels(keys + [(b'unknown', 1)], voter_pk)
+    assert [channel.votes for channel in channels] == [1.0] * 3
+    assert metadata_store.ChannelVote.select().count() == 3
+    assert metadata_store.Vsids[0].total_activity == 3.0
+
+    # Repeated votes by the same voter do not add up
+    metadata_store.vote_bump_channels(keys[:1], voter_pk)
+    assert metadata_store.ChannelVote.select().count() == 3
+    assert channels[0].votes == metadata_store.Vsids[0].max_val
+    assert 1.0 <= channels[0].votes < 1.1
+
+
+@db_session
+def test_vsids_rescale(metadata_store):
+    """
+    Test whether rescaling the votes updates both the database and the objects that are already loaded.
+    """
+    voter_pk = default_eccrypto.generate_key("curve25519").pub().key_to_bin()[10:]
+    channel = metadata_store.ChannelMetadata.create_channel('test', 'test')
+    legacy_channel = metadata_store.ChannelMetadata(title='legacy', infohash=random_infohash(), status=LEGACY_ENTRY,
+                                                    votes=8.0)
+    metadata_store.vote_bump(channel.public_key, channel.id_, voter_pk)
+    channel.votes = 8.0
+
+    vsids = metadata_store.Vsids[0]
+    bump_amount = vsids.bump_amount
+    vsids.rescale(4.0)
+    assert channel.votes == 2.0
+    assert legacy_channel.votes == 8.0
+    assert metadata_store.ChannelVote.select().first().last_amount == 0.25
+    assert vsids.bump_amount == bump_amount / 4.0
+    assert metadata_store.ChannelMetadata.votes_scaling == vsids.max_val
+
+    # The loaded objects agree with the database
+    assert metadata_store._db.select("votes FROM ChannelNode WHERE rowid = $channel.rowid") == [2.0]
+    channel.votes += 1.0
+    metadata_store._db.flush()
+    assert metadata_store._db.select("votes FROM ChannelNode WHERE rowid = $channel.rowid") == [3.0]
+
+
 @pytest.mark.timeout(0)
 @db_session
 def test_commit_channel_torrent(metadata_store):
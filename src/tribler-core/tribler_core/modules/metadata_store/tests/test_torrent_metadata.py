@@ -68,6 +68,33 @@ def test_get_magnet(metadata_store):
     assert torrent_metadata2.get_magnet()
 
 
+def test_update_tracker_info(metadata_store):
+    """
+    Test whether the tracker of a torrent is linked again only when its tracker info changes
+    """
+    infohash = random_infohash()
+    with db_session:
+        metadata_store.TorrentMetadata(infohash=infohash, tracker_info="http://tracker1.com/announce")
+
+    with db_session:
+        torrent = metadata_store.TorrentMetadata.get(infohash=infohash)
+        torrent.status = 1
+        torrent.tracker_info = "http://tracker2.com/announce"
+
+    with db_session:
+        torrent = metadata_store.TorrentMetadata.get(infohash=infohash)
+        assert {tracker.url for tracker in torrent.health.trackers} == {"http://tracker1.com/announce",
+                                                                          "http://tracker2.com/announce"}
+        torrent.health.trackers.clear()
+
+    with db_session:
+        torrent = metadata_store.TorrentMetadata.get(infohash=infohash)
+        torrent.status = 2
+
+    with db_session:
+        assert not metadata_store.TorrentMetadata.get(infohash=infohash).health.trackers
+
+
 @db_session
 def test_search_keyword(metadata_store):
     """
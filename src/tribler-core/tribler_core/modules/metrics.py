@@ -0,0 +1,195 @@
+"""
+Lightweight counters, gauges and histograms for the Tribler core.
+
+Core components register their metrics with the default registry when they are created. Updating a metric is a plain
+attribute update on the event loop thread, so the metrics can stay enabled in production. The metrics are exposed
+through the metrics endpoint, both in the Prometheus text format and as a compact JSON snapshot.
+"""
+import logging
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from time import perf_counter
+
+METRICS_PREFIX = 'tribler_'
+# Upper bounds of the histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metric(ABC):
+    type = None
+
+    def __init__(self, name, description=''):
+        self.name = name
+        self.description = description
+
+    @abstractmethod
+    def get_value(self):
+        """
+        Return the current value of the metric, as it is shown in the JSON snapshot.
+        """
+
+    def get_text_lines(self):
+        return [f'{METRICS_PREFIX}{self.name} {self.get_value()}']
+
+
+class Counter(Metric):
+    """
+    A value that only goes up, e.g. the number of processed requests.
+    """
+    type = 'counter'
+
+    def __init__(self, name, description=''):
+        super().__init__(name, description)
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def get_value(self):
+        return self.value
+
+
+class Gauge(Metric):
+    """
+    A value that can go up and down, e.g. the number of open circuits. Instead of setting the value, a function can be
+    given that computes the value whenever the metrics are collected.
+    """
+    type = 'gauge'
+
+    def __init__(self, name, description='', function=None):
+        super().__init__(name, description)
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set_function(self, function):
+        self.function = function
+
+    def get_value(self):
+        if self.function is None:
+            return self.value
+        try:
+            return self.function()
+        except Exception as e:  # pylint: disable=broad-except
+            logging.getLogger(self.__class__.__name__).warning("Could not compute gauge %s: %s", self.name, e)
+            return 0
+
+
+class Histogram(Metric):
+    """
+    The distribution of observed values, e.g. durations, over a fixed set of buckets.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, description='', buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        # The last bucket counts the values that are larger than the largest bucket bound
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def time(self):
+        """
+        Get a context manager that observes the duration of its body.
+        """
+        return HistogramTimer(self)
+
+    def get_value(self):
+        return {'count': self.count, 'sum': self.sum, 'max': self.max}
+
+    def get_text_lines(self):
+        name = METRICS_PREFIX + self.name
+        lines = []
+        cumulative_count = 0
+        for bound, bucket_count in zip(self.buckets + ('+Inf',), self.bucket_counts):
+            cumulative_count += bucket_count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative_count}')
+        lines.append(f'{name}_sum {self.sum}')
+        lines.append(f'{name}_count {self.count}')
+        return lines
+
+
+class HistogramTimer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = None
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.histogram.observe(perf_counter() - self.start)
+
+
+class MetricsRegistry:
+    """
+    Keeps track of all metrics by name. Registering a metric that already exists returns the existing metric, so
+    components that are created more than once (e.g. in tests) share their metrics.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric_class, name, *args, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = metric_class(name, *args, **kwargs)
+        elif not isinstance(metric, metric_class):
+            raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+        return metric
+
+    def counter(self, name, description=''):
+        return self._register(Counter, name, description)
+
+    def gauge(self, name, description='', function=None):
+        gauge = self._register(Gauge, name, description)
+        if function is not None:
+            gauge.set_function(function)
+        return gauge
+
+    def histogram(self, name, description='', buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, description, buckets=buckets)
+
+    def unregister(self, name):
+        self.metrics.pop(name, None)
+
+    def get_snapshot(self):
+        """
+        Get the current values of all metrics as a dictionary.
+        """
+        return {name: self.metrics[name].get_value() for name in sorted(self.metrics)}
+
+    def get_text(self):
+        """
+        Get the current values of all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for name in sorted(self.metrics):
+            metric = self.metrics[name]
+            if metric.description:
+                lines.append(f'# HELP {METRICS_PREFIX}{name} {metric.description}')
+            lines.append(f'# TYPE {METRICS_PREFIX}{name} {metric.type}')
+            lines.extend(metric.get_text_lines())
+        return '\n'.join(lines) + '\n'
+
+
+default_registry = MetricsRegistry()
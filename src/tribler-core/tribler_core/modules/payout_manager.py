@@ -1,7 +1,9 @@
 import logging
 
-from ipv8.taskmanager import TaskManager, task
+from ipv8.taskmanager import TaskManager
+from ipv8.util import succeed
 
+from tribler_core.modules.peer_resolver import PeerResolver
 from tribler_core.utilities.unicode import hexlify
 
 
@@ -10,44 +12,74 @@ class PayoutManager(TaskManager):
     This manager is responsible for keeping track of known Tribler peers and doing (zero-hop) payouts.
     """
 
-    def __init__(self, bandwidth_community, dht):
+    def __init__(self, bandwidth_community, dht, resolver=None):
         super().__init__()
         self.logger = logging.getLogger(self.__class__.__name__)
         self.bandwidth_community = bandwidth_community
         self.dht = dht
+        self.owns_resolver = resolver is None
+        self.resolver = PeerResolver(dht) if resolver is None else resolver
         self.tribler_peers = {}
+        # mid -> the task of the payout that is in progress
+        self.pending_payouts = {}
 
-    @task
-    async def do_payout(self, mid):
+    def do_payout(self, mid):
         """
-        Perform a payout to a given mid. First, determine the outstanding balance. Then resolve the node in the DHT.
+        Perform a payout to a given mid. The outstanding balances of all infohashes are paid out at once, so a payout
+        that is requested while a payout to the same mid is in progress is merged into the latter.
+
+        :return: a future that fires with the node that we paid out to, or None if no payout was done.
         """
         if mid not in self.tribler_peers:
-            return None
+            return succeed(None)
 
-        total_bytes = sum(self.tribler_peers[mid].values())
+        payout = self.pending_payouts.get(mid)
+        if payout is None:
+            payout = self.pending_payouts[mid] = self.register_anonymous_task('do_payout', self._do_payout, mid,
+                                                                              ignore=(Exception,))
+        return payout
 
-        self.logger.info("Doing direct payout to %s (%d bytes)", hexlify(mid), total_bytes)
+    async def _do_payout(self, mid):
+        """
+        First, resolve the node in the DHT. Then pay out the balances that are outstanding once the node is resolved,
+        so that the balances that are added during the lookup are paid out as well.
+        """
         try:
-            nodes = await self.dht.connect_peer(mid)
-        except Exception as e:
-            self.logger.warning("Error while doing DHT lookup for payouts, error %s", e)
-            return None
-
-        self.logger.debug("Received %d nodes for DHT lookup", len(nodes))
-        if not nodes:
-            return None
+            nodes = await self.resolver.resolve(mid)
+            self.logger.debug("Received %d nodes for DHT lookup", len(nodes))
+            if not nodes:
+                return None
 
-        try:
-            await self.bandwidth_community.do_payout(nodes[0], total_bytes)
-        except Exception as e:
-            self.logger.error("Error while doing bandwidth payout, error %s", e)
-            return None
+            balances = dict(self.tribler_peers.get(mid, {}))
+            total_bytes = sum(balances.values())
+            self.logger.info("Doing direct payout to %s (%d bytes)", hexlify(mid), total_bytes)
+            try:
+                await self.bandwidth_community.do_payout(nodes[0], total_bytes)
+            except Exception as e:
+                self.logger.error("Error while doing bandwidth payout, error %s", e)
+                return None
+        finally:
+            self.pending_payouts.pop(mid, None)
 
         # Remove the outstanding bytes; otherwise we will payout again
-        self.tribler_peers.pop(mid, None)
+        self.remove_paid_balances(mid, balances)
         return nodes[0]
 
+    def remove_paid_balances(self, mid, balances):
+        """
+        Subtract the balances that have been paid out from the outstanding balances of a peer. Balances that have been
+        added during the payout are kept for the next payout.
+        """
+        outstanding = self.tribler_peers.get(mid, {})
+        for infohash, paid in balances.items():
+            remaining = outstanding.get(infohash, 0) - paid
+            if remaining > 0:
+                outstanding[infohash] = remaining
+            else:
+                outstanding.pop(infohash, None)
+        if not outstanding:
+            self.tribler_peers.pop(mid, None)
+
     def update_peer(self, mid, infohash, balance):
         """
         Update a peer with a specific mid for a specific infohash.
@@ -62,3 +94,5 @@ class PayoutManager(TaskManager):
 
     async def shutdown(self):
         await self.shutdown_task_manager()
+        if self.owns_resolver:
+            await self.resolver.shutdown()
@@ -0,0 +1,118 @@
+"""
+Resolution of peers that are only known by their mid, through the DHT.
+"""
+import logging
+import time
+from asyncio import Semaphore, shield
+from collections import OrderedDict
+
+from ipv8.taskmanager import TaskManager
+
+from tribler_core.modules.metrics import default_registry
+from tribler_core.utilities.unicode import hexlify
+
+# Maximum number of DHT lookups that run at the same time
+MAX_CONCURRENT_LOOKUPS = 4
+# Number of seconds that the nodes of a resolved mid are cached
+RESOLVED_TTL = 5 * 60
+# A failed lookup is not retried for FAILURE_BACKOFF_BASE * 2 ^ (failures - 1) seconds, up to FAILURE_BACKOFF_MAX
+FAILURE_BACKOFF_BASE = 30
+FAILURE_BACKOFF_MAX = 30 * 60
+# Maximum number of mids that are kept in the cache of resolved mids and in the cache of failures
+MAX_CACHED_MIDS = 10000
+
+
+def get_failure_backoff(failures):
+    return min(FAILURE_BACKOFF_BASE * 2 ** (failures - 1), FAILURE_BACKOFF_MAX)
+
+
+class PeerResolver(TaskManager):
+    """
+    Looks up the DHT nodes of peers by their mid.
+
+    The nodes of a resolved mid are cached for a while, and a mid that could not be resolved is not looked up again
+    until its backoff has expired. Concurrent requests for the same mid share a single DHT lookup, and the number of
+    DHT lookups that run at the same time is bounded.
+    """
+
+    def __init__(self, dht, max_concurrent=MAX_CONCURRENT_LOOKUPS, ttl=RESOLVED_TTL):
+        super().__init__()
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.dht = dht
+        self.ttl = ttl
+        self.semaphore = Semaphore(max_concurrent)
+        # mid -> (nodes, expires), oldest first
+        self.resolved = OrderedDict()
+        # mid -> (failures, retry_after), oldest first
+        self.failures = OrderedDict()
+        # mid -> the task of the DHT lookup that is in progress
+        self.lookups = {}
+
+        self.num_lookups = default_registry.counter('dht_peer_lookups', 'Number of DHT lookups for a peer by mid')
+        self.num_cache_hits = default_registry.counter('dht_peer_lookup_cache_hits',
+                                                       'Number of peer resolutions that were served from the cache')
+
+    def get_cached(self, mid):
+        """
+        :return: the cached nodes for the given mid, an empty list if the mid is backing off after a failed lookup,
+                 or None if the mid should be looked up.
+        """
+        now = time.time()
+        entry = self.resolved.get(mid)
+        if entry is not None:
+            if entry[1] > now:
+                return entry[0]
+            del self.resolved[mid]
+        failure = self.failures.get(mid)
+        if failure is not None and failure[1] > now:
+            return []
+        return None
+
+    async def resolve(self, mid):
+        """
+        Find the DHT nodes for the given mid.
+
+        :return: a list of nodes, which is empty if the peer could not be found.
+        """
+        if self.dht is None:
+            return []
+
+        nodes = self.get_cached(mid)
+        if nodes is not None:
+            self.num_cache_hits.inc()
+            return nodes
+
+        lookup = self.lookups.get(mid)
+        if lookup is None:
+            lookup = self.lookups[mid] = self.register_anonymous_task('lookup', self.lookup, mid)
+        # Cancelling one of the callers should not cancel the lookup for the others
+        return await shield(lookup) or []
+
+    async def lookup(self, mid):
+        try:
+            async with self.semaphore:
+                self.num_lookups.inc()
+                nodes = await self.dht.connect_peer(mid)
+        except Exception as e:  # pylint: disable=broad-except
+            self._logger.warning("DHT lookup for %s failed: %s", hexlify(mid), e)
+            nodes = []
+        finally:
+            self.lookups.pop(mid, None)
+
+        if nodes:
+            self.failures.pop(mid, None)
+            self._cache(self.resolved, mid, (nodes, time.time() + self.ttl))
+        else:
+            failures = self.failures.pop(mid, (0, 0))[0] + 1
+            self._cache(self.failures, mid, (failures, time.time() + get_failure_backoff(failures)))
+        return nodes
+
+    @staticmethod
+    def _cache(cache, mid, entry):
+        cache.pop(mid, None)
+        cache[mid] = entry
+        while len(cache) > MAX_CACHED_MIDS:
+            cache.popitem(last=False)
+
+    async def shutdown(self):
+        await self.shutdown_task_manager()
@@ -0,0 +1,163 @@
+"""
+Admission control for the remote queries that other peers send us.
+
+Queries go through two stages before they reach the database. First, every peer has a token bucket that limits
+the rate of its queries. Second, a scheduler limits the number of queries that run at the same time. The queries
+that have to wait are kept in a bounded priority queue. Identical queries that are queued or running at the same
+time share a single database query.
+"""
+import heapq
+import time
+from asyncio import CancelledError, Future, ensure_future, shield
+from collections import OrderedDict
+from itertools import count
+
+# Query priorities, a lower value is served first
+PRIORITY_SYNC = 0
+PRIORITY_SEARCH = 1
+# Maximum number of peers for which a token bucket is kept
+MAX_TRACKED_PEERS = 1000
+
+
+class QueryShedException(Exception):
+    """
+    Raised when a query is dropped because the scheduler is overloaded.
+    """
+
+
+def get_query_priority(query):
+    """
+    Free-text searches are served after the queries that synchronize channels, e.g. the queries for subscribed
+    channels, channel previews and missing thumbnails and descriptions.
+    """
+    return PRIORITY_SEARCH if query.get("txt_filter") else PRIORITY_SYNC
+
+
+def get_query_key(query):
+    return repr(sorted(query.items()))
+
+
+class TokenBucket:
+    """
+    Allows bursts of up to `burst` events, refilling at `rate` events per second.
+    """
+
+    __slots__ = ('rate', 'burst', 'tokens', 'last_update')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last_update = time.monotonic()
+
+    def consume(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_update) * self.rate)
+        self.last_update = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class PeerRateLimiter:
+    """
+    Keeps a token bucket for the peers that queried us most recently. Forgetting the bucket of a peer that has been
+    idle for a while is harmless, since its bucket would have been refilled anyway.
+    """
+
+    def __init__(self, rate, burst, max_peers=MAX_TRACKED_PEERS):
+        self.rate = rate
+        self.burst = burst
+        self.max_peers = max_peers
+        self.buckets = OrderedDict()
+
+    def allow(self, mid):
+        bucket = self.buckets.get(mid)
+        if bucket is None:
+            bucket = self.buckets[mid] = TokenBucket(self.rate, self.burst)
+            if len(self.buckets) > self.max_peers:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(mid)
+        return bucket.consume()
+
+
+class QueryScheduler:
+    """
+    Runs at most `max_running` queries at the same time, and keeps at most `max_queued` queries waiting. When the
+    queue is full, a query is shed, unless it has a higher priority than a query in the queue. In that case, the
+    queued query with the lowest priority is shed instead.
+    """
+
+    def __init__(self, max_running, max_queued):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.running = 0
+        # Heap of [priority, insertion counter, waiter]
+        self.queue = []
+        self.counter = count()
+        # Query key -> the task that runs the query
+        self.in_flight = {}
+
+    def run(self, key, priority, query_function):
+        """
+        Run the query, or share the result of an identical query that is queued or running.
+
+        :param key: the key that identifies identical queries.
+        :param priority: the priority of the query, a lower value is served first.
+        :param query_function: a coroutine function without arguments that runs the query.
+        :return: an awaitable for the result, which raises QueryShedException if the query was shed.
+        """
+        query = self.in_flight.get(key)
+        if query is None:
+            query = self.in_flight[key] = ensure_future(self._run(key, priority, query_function))
+        # Cancelling one of the requesters should not cancel the query for the others
+        return shield(query)
+
+    async def _run(self, key, priority, query_function):
+        try:
+            # Forget the queries that were shed or cancelled while they were waiting
+            self.queue = [entry for entry in self.queue if not entry[2].done()]
+            heapq.heapify(self.queue)
+            if self.running < self.max_running and not self.queue:
+                self.running += 1
+            else:
+                await self._wait_for_slot(priority)
+            try:
+                return await query_function()
+            finally:
+                self._release_slot()
+        finally:
+            self.in_flight.pop(key, None)
+
+    async def _wait_for_slot(self, priority):
+        if len(self.queue) >= self.max_queued:
+            lowest = max(self.queue, default=None)
+            if lowest is None or priority >= lowest[0]:
+                raise QueryShedException()
+            self.queue.remove(lowest)
+            heapq.heapify(self.queue)
+            lowest[2].set_exception(QueryShedException())
+
+        waiter = Future()
+        heapq.heappush(self.queue, [priority, next(self.counter), waiter])
+        try:
+            # The slot of the query that finishes is handed over to us
+            await waiter
+        except CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self._release_slot()
+            raise
+
+    def _release_slot(self):
+        while self.queue:
+            _, _, waiter = heapq.heappop(self.queue)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    def shutdown(self):
+        for query in list(self.in_flight.values()):
+            query.cancel()
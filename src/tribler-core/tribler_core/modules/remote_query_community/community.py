@@ -14,6 +14,14 @@ from tribler_core.modules.metadata_store.payload_checker import ObjState
 from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT, COLLECTION_NODE, REGULAR_TORRENT
 from tribler_core.modules.metadata_store.store import MetadataStore
 from tribler_core.modules.metadata_store.utils import RequestTimeoutException
+from tribler_core.modules.metrics import default_registry
+from tribler_core.modules.remote_query_community.admission import (
+    PeerRateLimiter,
+    QueryScheduler,
+    QueryShedException,
+    get_query_key,
+    get_query_priority,
+)
 from tribler_core.modules.remote_query_community.eva_protocol import EVAProtocolMixin
 from tribler_core.modules.remote_query_community.settings import RemoteQueryCommunitySettings
 from tribler_core.modules.tribler_community import TriblerCommunity
@@ -140,6 +148,12 @@ class RemoteQueryCommunity(TriblerCommunity, EVAProtocolMixin):
         # those hosts will push back updates at us, so we need to allow it.
         self.request_cache = RequestCache()
 
+        # Admission control for the queries that other peers send us
+        self.peer_rate_limiter = PeerRateLimiter(self.rqc_settings.max_peer_query_rate,
+                                                 self.rqc_settings.max_peer_query_burst)
+        self.query_scheduler = QueryScheduler(self.rqc_settings.max_running_queries,
+                                              self.rqc_settings.max_queued_queries)
+
         self.add_message_handler(RemoteSelectPayload, self.on_remote_select)
         self.add_message_handler(RemoteSelectPayloadEva, self.on_remote_select_eva)
         self.add_message_handler(SelectResponsePayload, self.on_remote_select_response)
@@ -149,16 +163,39 @@ class RemoteQueryCommunity(TriblerCommunity, EVAProtocolMixin):
         self.eva_register_send_complete_callback(self.on_send_complete)
         self.eva_register_error_callback(self.on_error)
 
+        self.queries_sent = default_registry.counter('remote_queries_sent', 'Number of remote queries sent')
+        self.queries_received = default_registry.counter('remote_queries_received', 'Number of remote queries served')
+        self.query_time = default_registry.histogram('remote_query_seconds', 'Time spent serving a remote query')
+        self.queries_rate_limited = default_registry.counter('remote_queries_rate_limited',
+                                                             'Number of remote queries over the rate limit of the peer')
+        self.queries_shed = default_registry.counter('remote_queries_shed',
+                                                     'Number of remote queries dropped because too many were waiting')
+        self.queries_deduplicated = default_registry.counter('remote_queries_deduplicated',
+                                                             'Number of remote queries that shared the result of an '
+                                                             'identical query')
+        self.responses_received = default_registry.counter('remote_query_responses_received',
+                                                           'Number of remote query responses received')
+        self.entries_received = default_registry.counter('remote_query_entries_received',
+                                                         'Number of entries received in remote query responses')
+        self.query_timeouts = default_registry.counter('remote_query_timeouts',
+                                                       'Number of remote queries that were not answered')
+        self.eva_bytes_received = default_registry.counter('eva_received_bytes', 'Number of bytes received over EVA')
+        self.eva_bytes_sent = default_registry.counter('eva_sent_bytes', 'Number of bytes sent over EVA')
+        self.eva_errors = default_registry.counter('eva_transfer_errors', 'Number of failed EVA transfers')
+
     def on_receive(self, peer, binary_info, binary_data, nonce):
         self.logger.info(f"EVA data received: peer {hexlify(peer.mid)}, info {binary_info}")
+        self.eva_bytes_received.inc(len(binary_data))
         packet = (peer.address, binary_data)
         self.on_packet(packet)
 
     def on_send_complete(self, peer, binary_info, binary_data, nonce):
         self.logger.info(f"EVA outgoing transfer complete: peer {hexlify(peer.mid)},  info {binary_info}")
+        self.eva_bytes_sent.inc(len(binary_data))
 
     def on_error(self, peer, exception):
         self.logger.warning(f"EVA transfer error: peer {hexlify(peer.mid)}, exception: {exception}")
+        self.eva_errors.inc()
 
     def send_remote_select(self, peer, processing_callback=None, force_eva_response=False, **kwargs):
         request_class = EvaSelectRequest if force_eva_response else SelectRequest
@@ -173,6 +210,7 @@ class RemoteQueryCommunity(TriblerCommunity, EVAProtocolMixin):
         self.request_cache.add(request)
 
         self.logger.info(f"Select to {hexlify(peer.mid)} with ({kwargs})")
+        self.queries_sent.inc()
         args = (request.number, convert_to_json(kwargs).encode('utf8'))
         if force_eva_response:
             self.ez_send(peer, RemoteSelectPayloadEva(*args))
@@ -190,6 +228,19 @@ class RemoteQueryCommunity(TriblerCommunity, EVAProtocolMixin):
         request_sanitized = sanitize_query(json.loads(json_bytes), self.rqc_settings.max_response_size)
         return await self.mds.get_entries_threaded(**request_sanitized)
 
+    async def process_rpc_query_admitted(self, json_bytes: bytes):
+        """
+        Like process_rpc_query, but the query waits for its turn in the query scheduler, and it shares the result of
+        an identical query that is already queued or running.
+        :raises QueryShedException: if the query was dropped because too many queries are waiting.
+        """
+        request_sanitized = sanitize_query(json.loads(json_bytes), self.rqc_settings.max_response_size)
+        key = get_query_key(request_sanitized)
+        if key in self.query_scheduler.in_flight:
+            self.queries_deduplicated.inc()
+        return await self.query_scheduler.run(key, get_query_priority(request_sanitized),
+                                              lambda: self.mds.get_entries_threaded(**request_sanitized))
+
     def send_db_results(self, peer, request_payload_id, db_results, force_eva_response=False):
 
         # Special case of empty results list - sending empty lz4 archive
@@ -220,8 +271,14 @@ class RemoteQueryCommunity(TriblerCommunity, EVAProtocolMixin):
         await self._on_remote_select_basic(peer, request_payload)
 
     async def _on_remote_select_basic(self, peer, request_payload, force_eva_response=False):
+        self.queries_received.inc()
+        # Peers that query us too often are ignored before their query is even parsed
+        if not self.peer_rate_limiter.allow(peer.mid):
+            self.queries_rate_limited.inc()
+            return
         try:
-            db_results = await self.process_rpc_query(request_payload.json)
+            with self.query_time.time():
+                db_results = await self.process_rpc_query_admitted(request_payload.json)
 
             # When we send our response to a host, we open a window of opportunity
             # for it to push back updates
@@ -229,6 +286,10 @@ class RemoteQueryCommunity(TriblerCommunity, EVAProtocolMixin):
                 self.request_cache.add(PushbackWindow(self.request_cache, hexlify(peer.mid), request_payload.id))
 
             self.send_db_results(peer, request_payload.id, db_results, force_eva_response)
+        except QueryShedException:
+            self.queries_shed.inc()
+            # An empty response costs next to nothing, and keeps the peer from dropping us for not responding
+            self.send_db_results(peer, request_payload.id, [])
         except (OperationalError, TypeError, ValueError) as error:
             self.logger.error(f"Remote select. The error occurred: {error}")
 
@@ -254,6 +315,8 @@ class RemoteQueryCommunity(TriblerCommunity, EVAProtocolMixin):
 
         processing_results = await self.mds.process_compressed_mdblob_threaded(response_payload.raw_blob)
         self.logger.info(f"Response result: {processing_results}")
+        self.responses_received.inc()
+        self.entries_received.inc(len(processing_results))
 
         if isinstance(request, EvaSelectRequest) and not request.processing_results.done():
             request.processing_results.set_result(processing_results)
@@ -297,6 +360,7 @@ class RemoteQueryCommunity(TriblerCommunity, EVAProtocolMixin):
 
     def _on_query_timeout(self, request_cache):
         if not request_cache.peer_responded:
+            self.query_timeouts.inc()
             self.logger.info(
                 "Remote query timeout, deleting peer: %s %s %s",
                 str(request_cache.peer.address),
@@ -306,5 +370,6 @@ class RemoteQueryCommunity(TriblerCommunity, EVAProtocolMixin):
             self.network.remove_peer(request_cache.peer)
 
     async def unload(self):
+        self.query_scheduler.shutdown()
         await self.request_cache.shutdown()
         await super().unload()
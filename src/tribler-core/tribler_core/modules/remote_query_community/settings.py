@@ -9,6 +9,11 @@ class RemoteQueryCommunitySettings(TriblerConfigSection):
     max_response_size: int = 100  # Max number of entries returned by SQL query
     max_channel_query_back: int = 4  # Max number of entries to query back on receiving an unknown channel
     push_updates_back_enabled = True
+    # Every peer may send us a burst of max_peer_query_burst queries, and max_peer_query_rate queries per second after
+    max_peer_query_rate: float = 5.0
+    max_peer_query_burst: int = 50
+    max_running_queries: int = 2  # Max number of incoming queries that are processed by the database at the same time
+    max_queued_queries: int = 50  # Max number of incoming queries that wait for the database, the others are dropped
 
     @property
     def channel_query_back_enabled(self):
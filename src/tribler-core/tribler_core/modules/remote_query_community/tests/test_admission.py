@@ -0,0 +1,130 @@
+from asyncio import Future, gather, sleep
+from unittest.mock import patch
+
+import pytest
+
+from tribler_core.modules.remote_query_community.admission import (
+    PRIORITY_SEARCH,
+    PRIORITY_SYNC,
+    PeerRateLimiter,
+    QueryScheduler,
+    QueryShedException,
+    TokenBucket,
+    get_query_key,
+    get_query_priority,
+)
+
+
+def test_get_query_priority():
+    assert get_query_priority({"txt_filter": "ubuntu*", "first": 0}) == PRIORITY_SEARCH
+    assert get_query_priority({"subscribed": True, "txt_filter": None}) == PRIORITY_SYNC
+
+
+def test_get_query_key():
+    assert get_query_key({"a": 1, "b": [1, 2]}) == get_query_key({"b": [1, 2], "a": 1})
+    assert get_query_key({"a": 1}) != get_query_key({"a": 2})
+
+
+def test_token_bucket():
+    with patch('time.monotonic', return_value=100):
+        bucket = TokenBucket(rate=2, burst=3)
+        assert [bucket.consume() for _ in range(4)] == [True, True, True, False]
+    with patch('time.monotonic', return_value=101):
+        assert [bucket.consume() for _ in range(3)] == [True, True, False]
+    with patch('time.monotonic', return_value=200):
+        # The bucket does not fill up beyond the burst size
+        assert [bucket.consume() for _ in range(4)] == [True, True, True, False]
+
+
+def test_peer_rate_limiter():
+    limiter = PeerRateLimiter(rate=0, burst=1, max_peers=2)
+    assert limiter.allow(b'a')
+    assert not limiter.allow(b'a')
+    assert limiter.allow(b'b')
+    assert limiter.allow(b'c')
+    assert list(limiter.buckets) == [b'b', b'c']
+
+
+@pytest.mark.asyncio
+async def test_scheduler_priorities():
+    """
+    Test whether the scheduler bounds the number of running queries and serves the queued queries by priority
+    """
+    scheduler = QueryScheduler(max_running=1, max_queued=5)
+    order = []
+    blocker = Future()
+
+    async def query(name, wait_for=None):
+        order.append(name)
+        if wait_for:
+            await wait_for
+        return name
+
+    first = scheduler.run('first', PRIORITY_SYNC, lambda: query('first', blocker))
+    search = scheduler.run('search', PRIORITY_SEARCH, lambda: query('search'))
+    sync = scheduler.run('sync', PRIORITY_SYNC, lambda: query('sync'))
+    await sleep(0.01)
+    assert order == ['first']
+    assert scheduler.running == 1
+
+    blocker.set_result(None)
+    assert await gather(first, search, sync) == ['first', 'search', 'sync']
+    assert order == ['first', 'sync', 'search']
+    assert scheduler.running == 0
+    assert not scheduler.in_flight
+
+
+@pytest.mark.asyncio
+async def test_scheduler_shed():
+    """
+    Test whether queries are shed when the queue is full, with the lowest priority queries going first
+    """
+    scheduler = QueryScheduler(max_running=1, max_queued=1)
+    blocker = Future()
+
+    async def query(name):
+        await blocker
+        return name
+
+    running = scheduler.run('running', PRIORITY_SYNC, lambda: query('running'))
+    search = scheduler.run('search', PRIORITY_SEARCH, lambda: query('search'))
+    await sleep(0.01)
+
+    # A query with the same priority as the queued one is shed
+    with pytest.raises(QueryShedException):
+        await scheduler.run('search2', PRIORITY_SEARCH, lambda: query('search2'))
+
+    # A query with a higher priority takes the place of the queued one
+    sync = scheduler.run('sync', PRIORITY_SYNC, lambda: query('sync'))
+    await sleep(0.01)
+    with pytest.raises(QueryShedException):
+        await search
+
+    blocker.set_result(None)
+    assert await gather(running, sync) == ['running', 'sync']
+    assert scheduler.running == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_deduplicate():
+    """
+    Test whether identical queries that arrive while one is running share its result
+    """
+    scheduler = QueryScheduler(max_running=2, max_queued=2)
+    calls = []
+    blocker = Future()
+
+    async def query():
+        calls.append(1)
+        await blocker
+        return ['result']
+
+    results = [scheduler.run('key', PRIORITY_SYNC, query) for _ in range(3)]
+    await sleep(0.01)
+    blocker.set_result(None)
+    assert await gather(*results) == [['result']] * 3
+    assert len(calls) == 1
+
+    # Once the query has finished, an identical query runs again
+    assert await scheduler.run('key', PRIORITY_SYNC, query) == ['result']
+    assert len(calls) == 2
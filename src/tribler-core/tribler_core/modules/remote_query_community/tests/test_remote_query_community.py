@@ -136,6 +136,42 @@ class TestRemoteQueryCommunity(TestBase):
         await self.deliver_messages(timeout=0.5)
         callback.assert_called()
 
+    async def test_remote_select_rate_limited(self):
+        """
+        Test whether the queries of a peer that goes over its rate limit are ignored
+        """
+        with db_session:
+            self.channel_metadata(0).create_channel("ubuntu channel", "ubuntu")
+        self.overlay(0).peer_rate_limiter.rate = 0
+        self.overlay(0).peer_rate_limiter.burst = 1
+
+        callback = Mock()
+        kwargs_dict = {"txt_filter": "ubuntu*"}
+        self.overlay(1).send_remote_select(self.nodes[0].my_peer, **kwargs_dict, processing_callback=callback)
+        await self.deliver_messages(timeout=0.5)
+        callback.assert_called_once()
+
+        self.overlay(1).send_remote_select(self.nodes[0].my_peer, **kwargs_dict, processing_callback=callback)
+        await self.deliver_messages(timeout=0.5)
+        callback.assert_called_once()
+
+    async def test_remote_select_shed(self):
+        """
+        Test whether a query that is shed by an overloaded scheduler gets an empty response
+        """
+        with db_session:
+            self.channel_metadata(0).create_channel("ubuntu channel", "ubuntu")
+        self.overlay(0).query_scheduler.max_queued = 0
+        self.overlay(0).query_scheduler.running = self.overlay(0).query_scheduler.max_running
+
+        callback = Mock()
+        self.overlay(1).send_remote_select(self.nodes[0].my_peer, txt_filter="ubuntu*", processing_callback=callback)
+        await self.deliver_messages(timeout=0.5)
+        callback.assert_called_once()
+        assert callback.call_args[0][1] == []
+        with db_session:
+            assert not self.channel_metadata(1).select().count()
+
     async def test_remote_select_query_back(self):
         """
         Test querying back preview contents for previously unknown channels.
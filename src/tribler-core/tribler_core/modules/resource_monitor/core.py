@@ -1,5 +1,6 @@
 import os
 import time
+from asyncio import get_event_loop
 from collections import deque
 
 from ipv8.taskmanager import TaskManager
@@ -8,12 +9,25 @@ import psutil
 
 from tribler_common.simpledefs import NTFY
 
+from tribler_core.modules.metrics import default_registry
 from tribler_core.modules.resource_monitor.base import ResourceMonitor
-from tribler_core.modules.resource_monitor.profiler import YappiProfiler
+from tribler_core.modules.resource_monitor.profiler import SamplingProfiler, YappiProfiler
 
 FREE_DISK_THRESHOLD = 100 * (1024 * 1024)  # 100MB
 DEFAULT_RESOURCE_FILENAME = "resources.log"
 CORE_RESOURCE_HISTORY_SIZE = 1000
+# Upper bounds of the loop lag histogram buckets, in seconds
+LOOP_LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+def get_executor_queue_size():
+    """
+    Get the number of calls that are waiting for a thread of the default executor.
+    """
+    # The default executor and its work queue are not part of the public asyncio API
+    executor = getattr(get_event_loop(), '_default_executor', None)
+    work_queue = getattr(executor, '_work_queue', None)
+    return work_queue.qsize() if work_queue is not None else 0
 
 
 class CoreResourceMonitor(ResourceMonitor, TaskManager):
@@ -36,6 +50,20 @@ class CoreResourceMonitor(ResourceMonitor, TaskManager):
 
         # Setup yappi profiler
         self.profiler = YappiProfiler(self.session)
+        settings = session.config.resource_monitor
+        self.sampling_profiler = SamplingProfiler(self.session, interval=settings.sampling_interval,
+                                                  history_size=settings.sampling_history_size,
+                                                  block_threshold=settings.loop_block_threshold)
+
+        self.loop_lag_interval = session.config.resource_monitor.loop_lag_interval
+        self.last_loop_check = None
+        self.loop_lag = default_registry.histogram('event_loop_lag_seconds',
+                                                   'Delay of the event loop in running a scheduled call',
+                                                   buckets=LOOP_LAG_BUCKETS)
+        default_registry.gauge('executor_queue_size', 'Number of calls waiting for a thread of the default executor',
+                               function=get_executor_queue_size)
+        self.memory_gauge = default_registry.gauge('process_memory_bytes', 'Memory usage of the core process')
+        self.cpu_gauge = default_registry.gauge('process_cpu_percent', 'CPU usage of the core process')
 
     def start(self):
         """
@@ -43,15 +71,35 @@ class CoreResourceMonitor(ResourceMonitor, TaskManager):
         """
         poll_interval = self.session.config.resource_monitor.poll_interval
         self.register_task("check_resources", self.check_resources, interval=poll_interval)
+        self.last_loop_check = get_event_loop().time()
+        self.register_task("check_loop_lag", self.check_loop_lag, interval=self.loop_lag_interval)
+        if self.session.config.resource_monitor.sampling_profiler_enabled:
+            self.sampling_profiler.start()
 
     async def stop(self):
         """
         Called during shutdown, should clear all scheduled tasks.
         """
+        if self.sampling_profiler.is_running():
+            self.sampling_profiler.stop()
+            self.sampling_profiler.clear()
         await self.shutdown_task_manager()
 
+    def check_loop_lag(self):
+        """
+        Record how much later than scheduled this call runs, which is the time that the event loop was busy with
+        other work.
+        """
+        now = get_event_loop().time()
+        self.loop_lag.observe(max(0, now - self.last_loop_check - self.loop_lag_interval))
+        self.last_loop_check = now
+
     def check_resources(self):
         super().check_resources()
+        if self.memory_data:
+            self.memory_gauge.set(self.memory_data[-1][1])
+        if self.cpu_data:
+            self.cpu_gauge.set(self.cpu_data[-1][1])
         # Additionally, record the disk and notify on low disk space available.
         self.record_disk_usage()
 
@@ -1,8 +1,25 @@
 import os
+import sys
+import threading
 import time
+from asyncio import get_event_loop
+from collections import Counter, deque
 
 import yappi
 
+# The sampling profiler considers the event loop blocked if it did not run a heartbeat call for this many seconds
+LOOP_HEARTBEAT_INTERVAL = 0.05
+# Root frame of the stacks that were sampled while the event loop was blocked
+LOOP_BLOCKED_FRAME = '[loop blocked]'
+
+
+def get_profiler_output_dir(session):
+    log_dir = session.config.state_dir / 'logs'
+    # Make the log directory if it does not exist
+    if not log_dir.exists():
+        os.makedirs(log_dir)
+    return log_dir
+
 
 class YappiProfiler:
 
@@ -39,13 +56,139 @@ class YappiProfiler:
         yappi_stats = yappi.get_func_stats()
         yappi_stats.sort('tsub', sort_order="desc")
 
-        log_dir = self.session.config.state_dir / 'logs'
-        file_path = log_dir / f"yappi_{self._start_time}.stats"
-        # Make the log directory if it does not exist
-        if not log_dir.exists():
-            os.makedirs(log_dir)
-
+        file_path = get_profiler_output_dir(self.session) / f"yappi_{self._start_time}.stats"
         yappi_stats.save(file_path, type='callgrind')
         yappi.clear_stats()
         self._is_running = False
         return file_path
+
+
+class SamplingProfiler:
+    """
+    A statistical profiler that samples the stacks of all threads from a background thread, like the WatchDog does.
+
+    Unlike Yappi, it does not hook into every function call, so it can keep running under real load. The most recent
+    samples are kept in a ring buffer and are written in the collapsed stack format, which can be turned into a
+    flamegraph directly. Writing the samples takes a while, so dump() should be called on a worker thread. Samples of the event loop thread that were taken while the loop did not run its heartbeat
+    call for longer than the block threshold get an extra root frame, so stalls are easy to find.
+    """
+
+    def __init__(self, session, interval=0.02, history_size=50000, block_threshold=0.25):
+        self.session = session
+        self.interval = interval
+        self.block_threshold = block_threshold
+
+        # (collapsed stack, whether the event loop was blocked), oldest first
+        self.samples = deque(maxlen=history_size)
+        self._samples_lock = threading.Lock()
+        # Collapsed stack -> the same string, so that identical stacks share their memory
+        self._stacks = {}
+        # Code object -> frame name in the collapsed stacks
+        self._frame_names = {}
+
+        self._start_time = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._loop = None
+        self._loop_thread_id = None
+        self._last_heartbeat = 0
+        self._heartbeat_handle = None
+
+    def is_running(self):
+        return self._thread is not None
+
+    def start(self):
+        """
+        Start sampling. Should be called from the event loop thread.
+        """
+        if self._thread is not None:
+            raise RuntimeError("Profiler is already running")
+
+        self.clear()
+        self._loop = get_event_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat()
+
+        self._start_time = int(time.time())
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop sampling. The collected samples are kept until they are cleared, so that they can still be dumped.
+        """
+        if self._thread is None:
+            raise RuntimeError("Profiler is not running")
+
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        if self._heartbeat_handle:
+            self._heartbeat_handle.cancel()
+            self._heartbeat_handle = None
+
+    def clear(self):
+        with self._samples_lock:
+            self.samples.clear()
+            self._stacks.clear()
+
+    def _heartbeat(self):
+        self._last_heartbeat = time.monotonic()
+        self._heartbeat_handle = self._loop.call_later(LOOP_HEARTBEAT_INTERVAL, self._heartbeat)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.take_sample()
+
+    def get_frame_name(self, code):
+        name = self._frame_names.get(code)
+        if name is None:
+            name = self._frame_names[code] = f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+        return name
+
+    def take_sample(self):
+        """
+        Record the current stack of every thread, except for the sampling thread itself.
+        """
+        loop_blocked = time.monotonic() - self._last_heartbeat > LOOP_HEARTBEAT_INTERVAL + self.block_threshold
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own_thread_id = threading.get_ident()
+
+        samples = []
+        for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+            if thread_id == own_thread_id:
+                continue
+            frame_names = []
+            while frame is not None:
+                frame_names.append(self.get_frame_name(frame.f_code))
+                frame = frame.f_back
+            frame_names.append(thread_names.get(thread_id, 'Unknown'))
+            stack = ';'.join(reversed(frame_names))
+            samples.append((stack, loop_blocked and thread_id == self._loop_thread_id))
+
+        with self._samples_lock:
+            if len(self._stacks) > self.samples.maxlen:
+                # Forget the stacks that are no longer in the ring buffer
+                self._stacks = {stack: stack for stack, _ in self.samples}
+            for stack, blocked in samples:
+                self.samples.append((self._stacks.setdefault(stack, stack), blocked))
+
+    def get_collapsed_stacks(self):
+        """
+        Aggregate the samples in the ring buffer into a dictionary collapsed stack -> number of samples.
+        """
+        with self._samples_lock:
+            samples = list(self.samples)
+        return Counter(f'{LOOP_BLOCKED_FRAME};{stack}' if blocked else stack for stack, blocked in samples)
+
+    def dump(self):
+        """
+        Write the samples in the ring buffer to the output directory, without clearing them.
+        Return the path of the collapsed stacks file.
+        """
+        file_path = get_profiler_output_dir(self.session) / f"sampling_{self._start_time}_{int(time.time())}.collapsed"
+        with open(file_path, 'w') as collapsed_file:
+            for stack, count in self.get_collapsed_stacks().most_common():
+                collapsed_file.write(f'{stack} {count}\n')
+        return file_path
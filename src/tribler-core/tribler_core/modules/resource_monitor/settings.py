@@ -9,6 +9,11 @@ class ResourceMonitorSettings(TriblerConfigSection):
     cpu_priority: int = 1
     poll_interval: int = 5
     history_size: int = 20
+    loop_lag_interval: float = 0.5
+    sampling_profiler_enabled: bool = False
+    sampling_interval: float = 0.02
+    sampling_history_size: int = 50000
+    loop_block_threshold: float = 0.25
 
     @validator('cpu_priority')
     def validate_cpu_priority(cls, v):
@@ -19,3 +24,13 @@ class ResourceMonitorSettings(TriblerConfigSection):
     def validate_not_less_than_one(cls, v):
         assert v >= 1, 'Value must be not less than 1'
         return v
+
+    @validator('loop_lag_interval', 'sampling_interval', 'loop_block_threshold')
+    def validate_positive(cls, v):
+        assert v > 0, 'Value must be positive'
+        return v
+
+    @validator('sampling_history_size')
+    def validate_sampling_history_size(cls, v):
+        assert v >= 1, 'Value must be not less than 1'
+        return v
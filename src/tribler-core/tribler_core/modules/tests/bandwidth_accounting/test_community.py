@@ -127,6 +127,7 @@ class TestBandwidthAccountingCommunity(TestBase):
         self.nodes[2].overlay.query_transactions(self.nodes[1].my_peer)
 
         await self.deliver_messages()
+        await self.nodes[2].overlay.flush_transactions()
 
         pk1 = self.nodes[0].my_peer.public_key.key_to_bin()
         assert self.nodes[2].overlay.database.get_total_taken(pk1) == 500
@@ -142,6 +143,38 @@ class TestBandwidthAccountingCommunity(TestBase):
         self.nodes[2].overlay.query_random_peer()
 
         await self.deliver_messages()
+        await self.nodes[2].overlay.flush_transactions()
 
         pk1 = self.nodes[0].my_peer.public_key.key_to_bin()
         assert self.nodes[2].overlay.database.get_total_taken(pk1) == 500
+
+    async def test_flush_transactions(self):
+        """
+        Test whether only the latest valid third-party transaction between two parties is stored
+        """
+        pk1 = self.nodes[0].my_peer.public_key.key_to_bin()
+        pk2 = self.nodes[1].my_peer.public_key.key_to_bin()
+        await self.nodes[0].overlay.do_payout(self.nodes[1].overlay.my_peer, 500)
+        first_tx = self.nodes[0].overlay.database.get_latest_transaction(pk1, pk2)
+        await self.nodes[0].overlay.do_payout(self.nodes[1].overlay.my_peer, 500)
+        latest_tx = self.nodes[0].overlay.database.get_latest_transaction(pk1, pk2)
+
+        self.add_node_to_experiment(self.create_node())
+        overlay = self.nodes[2].overlay
+        overlay.queue_transaction(latest_tx)
+        overlay.queue_transaction(latest_tx)
+        overlay.queue_transaction(BandwidthTransactionData(3, pk1, pk2, b"invalid", EMPTY_SIGNATURE, 5000))
+        assert overlay.num_pending_transactions == 2
+        assert overlay.database.get_balance(pk1) == 0
+
+        await overlay.flush_transactions()
+        assert not overlay.pending_transactions
+        assert overlay.database.get_latest_transaction(pk1, pk2).sequence_number == 2
+        assert overlay.database.get_total_taken(pk1) == 1000
+        # The balance that was cached before the flush is refreshed
+        assert overlay.database.get_balance(pk1) == -1000
+
+        # An older transaction does not replace the stored one
+        overlay.queue_transaction(first_tx)
+        await overlay.flush_transactions()
+        assert overlay.database.get_total_taken(pk1) == 1000
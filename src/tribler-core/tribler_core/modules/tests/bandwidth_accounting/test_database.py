@@ -118,6 +118,27 @@ async def test_totals(bandwidth_db):
     assert bandwidth_db.get_balance(b"b") == -1000
 
 
+def test_cached_balance(bandwidth_db):
+    """
+    Test whether the cached balances follow the inserted transactions
+    """
+    assert bandwidth_db.get_balance(b"a") == 0
+    assert bandwidth_db.get_balance(b"b") == 0
+
+    bandwidth_db.BandwidthTransaction.insert(BandwidthTransactionData(1, b"a", b"b", EMPTY_SIGNATURE,
+                                                                      EMPTY_SIGNATURE, 3000))
+    bandwidth_db.BandwidthTransaction.insert(BandwidthTransactionData(2, b"a", b"b", EMPTY_SIGNATURE,
+                                                                      EMPTY_SIGNATURE, 5000))
+    bandwidth_db.BandwidthTransaction.insert(BandwidthTransactionData(1, b"b", b"a", EMPTY_SIGNATURE,
+                                                                      EMPTY_SIGNATURE, 1000))
+    assert bandwidth_db.get_balance(b"a") == -4000
+    assert bandwidth_db.get_balance(b"b") == 4000
+
+    bandwidth_db.balances.clear()
+    assert bandwidth_db.get_balance(b"a") == -4000
+    assert bandwidth_db.get_balance(b"b") == 4000
+
+
 @db_session
 def test_peers_helped(bandwidth_db):
     assert bandwidth_db.get_num_peers_helped(b"a") == 0
@@ -170,3 +191,33 @@ def test_history(bandwidth_db):
 
     history = bandwidth_db.get_history()
     assert len(history) == 2
+
+
+@pytest.mark.asyncio
+async def test_insert_transactions_threaded(tmpdir, my_key):
+    """
+    Test whether a batch of transactions is stored from a worker thread, without replacing newer transactions
+    """
+    db = BandwidthDatabase(Path(tmpdir) / "bandwidth.db", my_key.pub().key_to_bin())
+    db.BandwidthTransaction.insert(BandwidthTransactionData(2, b"a", b"b", EMPTY_SIGNATURE, EMPTY_SIGNATURE, 3000))
+
+    await db.run_threaded(db.insert_transactions, [
+        BandwidthTransactionData(1, b"a", b"b", EMPTY_SIGNATURE, EMPTY_SIGNATURE, 1000),
+        BandwidthTransactionData(1, b"c", b"d", EMPTY_SIGNATURE, EMPTY_SIGNATURE, 2000),
+    ])
+    assert db.get_latest_transaction(b"a", b"b").sequence_number == 2
+    assert db.get_total_taken(b"c") == 2000
+    db.shutdown()
+
+
+def test_cached_balance_invalidated(bandwidth_db):
+    """
+    Test whether storing a batch of transactions leaves the cached balances alone until they are invalidated
+    """
+    assert bandwidth_db.get_balance(b"a") == 0
+    bandwidth_db.insert_transactions([BandwidthTransactionData(1, b"a", b"b", EMPTY_SIGNATURE, EMPTY_SIGNATURE, 3000)])
+    assert bandwidth_db.get_balance(b"a") == 0
+
+    bandwidth_db.invalidate_balances([b"a", b"b"])
+    assert bandwidth_db.get_balance(b"a") == -3000
+    assert bandwidth_db.get_balance(b"b") == 3000
@@ -0,0 +1,81 @@
+import pytest
+
+from tribler_core.modules.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+@pytest.fixture(name="registry")
+def fixture_registry():
+    return MetricsRegistry()
+
+
+def test_counter():
+    counter = Counter('requests')
+    counter.inc()
+    counter.inc(2)
+    assert counter.get_value() == 3
+
+
+def test_gauge():
+    gauge = Gauge('circuits')
+    gauge.set(5)
+    gauge.inc()
+    gauge.dec(2)
+    assert gauge.get_value() == 4
+
+    gauge.set_function(lambda: 42)
+    assert gauge.get_value() == 42
+
+
+def test_gauge_function_error():
+    """
+    Test whether a gauge with a failing function reads as zero
+    """
+    gauge = Gauge('broken', function=lambda: 1 / 0)
+    assert gauge.get_value() == 0
+
+
+def test_histogram():
+    histogram = Histogram('duration', buckets=(1, 5))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+    assert histogram.bucket_counts == [2, 1, 1]
+    assert histogram.get_value() == {'count': 4, 'sum': 14.5, 'max': 10}
+    assert histogram.get_text_lines() == ['tribler_duration_bucket{le="1"} 2',
+                                          'tribler_duration_bucket{le="5"} 3',
+                                          'tribler_duration_bucket{le="+Inf"} 4',
+                                          'tribler_duration_sum 14.5',
+                                          'tribler_duration_count 4']
+
+
+def test_histogram_time():
+    histogram = Histogram('duration')
+    with histogram.time():
+        pass
+    assert histogram.count == 1
+
+
+def test_register_existing(registry):
+    """
+    Test whether registering a metric twice returns the existing metric
+    """
+    counter = registry.counter('requests')
+    assert registry.counter('requests') is counter
+    with pytest.raises(ValueError):
+        registry.gauge('requests')
+
+
+def test_snapshot_and_text(registry):
+    registry.counter('requests', 'Number of requests').inc(3)
+    registry.gauge('circuits', function=lambda: 2)
+    registry.histogram('duration', buckets=(1,)).observe(0.5)
+
+    assert registry.get_snapshot() == {'circuits': 2,
+                                       'duration': {'count': 1, 'sum': 0.5, 'max': 0.5},
+                                       'requests': 3}
+    text = registry.get_text()
+    assert '# TYPE tribler_circuits gauge\ntribler_circuits 2\n' in text
+    assert '# HELP tribler_requests Number of requests\n# TYPE tribler_requests counter\ntribler_requests 3\n' in text
+    assert 'tribler_duration_count 1\n' in text
+
+    registry.unregister('requests')
+    assert 'requests' not in registry.get_snapshot()
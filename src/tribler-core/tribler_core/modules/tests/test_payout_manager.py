@@ -1,3 +1,4 @@
+from asyncio import Future, gather, sleep
 from unittest.mock import Mock
 
 from ipv8.util import succeed
@@ -97,3 +98,64 @@ def test_update_peer(payout_manager):
 
     payout_manager.update_peer(b'a', b'b', 1338)
     assert payout_manager.tribler_peers[b'a'][b'b'] == 1338
+
+
+@pytest.mark.asyncio
+async def test_do_payout_merged(payout_manager):
+    """
+    Test whether a payout that is requested while a payout to the same mid is in progress is merged into the latter
+    """
+    payouts = []
+
+    async def do_payout(peer, amount):
+        payouts.append((peer, amount))
+        await sleep(0.01)
+
+    payout_manager.update_peer(b'a', b'b', 1000)
+    payout_manager.update_peer(b'a', b'c', 337)
+    payout_manager.bandwidth_community.do_payout = do_payout
+    results = await gather(payout_manager.do_payout(b'a'), payout_manager.do_payout(b'a'))
+    assert results[0] and results[0] is results[1]
+    assert len(payouts) == 1
+    assert payouts[0][1] == 1337
+    assert b'a' not in payout_manager.tribler_peers
+    assert not payout_manager.pending_payouts
+
+
+@pytest.mark.asyncio
+async def test_do_payout_balance_added_during_lookup(payout_manager):
+    """
+    Test whether the balances that are added while the node is being resolved are paid out as well
+    """
+    payouts = []
+    lookup = Future()
+
+    async def do_payout(peer, amount):
+        payouts.append((peer, amount))
+
+    payout_manager.resolver.resolve = lambda _: lookup
+    payout_manager.bandwidth_community.do_payout = do_payout
+    payout_manager.update_peer(b'a', b'b', 1000)
+    payout = payout_manager.do_payout(b'a')
+    await sleep(0)
+
+    payout_manager.update_peer(b'a', b'c', 337)
+    assert payout_manager.do_payout(b'a') is payout
+    lookup.set_result([b'node'])
+    assert await payout == b'node'
+    assert payouts == [(b'node', 1337)]
+    assert b'a' not in payout_manager.tribler_peers
+
+
+def test_remove_paid_balances(payout_manager):
+    """
+    Test whether only the paid amounts are subtracted from the outstanding balances
+    """
+    payout_manager.update_peer(b'a', b'b', 1500)
+    payout_manager.update_peer(b'a', b'c', 200)
+    payout_manager.update_peer(b'a', b'd', 42)
+    payout_manager.remove_paid_balances(b'a', {b'b': 1000, b'c': 200})
+    assert payout_manager.tribler_peers[b'a'] == {b'b': 500, b'd': 42}
+
+    payout_manager.remove_paid_balances(b'a', {b'b': 500, b'd': 42})
+    assert b'a' not in payout_manager.tribler_peers
@@ -0,0 +1,91 @@
+from asyncio import Future, gather, sleep
+from unittest.mock import Mock
+
+from ipv8.dht import DHTError
+from ipv8.util import succeed
+
+import pytest
+
+from tribler_core.modules.peer_resolver import FAILURE_BACKOFF_BASE, PeerResolver, get_failure_backoff
+
+
+@pytest.fixture
+async def peer_resolver():
+    fake_dht = Mock()
+    fake_dht.connect_peer = Mock(side_effect=lambda mid: succeed([mid * 2]))
+    peer_resolver = PeerResolver(fake_dht, max_concurrent=2)
+    yield peer_resolver
+    await peer_resolver.shutdown()
+
+
+def test_get_failure_backoff():
+    assert get_failure_backoff(1) == FAILURE_BACKOFF_BASE
+    assert get_failure_backoff(3) == FAILURE_BACKOFF_BASE * 4
+    assert get_failure_backoff(100) == get_failure_backoff(101)
+
+
+@pytest.mark.asyncio
+async def test_resolve_cached(peer_resolver):
+    """
+    Test whether a resolved mid is only looked up again once its cache entry has expired
+    """
+    assert await peer_resolver.resolve(b'a') == [b'aa']
+    assert await peer_resolver.resolve(b'a') == [b'aa']
+    assert peer_resolver.dht.connect_peer.call_count == 1
+
+    peer_resolver.resolved[b'a'] = ([b'aa'], 0)
+    assert await peer_resolver.resolve(b'a') == [b'aa']
+    assert peer_resolver.dht.connect_peer.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_resolve_failure_backoff(peer_resolver):
+    """
+    Test whether a mid that could not be resolved is not looked up again until its backoff has expired
+    """
+    peer_resolver.dht.connect_peer.side_effect = DHTError('Failed to connect peer')
+    assert await peer_resolver.resolve(b'a') == []
+    assert await peer_resolver.resolve(b'a') == []
+    assert peer_resolver.dht.connect_peer.call_count == 1
+    assert peer_resolver.failures[b'a'][0] == 1
+
+    peer_resolver.failures[b'a'] = (1, 0)
+    peer_resolver.dht.connect_peer.side_effect = lambda _: succeed([])
+    assert await peer_resolver.resolve(b'a') == []
+    assert peer_resolver.dht.connect_peer.call_count == 2
+    assert peer_resolver.failures[b'a'][0] == 2
+
+    # A successful lookup clears the failures
+    peer_resolver.failures[b'a'] = (2, 0)
+    peer_resolver.dht.connect_peer.side_effect = lambda mid: succeed([mid])
+    assert await peer_resolver.resolve(b'a') == [b'a']
+    assert b'a' not in peer_resolver.failures
+
+
+@pytest.mark.asyncio
+async def test_resolve_concurrent(peer_resolver):
+    """
+    Test whether concurrent requests for the same mid share a lookup, and whether the number of lookups is bounded
+    """
+    lookups = {}
+    peer_resolver.dht.connect_peer.side_effect = lambda mid: lookups.setdefault(mid, Future())
+
+    results = gather(*[peer_resolver.resolve(mid) for mid in [b'a', b'b', b'a', b'c']])
+    await sleep(0.01)
+    assert sorted(lookups) == [b'a', b'b']
+
+    for mid in [b'a', b'b']:
+        lookups[mid].set_result([mid])
+    await sleep(0.01)
+    lookups[b'c'].set_result([b'c'])
+
+    assert await results == [[b'a'], [b'b'], [b'a'], [b'c']]
+    assert peer_resolver.dht.connect_peer.call_count == 3
+    assert not peer_resolver.lookups
+
+
+@pytest.mark.asyncio
+async def test_resolve_without_dht():
+    peer_resolver = PeerResolver(None)
+    assert await peer_resolver.resolve(b'a') == []
+    await peer_resolver.shutdown()
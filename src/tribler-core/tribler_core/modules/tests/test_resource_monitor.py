@@ -1,3 +1,4 @@
+import asyncio
 import os
 import random
 import time
@@ -9,6 +10,7 @@ import pytest
 from tribler_common.simpledefs import NTFY
 
 from tribler_core.modules.resource_monitor.core import CoreResourceMonitor
+from tribler_core.modules.resource_monitor.profiler import LOOP_BLOCKED_FRAME
 
 
 @pytest.fixture(name="resource_monitor")
@@ -155,3 +157,67 @@ def test_profiler(resource_monitor):
 
     with pytest.raises(RuntimeError):
         profiler.stop()
+
+
+@pytest.mark.asyncio
+async def test_check_loop_lag(resource_monitor):
+    """
+    Test whether the time that the event loop is blocked is recorded as loop lag
+    """
+    resource_monitor.loop_lag_interval = 0.01
+    resource_monitor.last_loop_check = asyncio.get_event_loop().time() - 0.01
+    count = resource_monitor.loop_lag.count
+    resource_monitor.check_loop_lag()
+    time.sleep(0.11)
+    resource_monitor.check_loop_lag()
+    assert resource_monitor.loop_lag.count == count + 2
+    assert resource_monitor.loop_lag.max >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_sampling_profiler(resource_monitor):
+    """
+    Test whether the sampling profiler writes collapsed stacks, and marks the stacks sampled while the loop is blocked
+    """
+    profiler = resource_monitor.sampling_profiler
+    profiler.interval = 0.005
+    profiler.block_threshold = 0.05
+    assert not profiler.is_running()
+
+    profiler.start()
+    assert profiler.is_running()
+    with pytest.raises(RuntimeError):
+        profiler.start()
+
+    # Block the event loop
+    time.sleep(0.3)
+    await asyncio.sleep(0.1)
+
+    profiler.stop()
+    assert not profiler.is_running()
+    stats_file = await asyncio.get_event_loop().run_in_executor(None, profiler.dump)
+    profiler.clear()
+    assert not profiler.samples
+    with open(stats_file) as collapsed_file:
+        lines = collapsed_file.read().splitlines()
+    blocked_stacks = [line for line in lines if line.startswith(LOOP_BLOCKED_FRAME + ';MainThread;')]
+    assert blocked_stacks
+    assert any('test_sampling_profiler' in line for line in blocked_stacks)
+    assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in lines)
+
+    with pytest.raises(RuntimeError):
+        profiler.stop()
+
+
+@pytest.mark.asyncio
+async def test_sampling_profiler_ring_buffer(resource_monitor):
+    """
+    Test whether the sampling profiler only keeps the most recent samples
+    """
+    profiler = resource_monitor.sampling_profiler
+    profiler.samples = deque(maxlen=3)
+    for _ in range(5):
+        # The thread taking the sample is skipped, so sample the main thread from a worker thread
+        await asyncio.get_event_loop().run_in_executor(None, profiler.take_sample)
+    assert len(profiler.samples) == 3
+    assert sum(profiler.get_collapsed_stacks().values()) == 3
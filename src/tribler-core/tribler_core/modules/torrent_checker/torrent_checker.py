@@ -10,6 +10,7 @@ from pony.orm import db_session, desc, select
 
 from tribler_common.simpledefs import NTFY
 
+from tribler_core.modules.metrics import default_registry
 from tribler_core.modules.torrent_checker.torrentchecker_session import (
     FakeBep33DHTSession,
     FakeDHTSession,
@@ -48,6 +49,12 @@ class TorrentChecker(TaskManager):
         # The popularity community gossips this information around.
         self._torrents_checked = dict()
 
+        self.health_checks = default_registry.counter('torrent_health_checks', 'Number of torrent health checks')
+        self.health_check_time = default_registry.histogram('torrent_health_check_seconds',
+                                                            'Duration of torrent health checks')
+        self.active_sessions = default_registry.gauge('tracker_sessions', 'Number of running tracker sessions')
+        self.failed_sessions = default_registry.counter('tracker_session_errors', 'Number of failed tracker sessions')
+
     async def initialize(self):
         self.register_task("tracker_check", self.check_random_tracker, interval=TRACKER_SELECTION_INTERVAL)
         self.register_task("torrent_check", self.check_local_torrents, interval=TORRENT_SELECTION_INTERVAL)
@@ -140,6 +147,7 @@ class TorrentChecker(TaskManager):
             return False
 
     async def connect_to_tracker(self, session):
+        self.active_sessions.inc()
         try:
             info_dict = await session.connect_to_tracker()
             return self._on_result_from_session(session, info_dict)
@@ -148,10 +156,13 @@ class TorrentChecker(TaskManager):
             self.clean_session(session)
         except Exception as e:
             self._logger.warning("Got session error for URL %s: %s", session.tracker_url, str(e).replace('\n]', ']'))
+            self.failed_sessions.inc()
             self.clean_session(session)
             self.tribler_session.tracker_manager.update_tracker_info(session.tracker_url, False)
             e.tracker_url = session.tracker_url
             raise e
+        finally:
+            self.active_sessions.dec()
 
     @property
     def torrents_checked(self):
@@ -338,7 +349,9 @@ class TorrentChecker(TaskManager):
         self._session_list['DHT'].append(session)
         tasks.append(self.connect_to_tracker(session))
 
-        res = await gather(*tasks, return_exceptions=True)
+        self.health_checks.inc()
+        with self.health_check_time.time():
+            res = await gather(*tasks, return_exceptions=True)
         return self.on_torrent_health_check_completed(infohash, res)
 
     def _create_session_for_request(self, tracker_url, timeout=20):
@@ -459,7 +459,8 @@ class FakeDHTSession(TrackerSession):
         Fakely connects to a tracker.
         :return: A deferred that fires with the health information.
         """
-        metainfo = await self._session.dlmgr.get_metainfo(self.infohash, timeout=self.timeout)
+        # Cached metainfo contains the peer counts of an earlier lookup, so always do a fresh lookup
+        metainfo = await self._session.dlmgr.get_metainfo(self.infohash, timeout=self.timeout, use_cache=False)
         if not metainfo:
             raise RuntimeError("Metainfo lookup error")
 
@@ -1,6 +1,7 @@
 from asyncio import Future
 
-from ipv8.requestcache import NumberCache, RandomNumberCache
+from ipv8.messaging.anonymization.caches import CreateRequestCache
+from ipv8.requestcache import NumberCache, RandomNumberCache, RequestCache
 
 
 class BalanceRequestCache(NumberCache):
@@ -33,3 +34,49 @@ class HTTPRequestCache(RandomNumberCache):
 
     def on_timeout(self):
         pass
+
+
+class TunnelRequestCache(RequestCache):
+    """
+    A request cache that also indexes the outstanding create requests by the circuit they came from, so that
+    relayed balance responses can be forwarded without searching through all caches.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.create_requests = {}
+
+    def add(self, cache):
+        cache = super().add(cache)
+        if isinstance(cache, CreateRequestCache):
+            self.create_requests[cache.from_circuit_id] = cache
+        return cache
+
+    def pop(self, prefix, number):
+        cache = super().pop(prefix, number)
+        self._forget_create_request(cache)
+        return cache
+
+    def _on_timeout(self, cache):
+        # Caches that time out are removed without calling pop
+        self._forget_create_request(cache)
+        super()._on_timeout(cache)
+
+    def _forget_create_request(self, cache):
+        if isinstance(cache, CreateRequestCache) and self.create_requests.get(cache.from_circuit_id) is cache:
+            self.create_requests.pop(cache.from_circuit_id)
+
+    def get_create_request(self, from_circuit_id):
+        """
+        Returns the outstanding create request for the given incoming circuit, or None if there is none.
+        """
+        cache = self.create_requests.get(from_circuit_id)
+        if cache is not None and self.get(cache.prefix, cache.number) is not cache:
+            # The request timed out
+            self.create_requests.pop(from_circuit_id)
+            return None
+        return cache
+
+    def clear(self):
+        self.create_requests.clear()
+        return super().clear()
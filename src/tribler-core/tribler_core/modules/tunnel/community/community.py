@@ -1,6 +1,5 @@
 import hashlib
 import math
-import sys
 import time
 from asyncio import Future, TimeoutError as AsyncTimeoutError, open_connection, sleep
 from binascii import unhexlify
@@ -9,7 +8,6 @@ from distutils.version import LooseVersion
 
 import async_timeout
 
-from ipv8.messaging.anonymization.caches import CreateRequestCache
 from ipv8.messaging.anonymization.community import unpack_cell
 from ipv8.messaging.anonymization.hidden_services import HiddenTunnelCommunity
 from ipv8.messaging.anonymization.payload import EstablishIntroPayload, NO_CRYPTO_PACKETS
@@ -34,7 +32,8 @@ from ipv8.util import succeed
 from tribler_common.simpledefs import DLSTATUS_DOWNLOADING, DLSTATUS_METADATA, DLSTATUS_SEEDING, DLSTATUS_STOPPED, NTFY
 
 from tribler_core.modules.bandwidth_accounting.transaction import BandwidthTransactionData
-from tribler_core.modules.tunnel.community.caches import BalanceRequestCache, HTTPRequestCache
+from tribler_core.modules.metrics import default_registry
+from tribler_core.modules.tunnel.community.caches import BalanceRequestCache, HTTPRequestCache, TunnelRequestCache
 from tribler_core.modules.tunnel.community.discovery import GoldenRatioStrategy
 from tribler_core.modules.tunnel.community.dispatcher import TunnelDispatcher
 from tribler_core.modules.tunnel.community.payload import (
@@ -46,6 +45,7 @@ from tribler_core.modules.tunnel.community.payload import (
     RelayBalanceRequestPayload,
     RelayBalanceResponsePayload,
 )
+from tribler_core.modules.tunnel.community.slots import CompetingSlots, RandomSlots
 from tribler_core.modules.tunnel.socks5.server import Socks5Server
 from tribler_core.utilities import path_util
 from tribler_core.utilities.bencodecheck import is_bencoded
@@ -56,6 +56,7 @@ DESTROY_REASON_BALANCE = 65535
 PEER_FLAG_EXIT_HTTP = 32768
 
 MAX_HTTP_PACKET_SIZE = 1400
+MAX_HTTP_REQUESTS_PER_CIRCUIT = 5
 
 
 class TriblerTunnelCommunity(HiddenTunnelCommunity):
@@ -76,6 +77,10 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
         super().__init__(*args, **kwargs)
         self._use_main_thread = True
 
+        # The base community creates a plain RequestCache, stop it and use one that indexes the create requests
+        self.request_cache.clear()
+        self.request_cache = TunnelRequestCache()
+
         if self.tribler_session:
             if self.tribler_session.config.tunnel_community.exitnode_enabled:
                 self.settings.peer_flags.add(PEER_FLAG_EXIT_BT)
@@ -90,11 +95,25 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
         self.bittorrent_peers = {}
         self.dispatcher = TunnelDispatcher(self)
         self.download_states = {}
-        self.competing_slots = [(0, None)] * num_competing_slots  # 1st tuple item = token balance, 2nd = circuit id
-        self.random_slots = [None] * num_random_slots
+        # Real infohash -> lookup infohash, and lookup infohash -> download, for the anonymous downloads
+        self.lookup_info_hashes = {}
+        self.lookup_info_hash_downloads = {}
+        # Rendezvous circuit id -> number of hops of the session in which the circuit IP is allowed
+        self.ip_filter_circuits = {}
+        # Exit circuit id -> number of HTTP requests that we are handling for it
+        self.http_requests = Counter()
+        self.competing_slots = CompetingSlots(num_competing_slots)
+        self.random_slots = RandomSlots(num_random_slots)
         self.reject_callback = None  # This callback is invoked with a tuple (time, balance) when we reject a circuit
         self.last_forced_announce = {}
 
+        self.num_circuits = default_registry.gauge('tunnel_circuits', 'Number of our own circuits')
+        self.num_relays = default_registry.gauge('tunnel_relays', 'Number of relay routes, one per direction')
+        self.num_exit_sockets = default_registry.gauge('tunnel_exit_sockets', 'Number of circuits that we exit for')
+        self.num_hidden_downloads = default_registry.gauge('tunnel_hidden_downloads', 'Number of anonymous downloads')
+        self.rejected_circuits = default_registry.counter('tunnel_rejected_circuits',
+                                                          'Number of circuits rejected because of a low balance')
+
         # Start the SOCKS5 servers
         self.socks_servers = []
         for port in socks_listen_ports:
@@ -165,32 +184,20 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
 
         cache = self.request_cache.pop("balance-request", circuit_id)
 
-        lowest_balance = sys.maxsize
-        lowest_index = -1
-        for ind, tup in enumerate(self.competing_slots):
-            if not tup[1]:
-                # The slot is empty, take it
-                self.competing_slots[ind] = (balance, circuit_id)
-                cache.balance_future.set_result(True)
-                return
-
-            if tup[0] < lowest_balance:
-                lowest_balance = tup[0]
-                lowest_index = ind
-
-        if balance > lowest_balance:
-            # We kick this user out
-            old_circuit_id = self.competing_slots[lowest_index][1]
-            self.logger.info("Kicked out circuit %s (balance: %s) in favor of %s (balance: %s)",
-                             old_circuit_id, lowest_balance, circuit_id, balance)
-            self.competing_slots[lowest_index] = (balance, circuit_id)
-
-            self.remove_relay(old_circuit_id, destroy=DESTROY_REASON_BALANCE)
-            self.remove_exit_socket(old_circuit_id, destroy=DESTROY_REASON_BALANCE)
+        lowest_balance = self.competing_slots.get_lowest_balance()
+        allocated, old_circuit_id = self.competing_slots.allocate(circuit_id, balance)
+        if allocated:
+            if old_circuit_id is not None:
+                # We kick this user out
+                self.logger.info("Kicked out circuit %s (balance: %s) in favor of %s (balance: %s)",
+                                 old_circuit_id, lowest_balance, circuit_id, balance)
+                self.remove_relay(old_circuit_id, destroy=DESTROY_REASON_BALANCE)
+                self.remove_exit_socket(old_circuit_id, destroy=DESTROY_REASON_BALANCE)
 
             cache.balance_future.set_result(True)
         else:
             # We can't compete with the balances in the existing slots
+            self.rejected_circuits.inc()
             if self.reject_callback:
                 self.reject_callback(time.time(), balance)
             cache.balance_future.set_result(False)
@@ -209,10 +216,8 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
             return succeed(False)
 
         # Check whether we have a random open slot, if so, allocate this to this request.
-        for index, slot in enumerate(self.random_slots):
-            if not slot:
-                self.random_slots[index] = circuit_id
-                return succeed(True)
+        if self.random_slots.allocate(circuit_id):
+            return succeed(True)
 
         # No random slots but this user might be allocated a competing slot.
         # Next, we request the token balance of the circuit initiator.
@@ -274,11 +279,11 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
 
     @unpack_cell(RelayBalanceResponsePayload)
     def on_relay_balance_response_cell(self, source_address, payload, _):
-        # At this point, we don't have the circuit ID of the follow-up hop. We have to iterate over the items in the
-        # request cache and find the link to the next hop.
-        for cache in self.request_cache._identifiers.values():
-            if isinstance(cache, CreateRequestCache) and cache.from_circuit_id == payload.circuit_id:
-                self.send_cell(cache.to_peer, BalanceResponsePayload(cache.to_circuit_id, payload.balance))
+        # At this point, we don't have the circuit ID of the follow-up hop. We have to find the create request
+        # that links the incoming circuit to the next hop.
+        cache = self.request_cache.get_create_request(payload.circuit_id)
+        if cache:
+            self.send_cell(cache.to_peer, BalanceResponsePayload(cache.to_circuit_id, payload.balance))
 
     def readd_bittorrent_peers(self):
         for torrent, peers in list(self.bittorrent_peers.items()):
@@ -362,13 +367,8 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
         """
         Clean a specific circuit from the allocated slots.
         """
-        for ind, slot in enumerate(self.random_slots):
-            if slot == circuit_id:
-                self.random_slots[ind] = None
-
-        for ind, tup in enumerate(self.competing_slots):
-            if tup[1] == circuit_id:
-                self.competing_slots[ind] = (0, None)
+        self.random_slots.remove(circuit_id)
+        self.competing_slots.remove(circuit_id)
 
     def remove_circuit(self, circuit_id, additional_info='', remove_now=False, destroy=False):
         if circuit_id not in self.circuits:
@@ -399,6 +399,10 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
 
         affected_peers = self.dispatcher.circuit_dead(circuit)
 
+        hops = self.ip_filter_circuits.pop(circuit_id, None)
+        if hops is not None and self.tribler_session:
+            self.tribler_session.dlmgr.block_ip(hops, self.circuit_id_to_ip(circuit_id))
+
         # Make sure the circuit is marked as closing, otherwise we may end up reusing it
         circuit.close()
 
@@ -421,6 +425,7 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
                                                     both_sides=both_sides)
 
         self.clean_from_slots(circuit_id)
+        self.request_cache.create_requests.pop(circuit_id, None)
 
         if self.tribler_session:
             for removed_relay in removed_relays:
@@ -432,6 +437,7 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
             self.tribler_session.notifier.notify(NTFY.TUNNEL_REMOVE, exit_socket, additional_info)
 
         self.clean_from_slots(circuit_id)
+        self.request_cache.create_requests.pop(circuit_id, None)
 
         return super().remove_exit_socket(circuit_id, additional_info=additional_info,
                                           remove_now=remove_now, destroy=destroy)
@@ -440,6 +446,7 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
         super()._ours_on_created_extended(circuit, payload)
 
         if circuit.state == CIRCUIT_STATE_READY:
+            self.dispatcher.circuit_ready(circuit)
             # Re-add BitTorrent peers, if needed.
             self.readd_bittorrent_peers()
 
@@ -451,6 +458,8 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
         new_states = {}
         hops = {}
         active_downloads_per_hop = {}
+        lookup_info_hashes = {}
+        lookup_info_hash_downloads = {}
 
         for ds in dslist:
             download = ds.get_download()
@@ -459,6 +468,8 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
                 # Convert the real infohash to the infohash used for looking up introduction points
                 real_info_hash = download.get_def().get_infohash()
                 info_hash = self.get_lookup_info_hash(real_info_hash)
+                lookup_info_hashes[real_info_hash] = info_hash
+                lookup_info_hash_downloads[info_hash] = download
                 hops[info_hash] = hop_count
                 new_states[info_hash] = ds.get_status()
 
@@ -469,7 +480,7 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
                     # after a period of having no circuits
                     if self.last_forced_announce.get(info_hash, 0) + 60 <= time.time() \
                             and self.find_circuits(hops=hop_count) \
-                            and not ds.get_peerlist():
+                            and not ds.get_num_connected_peers():
                         download.force_dht_announce()
                         self.last_forced_announce[info_hash] = time.time()
 
@@ -500,6 +511,13 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
                     self.create_introduction_point(info_hash)
 
         self.download_states = new_states
+        self.lookup_info_hashes = lookup_info_hashes
+        self.lookup_info_hash_downloads = lookup_info_hash_downloads
+
+        self.num_circuits.set(len(self.circuits))
+        self.num_relays.set(len(self.relay_from_to))
+        self.num_exit_sockets.set(len(self.exit_sockets))
+        self.num_hidden_downloads.set(len(new_states))
 
     def on_e2e_finished(self, address, info_hash):
         dl = self.get_download(info_hash)
@@ -521,22 +539,35 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
 
         circuit = self.circuits.get(circuit_id)
         if circuit and self.tribler_session:
-            self.update_ip_filter(circuit.info_hash)
+            self.update_ip_filter(circuit)
 
-    def update_ip_filter(self, info_hash):
-        download = self.get_download(info_hash)
-        lt_session = self.tribler_session.dlmgr.get_session(download.config.get_hops())
-        ip_addresses = [self.circuit_id_to_ip(c.circuit_id)
-                        for c in self.find_circuits(ctype=CIRCUIT_TYPE_RP_SEEDER)] + ['1.1.1.1']
-        self.tribler_session.dlmgr.update_ip_filter(lt_session, ip_addresses)
+    def update_ip_filter(self, circuit):
+        """
+        Allow libtorrent to accept the connection that comes in over a seeding rendezvous circuit. The IP is blocked
+        again when the circuit is removed.
+        """
+        if circuit.ctype != CIRCUIT_TYPE_RP_SEEDER or circuit.circuit_id in self.ip_filter_circuits:
+            return
+        download = self.get_download(circuit.info_hash)
+        if not download:
+            return
+        hops = self.ip_filter_circuits[circuit.circuit_id] = download.config.get_hops()
+        self.tribler_session.dlmgr.allow_ip(hops, self.circuit_id_to_ip(circuit.circuit_id))
 
     def get_download(self, lookup_info_hash):
         if not self.tribler_session:
             return None
 
+        # The index is refreshed by monitor_downloads, so the download might have been removed or re-added since
+        download = self.lookup_info_hash_downloads.get(lookup_info_hash)
+        if download and self.tribler_session.dlmgr.get_download(download.get_def().get_infohash()) is download:
+            return download
+
         for download in self.tribler_session.dlmgr.get_downloads():
             if lookup_info_hash == self.get_lookup_info_hash(download.get_def().get_infohash()):
+                self.lookup_info_hash_downloads[lookup_info_hash] = download
                 return download
+        return None
 
     @task
     async def create_introduction_point(self, info_hash, required_ip=None):
@@ -572,20 +603,32 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
         await super().unload()
 
     def get_lookup_info_hash(self, info_hash):
-        return hashlib.sha1(b'tribler anonymous download' + hexlify(info_hash).encode('utf-8')).digest()
+        lookup_info_hash = self.lookup_info_hashes.get(info_hash)
+        if lookup_info_hash is None:
+            lookup_info_hash = hashlib.sha1(b'tribler anonymous download' + hexlify(info_hash).encode('utf-8')).digest()
+            self.lookup_info_hashes[info_hash] = lookup_info_hash
+        return lookup_info_hash
 
     @unpack_cell(HTTPRequestPayload)
     async def on_http_request(self, source_address, payload, circuit_id):
         if circuit_id not in self.exit_sockets:
             self.logger.warning("Received unexpected http-request")
             return
-        if len([cache for cache in self.request_cache._identifiers.values()
-                if isinstance(cache, HTTPRequestCache) and cache.circuit_id == circuit_id]) > 5:
-            self.logger.warning("Too many HTTP requests coming from circuit %s")
+        if self.http_requests[circuit_id] >= MAX_HTTP_REQUESTS_PER_CIRCUIT:
+            self.logger.warning("Too many HTTP requests coming from circuit %s", circuit_id)
             return
 
         self.logger.debug("Got http-request from %s", source_address)
 
+        self.http_requests[circuit_id] += 1
+        try:
+            await self.process_http_request(source_address, payload, circuit_id)
+        finally:
+            self.http_requests[circuit_id] -= 1
+            if not self.http_requests[circuit_id]:
+                del self.http_requests[circuit_id]
+
+    async def process_http_request(self, source_address, payload, circuit_id):
         writer = None
         try:
             with async_timeout.timeout(10):
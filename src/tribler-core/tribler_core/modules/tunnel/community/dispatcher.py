@@ -1,5 +1,5 @@
 import random
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 from ipv8.messaging.anonymization.tunnel import (
     CIRCUIT_ID_PORT,
@@ -10,7 +10,8 @@ from ipv8.messaging.anonymization.tunnel import (
 )
 from ipv8.taskmanager import TaskManager, task
 
-from tribler_core.modules.tunnel.socks5.conversion import UdpPacket, socks5_serializer
+from tribler_core.modules.metrics import default_registry
+from tribler_core.modules.tunnel.socks5.conversion import pack_udp_packet
 
 
 class TunnelDispatcher(TaskManager):
@@ -27,13 +28,74 @@ class TunnelDispatcher(TaskManager):
         # Map to keep track of the circuits associated with each destination.
         self.con_to_cir = defaultdict(dict)
 
-        # Map to keep track of the circuit id to UDP connection.
+        # Map to keep track of the circuit id to UDP connection, and the reverse map from connection to circuit ids.
         self.cid_to_con = {}
+        self.con_to_cids = defaultdict(set)
+
+        # Ready circuits (by circuit id) that can be selected for new destinations, indexed by (hops, ctype).
+        # The index is filled when circuits become ready and cleaned up lazily, so circuits are always checked
+        # upon selection.
+        self.ready_circuits = defaultdict(dict)
+
+        # The SOCKS5 session that receives data from unclaimed circuits, per hop count
+        self.hops_to_session = {}
+
+        # Number of bytes dispatched per circuit id, in both directions
+        self.bytes_to_tunnel = Counter()
+        self.bytes_from_tunnel = Counter()
+        self.bytes_to_tunnel_total = default_registry.counter('tunnel_socks5_bytes_to_tunnel',
+                                                              'Number of SOCKS5 bytes sent over circuits')
+        self.bytes_from_tunnel_total = default_registry.counter('tunnel_socks5_bytes_from_tunnel',
+                                                                'Number of SOCKS5 bytes received over circuits')
 
         self.register_task('check_connections', self.check_connections, interval=30)
 
     def set_socks_servers(self, socks_servers):
         self.socks_servers = socks_servers
+        self.hops_to_session.clear()
+
+    def link_circuit(self, circuit_id, connection):
+        old_connection = self.cid_to_con.get(circuit_id)
+        if old_connection is not None and old_connection is not connection:
+            self.con_to_cids[old_connection].discard(circuit_id)
+        self.cid_to_con[circuit_id] = connection
+        self.con_to_cids[connection].add(circuit_id)
+
+    def unlink_circuit(self, circuit_id):
+        connection = self.cid_to_con.pop(circuit_id, None)
+        cids = self.con_to_cids.get(connection)
+        if cids is not None:
+            cids.discard(circuit_id)
+            if not cids:
+                self.con_to_cids.pop(connection)
+        return connection
+
+    def circuit_ready(self, circuit):
+        """
+        Make a circuit that just became ready available for dispatching SOCKS5 traffic.
+        """
+        self.ready_circuits[(circuit.goal_hops, circuit.ctype)][circuit.circuit_id] = circuit
+
+    def get_ready_circuits(self, hops, ctype):
+        pool = self.ready_circuits[(hops, ctype)]
+        if not pool:
+            # The pool is (re)built from the tunnel community, e.g. in case circuits got ready without notifying us
+            pool.update((c.circuit_id, c) for c in self.tunnels.circuits.values()
+                        if c.goal_hops == hops and c.ctype == ctype)
+        for circuit_id in [cid for cid, c in pool.items() if c.state != CIRCUIT_STATE_READY]:
+            pool.pop(circuit_id)
+        return pool.values()
+
+    def get_session(self, hops):
+        """
+        Get the SOCKS5 session with an UDP associate for the given hop count, or None if there is no such session.
+        """
+        session = self.hops_to_session.get(hops)
+        if session is None or not session.udp_connection or not session.udp_connection.remote_udp_address:
+            session = next((s for s in self.socks_servers[hops - 1].sessions
+                            if s.udp_connection and s.udp_connection.remote_udp_address), None)
+            self.hops_to_session[hops] = session
+        return session
 
     def on_incoming_from_tunnel(self, community, circuit, origin, data):
         """
@@ -49,16 +111,17 @@ class TunnelDispatcher(TaskManager):
             if session_hops > len(self.socks_servers) or not self.socks_servers[session_hops - 1].sessions:
                 self._logger.error("No connection found for %d hops", session_hops)
                 return False
-            connection = next((s for s in self.socks_servers[session_hops - 1].sessions
-                               if s.udp_connection and s.udp_connection.remote_udp_address), None)
+            connection = self.get_session(session_hops)
 
         if connection is None or connection.udp_connection is None:
             self._logger.error("Connection has closed or has not gotten an UDP associate")
             self.connection_dead(connection)
             return False
 
-        packet = socks5_serializer.pack_serializable(UdpPacket(0, 0, origin, data))
+        packet = pack_udp_packet(origin, data)
         connection.udp_connection.send_datagram(packet)
+        self.bytes_from_tunnel[circuit.circuit_id] += len(data)
+        self.bytes_from_tunnel_total.inc(len(data))
         return True
 
     def on_socks5_udp_data(self, udp_connection, request):
@@ -80,6 +143,8 @@ class TunnelDispatcher(TaskManager):
 
         self._logger.debug("Sending data over circuit %d destined for %r:%r", circuit.circuit_id, *request.destination)
         self.tunnels.send_data(circuit.peer, circuit.circuit_id, request.destination, ('0.0.0.0', 0), request.data)
+        self.bytes_to_tunnel[circuit.circuit_id] += len(request.data)
+        self.bytes_to_tunnel_total.inc(len(request.data))
         return True
 
     @task
@@ -105,12 +170,11 @@ class TunnelDispatcher(TaskManager):
                 return circuit
 
         hops = self.socks_servers.index(connection.socksserver) + 1
-        options = [c for c in self.tunnels.circuits.values()
-                   if c.goal_hops == hops and c.state == CIRCUIT_STATE_READY and c.ctype == CIRCUIT_TYPE_DATA
-                   and self.cid_to_con.get(c.circuit_id, connection) == connection]
+        options = [c for c in self.get_ready_circuits(hops, CIRCUIT_TYPE_DATA)
+                   if self.cid_to_con.get(c.circuit_id, connection) == connection]
         if not options:
             # We allow each connection to claim at least 1 circuit. If no such circuit exists we'll create one.
-            if connection in self.cid_to_con.values():
+            if self.con_to_cids.get(connection):
                 self._logger.debug("No circuit for sending data to %s", request.destination)
                 return None
 
@@ -119,13 +183,13 @@ class TunnelDispatcher(TaskManager):
                 self._logger.debug("Failed to create circuit for data to %s", request.destination)
                 return None
             self._logger.debug("Creating circuit for data to %s. Retrying later..", request.destination)
-            self.cid_to_con[circuit.circuit_id] = connection
+            self.link_circuit(circuit.circuit_id, connection)
             circuit.ready.add_done_callback(lambda f, c=connection.udp_connection, r=request:
                                             self.on_socks5_udp_data(c, r) if f.result() else None)
             return None
 
         circuit = random.choice(options)
-        self.cid_to_con[circuit.circuit_id] = connection
+        self.link_circuit(circuit.circuit_id, connection)
         self.con_to_cir[connection][request.destination] = circuit
         self._logger.debug("Select circuit %d for %s", circuit.circuit_id, request.destination)
         return circuit
@@ -134,7 +198,10 @@ class TunnelDispatcher(TaskManager):
         """
         When a circuit dies, we update the destinations dictionary and remove all peers that are affected.
         """
-        con = self.cid_to_con.pop(broken_circuit.circuit_id, None)
+        con = self.unlink_circuit(broken_circuit.circuit_id)
+        self.ready_circuits[(broken_circuit.goal_hops, broken_circuit.ctype)].pop(broken_circuit.circuit_id, None)
+        self.bytes_to_tunnel.pop(broken_circuit.circuit_id, None)
+        self.bytes_from_tunnel.pop(broken_circuit.circuit_id, None)
 
         destinations = set()
         destination_to_circuit = self.con_to_cir.get(con, {})
@@ -148,12 +215,14 @@ class TunnelDispatcher(TaskManager):
 
     def connection_dead(self, connection):
         self.con_to_cir.pop(connection, None)
-        for cid, con in list(self.cid_to_con.items()):
-            if con == connection:
-                self.cid_to_con.pop(cid, None)
+        for cid in self.con_to_cids.pop(connection, ()):
+            self.cid_to_con.pop(cid, None)
+        for hops, session in list(self.hops_to_session.items()):
+            if session is connection:
+                self.hops_to_session.pop(hops)
         self._logger.error("Detected closed connection")
 
     def check_connections(self):
-        for connection in list(self.cid_to_con.values()):
+        for connection in list(self.con_to_cids):
             if not connection.udp_connection:
                 self.connection_dead(connection)
@@ -0,0 +1,129 @@
+"""
+Slot allocation for the circuits that we relay or exit for.
+"""
+import heapq
+from itertools import count
+
+
+class RandomSlots:
+    """
+    A fixed number of slots that are handed out on a first come, first served basis.
+    """
+
+    def __init__(self, num_slots):
+        self.num_slots = num_slots
+        self.circuit_ids = set()
+
+    def __contains__(self, circuit_id):
+        return circuit_id in self.circuit_ids
+
+    def __len__(self):
+        return self.num_slots
+
+    def __iter__(self):
+        """
+        Iterate over the slots, yielding None for the free ones.
+        """
+        yield from self.circuit_ids
+        yield from [None] * (self.num_slots - len(self.circuit_ids))
+
+    def allocate(self, circuit_id):
+        """
+        Try to allocate a slot for the given circuit.
+
+        :return: whether a slot was allocated.
+        """
+        if circuit_id in self.circuit_ids or len(self.circuit_ids) >= self.num_slots:
+            return False
+        self.circuit_ids.add(circuit_id)
+        return True
+
+    def remove(self, circuit_id):
+        self.circuit_ids.discard(circuit_id)
+
+
+class CompetingSlots:
+    """
+    A fixed number of slots that go to the circuits with the highest balances.
+
+    The occupied slots are kept in a min-heap on balance, so finding the circuit with the lowest balance
+    and replacing it are O(log n). Freed slots are removed from the heap lazily.
+    """
+
+    def __init__(self, num_slots):
+        self.num_slots = num_slots
+        # Heap of [balance, insertion counter, circuit id], the circuit id is None if the slot has been freed
+        self.heap = []
+        # Circuit id -> heap entry
+        self.entries = {}
+        self.counter = count()
+
+    def __contains__(self, circuit_id):
+        return circuit_id in self.entries
+
+    def __len__(self):
+        return self.num_slots
+
+    def __iter__(self):
+        """
+        Iterate over the slots as (balance, circuit id) tuples, yielding (0, None) for the free ones.
+        """
+        for balance, _, circuit_id in self.entries.values():
+            yield balance, circuit_id
+        for _ in range(self.num_slots - len(self.entries)):
+            yield 0, None
+
+    def _push(self, circuit_id, balance):
+        entry = [balance, next(self.counter), circuit_id]
+        self.entries[circuit_id] = entry
+        heapq.heappush(self.heap, entry)
+
+    def _lowest(self):
+        while self.heap[0][2] is None:
+            heapq.heappop(self.heap)
+        return self.heap[0]
+
+    def allocate(self, circuit_id, balance):
+        """
+        Try to allocate a slot for the given circuit. If all slots are taken, the circuit takes the slot of the
+        circuit with the lowest balance, provided that its own balance is higher.
+
+        :return: a tuple (allocated, evicted), with evicted the id of the circuit that lost its slot, or None.
+        """
+        if circuit_id in self.entries:
+            return False, None
+
+        if len(self.entries) < self.num_slots:
+            self._push(circuit_id, balance)
+            return True, None
+
+        if not self.entries:
+            return False, None
+
+        lowest = self._lowest()
+        if balance <= lowest[0]:
+            return False, None
+
+        heapq.heappop(self.heap)
+        evicted = lowest[2]
+        del self.entries[evicted]
+        self._push(circuit_id, balance)
+        return True, evicted
+
+    def get_lowest_balance(self):
+        """
+        :return: the lowest balance of the circuits in the slots, or None if there is a free slot.
+        """
+        if len(self.entries) < self.num_slots or not self.entries:
+            return None
+        return self._lowest()[0]
+
+    def remove(self, circuit_id):
+        entry = self.entries.pop(circuit_id, None)
+        if entry is None:
+            return
+        entry[2] = None
+        # Rebuild the heap once it consists mostly of freed slots
+        if len(self.heap) > 2 * len(self.entries) + 16:
+            self.heap = list(self.entries.values())
+            heapq.heapify(self.heap)
@@ -15,8 +15,9 @@ from tribler_core.modules.tunnel.socks5.conversion import (
     REQ_CMD_UDP_ASSOCIATE,
     SOCKS_AUTH_ANON,
     SOCKS_VERSION,
-    UdpPacket,
+    pack_udp_packet,
     socks5_serializer,
+    unpack_udp_packet,
 )
 
 
@@ -37,7 +38,7 @@ class Socks5ClientUDPConnection(DatagramProtocol):
 
     def datagram_received(self, data, _):
         try:
-            request, _ = socks5_serializer.unpack_serializable(UdpPacket, data)
+            request = unpack_udp_packet(data)
         except PackError:
             self.logger.warning("Error while decoding packet", exc_info=True)
         else:
@@ -48,7 +49,7 @@ class Socks5ClientUDPConnection(DatagramProtocol):
             ipaddress.IPv4Address(target_addr[0])
         except ipaddress.AddressValueError:
             target_addr = DomainAddress(*target_addr)
-        packet = socks5_serializer.pack_serializable(UdpPacket(0, 0, target_addr, data))
+        packet = pack_udp_packet(target_addr, data)
         self.transport.sendto(packet, self.proxy_udp_addr)
 
 
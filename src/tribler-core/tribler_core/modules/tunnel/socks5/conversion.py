@@ -2,6 +2,7 @@
 import logging
 import socket
 import struct
+from functools import lru_cache
 
 from ipv8.messaging.interfaces.udp.endpoint import DomainAddress, UDPv4Address
 from ipv8.messaging.lazy_payload import VariablePayload, vp_compile
@@ -30,6 +31,9 @@ REP_TTL_EXPIRED = 0x06
 REP_COMMAND_NOT_SUPPORTED = 0x07
 REP_ADDRESS_TYPE_NOT_SUPPORTED = 0x08
 
+# Header of an UDP packet with an IPv4 destination: rsv, frag, address type, host and port
+UDP_IPV4_HEADER = struct.Struct('>HBB4sH')
+UDP_IPV4_HEADER_CACHE_SIZE = 4096
 
 logger = logging.getLogger(__name__)
 
@@ -115,3 +119,29 @@ class IPv6AddressError(NotImplementedError):
 socks5_serializer = Serializer()
 socks5_serializer.add_packer('list_of_chars', ListOf(DefaultStruct('>B')))
 socks5_serializer.add_packer('socks5_address', Socks5Address())
+
+
+@lru_cache(maxsize=UDP_IPV4_HEADER_CACHE_SIZE)
+def udp_ipv4_header(host, port):
+    return UDP_IPV4_HEADER.pack(0, 0, ADDRESS_TYPE_IPV4, socket.inet_aton(host), port)
+
+
+def pack_udp_packet(destination, data):
+    """
+    Pack an unfragmented UDP packet. This is equivalent to packing UdpPacket(0, 0, destination, data), but
+    avoids the generic serializer for IPv4 destinations, for which the header is cached.
+    """
+    if isinstance(destination, DomainAddress):
+        return socks5_serializer.pack_serializable(UdpPacket(0, 0, destination, data))
+    return udp_ipv4_header(*destination) + data
+
+
+def unpack_udp_packet(data):
+    """
+    Unpack an UdpPacket, using a fast path for IPv4 destinations. Raises a PackError for invalid packets.
+    """
+    if len(data) >= UDP_IPV4_HEADER.size and data[3] == ADDRESS_TYPE_IPV4:
+        rsv, frag, _, host, port = UDP_IPV4_HEADER.unpack_from(data)
+        return UdpPacket(rsv, frag, UDPv4Address(socket.inet_ntoa(host), port), data[UDP_IPV4_HEADER.size:])
+    request, _ = socks5_serializer.unpack_serializable(UdpPacket, data)
+    return request
@@ -1,6 +1,6 @@
 import struct
 
-from ipv8.messaging.interfaces.udp.endpoint import DomainAddress
+from ipv8.messaging.interfaces.udp.endpoint import DomainAddress, UDPv4Address
 from ipv8.messaging.serialization import PackError
 
 import pytest
@@ -10,7 +10,9 @@ from tribler_core.modules.tunnel.socks5.conversion import (
     CommandRequest,
     CommandResponse,
     UdpPacket,
+    pack_udp_packet,
     socks5_serializer,
+    unpack_udp_packet,
 )
 
 
@@ -35,11 +37,31 @@ def test_encode_decode_udp_packet():
     assert address == decoded.destination
 
 
+def test_encode_decode_udp_packet_fast_path():
+    address = UDPv4Address('1.2.3.4', 5678)
+    data = b'0x000'
+    encoded = pack_udp_packet(address, data)
+    assert encoded == socks5_serializer.pack_serializable(UdpPacket(0, 0, address, data))
+
+    decoded = unpack_udp_packet(encoded)
+    assert decoded.rsv == 0
+    assert decoded.frag == 0
+    assert decoded.destination == address
+    assert decoded.data == data
+
+    address = DomainAddress('tracker1.good-tracker.com', 8084)
+    encoded = pack_udp_packet(address, data)
+    assert encoded == socks5_serializer.pack_serializable(UdpPacket(0, 0, address, data))
+    assert unpack_udp_packet(encoded).destination == address
+
+
 def test_decode_udp_packet_fail():
     # try decoding badly encoded udp packet, should raise an exception in Python3
     badly_encoded_packet = b'\x00\x00\x00\x03 tracker1.invalid-tracker\xc4\xe95\x11$\x00\x1f\x940x000'
     with pytest.raises(PackError):
         socks5_serializer.unpack_serializable(UdpPacket, badly_encoded_packet)
+    with pytest.raises(PackError):
+        unpack_udp_packet(badly_encoded_packet)
 
 
 def test_encode_decode_command_request():
@@ -3,7 +3,7 @@ from asyncio import DatagramProtocol, get_event_loop
 
 from ipv8.messaging.serialization import PackError
 
-from tribler_core.modules.tunnel.socks5.conversion import UdpPacket, socks5_serializer
+from tribler_core.modules.tunnel.socks5.conversion import unpack_udp_packet
 
 
 class SocksUDPConnection(DatagramProtocol):
@@ -37,7 +37,7 @@ class SocksUDPConnection(DatagramProtocol):
 
         if self.remote_udp_address == source:
             try:
-                request, _ = socks5_serializer.unpack_serializable(UdpPacket, data)
+                request = unpack_udp_packet(data)
             except PackError:
                 self._logger.warning("Cannot serialize UDP packet")
                 return False
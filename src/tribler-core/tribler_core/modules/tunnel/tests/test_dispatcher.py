@@ -5,6 +5,7 @@ from ipv8.util import succeed
 
 import pytest
 
+from tribler_core.modules.metrics import default_registry
 from tribler_core.modules.tunnel.community.dispatcher import TunnelDispatcher
 
 
@@ -96,6 +97,32 @@ async def test_on_socks_in_tcp(dispatcher):
     tcp_connection.transport.write.assert_called_once_with(b'test')
 
 
+def test_dispatched_bytes_metrics(dispatcher, mock_circuit):
+    """
+    Test whether the number of bytes dispatched over circuits is exposed through the metrics registry
+    """
+    bytes_to_tunnel = default_registry.metrics['tunnel_socks5_bytes_to_tunnel']
+    bytes_from_tunnel = default_registry.metrics['tunnel_socks5_bytes_from_tunnel']
+    sent, received = bytes_to_tunnel.get_value(), bytes_from_tunnel.get_value()
+
+    mock_circuit.ctype = CIRCUIT_TYPE_DATA
+    mock_circuit.state = CIRCUIT_STATE_READY
+    mock_udp_connection = Mock()
+    dispatcher.set_socks_servers([mock_udp_connection.socksconnection.socksserver])
+    dispatcher.tunnels.circuits = {mock_circuit.circuit_id: mock_circuit}
+    assert dispatcher.on_socks5_udp_data(mock_udp_connection, Mock(destination=("0.0.0.0", 1024), data=b'abc'))
+    assert bytes_to_tunnel.get_value() == sent + 3
+
+    dispatcher.cid_to_con[mock_circuit.circuit_id] = Mock()
+    assert dispatcher.on_incoming_from_tunnel(dispatcher.tunnels, mock_circuit, ("0.0.0.0", 1024), b'ab')
+    assert bytes_from_tunnel.get_value() == received + 2
+
+    # The counters keep the bytes of circuits that broke
+    dispatcher.circuit_dead(mock_circuit)
+    assert bytes_to_tunnel.get_value() == sent + 3
+    assert bytes_from_tunnel.get_value() == received + 2
+
+
 def test_circuit_dead(dispatcher, mock_circuit):
     """
     Test whether the correct peers are removed when a circuit breaks
@@ -123,9 +150,44 @@ def test_check_connections(dispatcher, mock_circuit):
     dispatcher.con_to_cir = {connection: {1: mock_circuit,
                                           2: mock_circuit,
                                           3: mock_circuit}}
-    dispatcher.cid_to_con = {mock_circuit.circuit_id: connection, 2: Mock()}
+    dispatcher.link_circuit(mock_circuit.circuit_id, connection)
+    dispatcher.link_circuit(2, Mock())
 
     dispatcher.check_connections()
     assert connection not in dispatcher.con_to_cir
     assert mock_circuit.circuit_id not in dispatcher.cid_to_con
     assert 2 in dispatcher.cid_to_con
+    assert connection not in dispatcher.con_to_cids
+
+
+def test_select_circuit_from_ready_pool(dispatcher, mock_circuit):
+    """
+    Test whether circuits are selected from the pool of ready circuits and removed from it when they break
+    """
+    mock_circuit.ctype = CIRCUIT_TYPE_DATA
+    mock_circuit.state = CIRCUIT_STATE_READY
+    connection = Mock()
+    dispatcher.set_socks_servers([connection.socksserver])
+    dispatcher.tunnels.circuits = {}
+    dispatcher.circuit_ready(mock_circuit)
+
+    request = Mock(destination=("0.0.0.0", 1024), data=b'a')
+    assert dispatcher.select_circuit(connection, request) == mock_circuit
+    assert dispatcher.con_to_cids[connection] == {mock_circuit.circuit_id}
+
+    dispatcher.circuit_dead(mock_circuit)
+    assert not dispatcher.ready_circuits[(1, CIRCUIT_TYPE_DATA)]
+    assert connection not in dispatcher.con_to_cids
+
+
+def test_get_session(dispatcher):
+    """
+    Test whether the SOCKS5 session used for a hop count is cached until it closes
+    """
+    session1 = Mock()
+    session2 = Mock()
+    dispatcher.set_socks_servers([Mock(sessions=[session1, session2])])
+    assert dispatcher.get_session(1) == session1
+
+    session1.udp_connection = None
+    assert dispatcher.get_session(1) == session2
@@ -0,0 +1,76 @@
+from tribler_core.modules.tunnel.community.slots import CompetingSlots, RandomSlots
+
+
+def test_random_slots():
+    slots = RandomSlots(2)
+    assert slots.allocate(1)
+    assert not slots.allocate(1)
+    assert slots.allocate(2)
+    assert not slots.allocate(3)
+    assert sorted(slots) == [1, 2]
+
+    slots.remove(1)
+    assert 1 not in slots
+    assert list(slots) == [2, None]
+    assert slots.allocate(3)
+
+
+def test_competing_slots_fill():
+    slots = CompetingSlots(2)
+    assert list(slots) == [(0, None), (0, None)]
+    assert slots.get_lowest_balance() is None
+    assert slots.allocate(1, -100) == (True, None)
+    assert slots.allocate(2, 100) == (True, None)
+    assert slots.get_lowest_balance() == -100
+    assert sorted(slots) == [(-100, 1), (100, 2)]
+
+
+def test_competing_slots_evict():
+    slots = CompetingSlots(2)
+    slots.allocate(1, 10)
+    slots.allocate(2, 20)
+
+    # Equal balances do not win a slot
+    assert slots.allocate(3, 10) == (False, None)
+    assert slots.allocate(3, 15) == (True, 1)
+    assert 1 not in slots
+    assert slots.allocate(4, 30) == (True, 3)
+    assert sorted(slots) == [(20, 2), (30, 4)]
+
+
+def test_competing_slots_remove():
+    slots = CompetingSlots(2)
+    slots.allocate(1, 10)
+    slots.allocate(2, 20)
+    slots.remove(1)
+    assert list(slots) == [(20, 2), (0, None)]
+    assert slots.allocate(3, 0) == (True, None)
+    assert slots.get_lowest_balance() == 0
+
+    slots.remove(3)
+    slots.remove(3)
+    assert slots.allocate(4, 30) == (True, None)
+    assert slots.allocate(5, 25) == (True, 2)
+
+
+def test_competing_slots_many():
+    slots = CompetingSlots(100)
+    for circuit_id in range(1000):
+        slots.allocate(circuit_id, circuit_id)
+        if circuit_id % 3 == 0:
+            slots.remove(circuit_id)
+    # The last circuit has been removed again, so one slot is free
+    balances = sorted(balance for balance, circuit_id in slots if circuit_id is not None)
+    assert len(balances) == 99
+    assert all(balance % 3 for balance in balances)
+    assert slots.get_lowest_balance() is None
+    assert len(slots.heap) <= 2 * 100 + 16
+
+    assert slots.allocate(1000, 1000) == (True, None)
+    assert slots.allocate(1001, 1001) == (True, balances[0])
+
+
+def test_no_competing_slots():
+    slots = CompetingSlots(0)
+    assert slots.allocate(1, 100) == (False, None)
+    assert not list(slots)
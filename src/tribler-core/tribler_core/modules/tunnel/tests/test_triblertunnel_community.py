@@ -4,6 +4,7 @@ from collections import defaultdict
 from random import random
 from unittest.mock import Mock
 
+from ipv8.messaging.anonymization.caches import CreateRequestCache
 from ipv8.messaging.anonymization.payload import EstablishIntroPayload
 from ipv8.messaging.anonymization.tunnel import (
     CIRCUIT_STATE_READY,
@@ -23,8 +24,18 @@ from tribler_common.network_utils import NetworkUtils
 
 from tribler_core.modules.bandwidth_accounting.community import BandwidthAccountingCommunity
 from tribler_core.modules.bandwidth_accounting.settings import BandwidthAccountingSettings
-from tribler_core.modules.tunnel.community.payload import BandwidthTransactionPayload
-from tribler_core.modules.tunnel.community.community import PEER_FLAG_EXIT_HTTP, TriblerTunnelCommunity
+from tribler_core.modules.tunnel.community.caches import TunnelRequestCache
+from tribler_core.modules.tunnel.community.community import (
+    MAX_HTTP_REQUESTS_PER_CIRCUIT,
+    PEER_FLAG_EXIT_HTTP,
+    TriblerTunnelCommunity,
+)
+from tribler_core.modules.tunnel.community.payload import (
+    BandwidthTransactionPayload,
+    HTTPRequestPayload,
+    RelayBalanceResponsePayload,
+)
+from tribler_core.modules.tunnel.community.slots import CompetingSlots, RandomSlots
 from tribler_core.tests.tools.base_test import MockObject
 from tribler_core.tests.tools.tracker.http_tracker import HTTPTracker
 from tribler_core.utilities.path_util import Path
@@ -63,6 +74,16 @@ class TestTriblerTunnelCommunity(TestBase):  # pylint: disable=too-many-public-m
         return NetworkUtils(remember_checked_ports_enabled=True).get_random_free_port()
 
 
+    def set_slots(self, node_nr, competing_slots):
+        """
+        Remove the random slots of some node and fill its competing slots with (balance, circuit id) tuples.
+        """
+        self.nodes[node_nr].overlay.random_slots = RandomSlots(0)
+        self.nodes[node_nr].overlay.competing_slots = CompetingSlots(len(competing_slots))
+        for balance, circuit_id in competing_slots:
+            if circuit_id is not None:
+                self.nodes[node_nr].overlay.competing_slots.allocate(circuit_id, balance)
+
     async def create_intro(self, node_nr, service):
         """
         Create an 1 hop introduction point for some node for some service.
@@ -237,6 +258,74 @@ class TestTriblerTunnelCommunity(TestBase):  # pylint: disable=too-many-public-m
         self.nodes[0].overlay.monitor_downloads([])
         self.assertEqual(mocked_remove_circuit.circuit_id, 0)
 
+    def test_get_download(self):
+        """
+        Test whether downloads are found by their lookup infohash, also after they have been re-added
+        """
+        downloads = {}
+        mock_tdef = Mock(get_infohash=lambda: b'a')
+        self.nodes[0].overlay.tribler_session = Mock()
+        self.nodes[0].overlay.tribler_session.dlmgr.get_download = downloads.get
+        self.nodes[0].overlay.tribler_session.dlmgr.get_downloads = lambda: list(downloads.values())
+        lookup_info_hash = self.nodes[0].overlay.get_lookup_info_hash(b'a')
+
+        self.assertIsNone(self.nodes[0].overlay.get_download(lookup_info_hash))
+
+        downloads[b'a'] = download = Mock(get_def=lambda: mock_tdef)
+        self.assertIs(self.nodes[0].overlay.get_download(lookup_info_hash), download)
+        self.assertIs(self.nodes[0].overlay.lookup_info_hash_downloads[lookup_info_hash], download)
+
+        downloads[b'a'] = readded_download = Mock(get_def=lambda: mock_tdef)
+        self.assertIs(self.nodes[0].overlay.get_download(lookup_info_hash), readded_download)
+
+    def test_relay_balance_response(self):
+        """
+        Test whether a relayed balance response is forwarded to the next hop of the pending create request
+        """
+        overlay = self.nodes[0].overlay
+        to_peer = Peer(self.nodes[0].my_peer.key)
+        cache = overlay.request_cache.add(CreateRequestCache(overlay, 42, 5678, 1234, None, to_peer))
+        self.assertIs(overlay.request_cache.get_create_request(1234), cache)
+
+        overlay.send_cell = Mock()
+        data = bytes(23) + overlay.serializer.pack_serializable(RelayBalanceResponsePayload(1234, 100))
+        overlay.on_relay_balance_response_cell(None, data)
+        self.assertEqual(overlay.send_cell.call_args[0][0], to_peer)
+        self.assertEqual(overlay.send_cell.call_args[0][1].circuit_id, 5678)
+
+        overlay.request_cache.pop(cache.prefix, cache.number)
+        self.assertIsNone(overlay.request_cache.get_create_request(1234))
+
+    def test_create_request_timeout(self):
+        """
+        Test whether a create request that times out is removed from the index of create requests
+        """
+        overlay = self.nodes[0].overlay
+        self.assertIsInstance(overlay.request_cache, TunnelRequestCache)
+        cache = overlay.request_cache.add(CreateRequestCache(overlay, 42, 5678, 1234, None, None))
+        self.assertIn(1234, overlay.request_cache.create_requests)
+
+        overlay.request_cache._on_timeout(cache)  # pylint: disable=protected-access
+        self.assertNotIn(1234, overlay.request_cache.create_requests)
+
+    async def test_http_request_limit(self):
+        """
+        Test whether an exit handles a limited number of HTTP requests per circuit at the same time
+        """
+        overlay = self.nodes[0].overlay
+        overlay.exit_sockets[1234] = Mock()
+        overlay.process_http_request = Mock(return_value=Future())
+        data = bytes(23) + overlay.serializer.pack_serializable(HTTPRequestPayload(1234, 1, ('1.2.3.4', 80), b''))
+        overlay.http_requests[1234] = MAX_HTTP_REQUESTS_PER_CIRCUIT
+        await overlay.on_http_request(None, data, 1234)
+        overlay.process_http_request.assert_not_called()
+
+        overlay.http_requests[1234] = 0
+        overlay.process_http_request = Mock(return_value=succeed(None))
+        await overlay.on_http_request(None, data, 1234)
+        overlay.process_http_request.assert_called_once()
+        self.assertNotIn(1234, overlay.http_requests)
+
     def test_update_ip_filter(self):
         circuit = Mock()
         circuit.circuit_id = 123
@@ -250,20 +339,21 @@ class TestTriblerTunnelCommunity(TestBase):  # pylint: disable=too-many-public-m
         download.config.get_hops = lambda: 1
         self.nodes[0].overlay.get_download = lambda _: download
 
-        lt_session = Mock()
         self.nodes[0].overlay.tribler_session = Mock()
-        self.nodes[0].overlay.tribler_session.dlmgr.get_session = lambda _: lt_session
-        self.nodes[0].overlay.tribler_session.dlmgr.update_ip_filter = Mock()
         self.nodes[0].overlay.tribler_session.dlmgr.get_downloads = lambda: [download]
+        dlmgr = self.nodes[0].overlay.tribler_session.dlmgr
 
-        self.nodes[0].overlay.update_ip_filter(0)
-        ips = ['1.1.1.1']
-        self.nodes[0].overlay.tribler_session.dlmgr.update_ip_filter.assert_called_with(lt_session, ips)
+        self.nodes[0].overlay.update_ip_filter(circuit)
+        dlmgr.allow_ip.assert_not_called()
 
         circuit.ctype = CIRCUIT_TYPE_RP_SEEDER
-        self.nodes[0].overlay.update_ip_filter(0)
-        ips = [self.nodes[0].overlay.circuit_id_to_ip(circuit.circuit_id), '1.1.1.1']
-        self.nodes[0].overlay.tribler_session.dlmgr.update_ip_filter.assert_called_with(lt_session, ips)
+        self.nodes[0].overlay.update_ip_filter(circuit)
+        self.nodes[0].overlay.update_ip_filter(circuit)
+        dlmgr.allow_ip.assert_called_once_with(1, self.nodes[0].overlay.circuit_id_to_ip(circuit.circuit_id))
+
+        self.nodes[0].overlay.remove_circuit(circuit.circuit_id)
+        dlmgr.block_ip.assert_called_once_with(1, self.nodes[0].overlay.circuit_id_to_ip(circuit.circuit_id))
+        self.assertFalse(self.nodes[0].overlay.ip_filter_circuits)
 
     def test_update_torrent(self):
         """
@@ -404,8 +494,7 @@ class TestTriblerTunnelCommunity(TestBase):  # pylint: disable=too-many-public-m
         self.add_node_to_experiment(self.create_node())
         self.nodes[1].overlay.settings.peer_flags.add(PEER_FLAG_EXIT_BT)
         await self.introduce_nodes()
-        self.nodes[1].overlay.random_slots = []
-        self.nodes[1].overlay.competing_slots = [(1000, 1234)]
+        self.set_slots(1, [(1000, 1234)])
         self.nodes[0].overlay.build_tunnels(1)
         await self.deliver_messages()
 
@@ -419,8 +508,7 @@ class TestTriblerTunnelCommunity(TestBase):  # pylint: disable=too-many-public-m
         self.add_node_to_experiment(self.create_node())
         self.nodes[1].overlay.settings.peer_flags.add(PEER_FLAG_EXIT_BT)
         await self.introduce_nodes()
-        self.nodes[1].overlay.random_slots = []
-        self.nodes[1].overlay.competing_slots = [(-1000, 1234)]
+        self.set_slots(1, [(-1000, 1234)])
         self.nodes[0].overlay.build_tunnels(1)
         await self.deliver_messages()
 
@@ -434,8 +522,7 @@ class TestTriblerTunnelCommunity(TestBase):  # pylint: disable=too-many-public-m
         self.add_node_to_experiment(self.create_node())
         self.nodes[1].overlay.settings.peer_flags.add(PEER_FLAG_EXIT_BT)
         await self.introduce_nodes()
-        self.nodes[1].overlay.random_slots = []
-        self.nodes[1].overlay.competing_slots = [(0, None)]
+        self.set_slots(1, [(0, None)])
         self.nodes[0].overlay.build_tunnels(1)
         await self.deliver_messages()
 
@@ -450,8 +537,7 @@ class TestTriblerTunnelCommunity(TestBase):  # pylint: disable=too-many-public-m
         self.add_node_to_experiment(self.create_node())
         self.nodes[2].overlay.settings.peer_flags.add(PEER_FLAG_EXIT_BT)
         await self.introduce_nodes()
-        self.nodes[2].overlay.random_slots = []
-        self.nodes[2].overlay.competing_slots = [(-1000, 1234)]
+        self.set_slots(2, [(-1000, 1234)])
         self.nodes[0].overlay.build_tunnels(2)
         await self.deliver_messages()
 
@@ -466,8 +552,7 @@ class TestTriblerTunnelCommunity(TestBase):  # pylint: disable=too-many-public-m
         self.add_node_to_experiment(self.create_node())
         self.nodes[2].overlay.settings.peer_flags.add(PEER_FLAG_EXIT_BT)
         await self.introduce_nodes()
-        self.nodes[1].overlay.random_slots = []
-        self.nodes[1].overlay.competing_slots = [(-1000, 1234)]
+        self.set_slots(1, [(-1000, 1234)])
         self.nodes[0].overlay.build_tunnels(2)
         await self.deliver_messages()
 
@@ -486,8 +571,7 @@ class TestTriblerTunnelCommunity(TestBase):  # pylint: disable=too-many-public-m
         # Make sure that there's a token disbalance between node 0 and 1
         await self.nodes[0].overlay.bandwidth_community.do_payout(self.nodes[1].my_peer, 1024 * 1024)
 
-        self.nodes[2].overlay.random_slots = []
-        self.nodes[2].overlay.competing_slots = [(0, None)]
+        self.set_slots(2, [(0, None)])
         self.nodes[0].overlay.build_tunnels(1)
         await self.deliver_messages()
 
@@ -543,8 +627,7 @@ class TestTriblerTunnelCommunity(TestBase):  # pylint: disable=too-many-public-m
         self.nodes[1].overlay.reject_callback = on_reject
 
         # Initialize the slots
-        self.nodes[1].overlay.random_slots = []
-        self.nodes[1].overlay.competing_slots = [(100000000, 12345)]
+        self.set_slots(1, [(100000000, 12345)])
 
         self.nodes[0].overlay.build_tunnels(1)
         await self.deliver_messages()
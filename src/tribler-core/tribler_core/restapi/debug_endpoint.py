@@ -2,6 +2,7 @@ import datetime
 import logging
 import os
 import sys
+from asyncio import get_event_loop
 from io import StringIO
 
 from aiohttp import web
@@ -14,7 +15,7 @@ from marshmallow.fields import Boolean, Float, Integer, String
 
 import psutil
 
-from tribler_core.restapi.rest_endpoint import RESTEndpoint, RESTResponse
+from tribler_core.restapi.rest_endpoint import HTTP_BAD_REQUEST, RESTEndpoint, RESTResponse
 from tribler_core.utilities.instrumentation import WatchDog
 from tribler_core.utilities.osutils import get_root_state_directory
 
@@ -24,6 +25,8 @@ try:
 except ImportError:
     HAS_MELIAE = False
 
+PROFILER_MODES = ('yappi', 'sampling')
+
 
 class MemoryDumpBuffer(StringIO):
     """
@@ -50,7 +53,8 @@ class DebugEndpoint(RESTEndpoint):
                              web.get('/log', self.get_log),
                              web.get('/profiler', self.get_profiler_state),
                              web.put('/profiler', self.start_profiler),
-                             web.delete('/profiler', self.stop_profiler)])
+                             web.delete('/profiler', self.stop_profiler),
+                             web.get('/profiler/samples', self.dump_profiler_samples)])
         if HAS_MELIAE:
             self.app.add_routes([web.get('/memory/dump', self.get_memory_dump)])
 
@@ -71,8 +75,8 @@ class DebugEndpoint(RESTEndpoint):
     async def get_circuit_slots(self, request):
         return RESTResponse({
             "slots": {
-                "random": self.session.tunnel_community.random_slots,
-                "competing": self.session.tunnel_community.competing_slots
+                "random": list(self.session.tunnel_community.random_slots),
+                "competing": list(self.session.tunnel_community.competing_slots)
             }
         })
 
@@ -305,25 +309,46 @@ class DebugEndpoint(RESTEndpoint):
 
         return ''.join(lines_found[-lines:])
 
+    def get_profiler(self, mode):
+        resource_monitor = self.session.resource_monitor
+        return resource_monitor.sampling_profiler if mode == 'sampling' else resource_monitor.profiler
+
+    def get_running_profiler_mode(self):
+        if not self.session.config.resource_monitor.enabled or not self.session.resource_monitor:
+            return None
+        for mode in PROFILER_MODES:
+            if self.get_profiler(mode).is_running():
+                return mode
+        return None
+
     @docs(
         tags=['Debug'],
         summary="Return information about the state of the profiler.",
         responses={
             200: {
                 'schema': schema(ProfilerStateResponse={
-                    'state': (String, 'State of the profiler (STARTED or STOPPED)')
+                    'state': (String, 'State of the profiler (STARTED or STOPPED)'),
+                    'mode': (String, 'The running profiler (yappi or sampling), if any')
                 })
             }
         }
     )
     async def get_profiler_state(self, _):
-        monitor_enabled = self.session.config.resource_monitor.enabled
-        state = "STARTED" if (monitor_enabled and self.session.resource_monitor.profiler.is_running()) else "STOPPED"
-        return RESTResponse({"state": state})
+        mode = self.get_running_profiler_mode()
+        return RESTResponse({"state": "STARTED" if mode else "STOPPED", "mode": mode})
 
     @docs(
         tags=['Debug'],
         summary="Start the profiler.",
+        parameters=[{
+            'in': 'query',
+            'name': 'mode',
+            'description': 'The profiler to start: yappi (deterministic, high overhead) or sampling '
+                           '(statistical, low overhead)',
+            'type': 'string',
+            'enum': list(PROFILER_MODES),
+            'required': False
+        }],
         responses={
             200: {
                 'schema': schema(StartProfilerResponse={
@@ -332,21 +357,56 @@ class DebugEndpoint(RESTEndpoint):
             }
         }
     )
-    async def start_profiler(self, _):
-        self.session.resource_monitor.profiler.start()
+    async def start_profiler(self, request):
+        mode = request.query.get('mode', 'yappi')
+        if mode not in PROFILER_MODES:
+            return RESTResponse({"error": f"unknown profiler mode: {mode}"}, status=HTTP_BAD_REQUEST)
+        running_mode = self.get_running_profiler_mode()
+        if running_mode:
+            return RESTResponse({"error": f"the {running_mode} profiler is already running"},
+                                status=HTTP_BAD_REQUEST)
+        self.get_profiler(mode).start()
         return RESTResponse({"success": True})
 
     @docs(
         tags=['Debug'],
-        summary="Stop the profiler.",
+        summary="Stop the running profiler and write its results to a file.",
         responses={
             200: {
                 'schema': schema(StopProfilerResponse={
-                    'success': Boolean
+                    'success': Boolean,
+                    'profiler_file': String
                 })
             }
         }
     )
     async def stop_profiler(self, _):
-        file_path = self.session.resource_monitor.profiler.stop()
+        mode = self.get_running_profiler_mode()
+        if not mode:
+            return RESTResponse({"error": "no profiler is running"}, status=HTTP_BAD_REQUEST)
+        profiler = self.get_profiler(mode)
+        if mode == 'sampling':
+            profiler.stop()
+            file_path = await get_event_loop().run_in_executor(None, profiler.dump)
+            profiler.clear()
+        else:
+            file_path = profiler.stop()
+        return RESTResponse({"success": True, "profiler_file": str(file_path)})
+
+    @docs(
+        tags=['Debug'],
+        summary="Write the recent samples of the running sampling profiler to a collapsed stacks file.",
+        responses={
+            200: {
+                'schema': schema(DumpProfilerSamplesResponse={
+                    'success': Boolean,
+                    'profiler_file': String
+                })
+            }
+        }
+    )
+    async def dump_profiler_samples(self, _):
+        if self.get_running_profiler_mode() != 'sampling':
+            return RESTResponse({"error": "the sampling profiler is not running"}, status=HTTP_BAD_REQUEST)
+        file_path = await get_event_loop().run_in_executor(None, self.session.resource_monitor.sampling_profiler.dump)
         return RESTResponse({"success": True, "profiler_file": str(file_path)})
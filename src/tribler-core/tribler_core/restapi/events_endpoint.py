@@ -40,6 +40,8 @@ reactions_dict = {
     NTFY.TORRENT_FINISHED: lambda *args: {"infohash": hexlify(args[0]), "name": args[1], "hidden": args[2]},
     # Information about some torrent has been updated (e.g. health). Contains updated torrent data
     NTFY.CHANNEL_ENTITY_UPDATED: passthrough,
+    # A bulk update or removal of metadata entries has progressed. Contains the operation and the number of entries.
+    NTFY.METADATA_BULK_PROGRESS: passthrough,
     # Tribler is going to shutdown.
     NTFY.TRIBLER_SHUTDOWN_STATE: passthrough,
     # Remote GigaChannel search results were received by Tribler. Contains received entries.
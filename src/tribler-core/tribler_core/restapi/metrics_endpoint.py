@@ -0,0 +1,50 @@
+from aiohttp import web
+
+from aiohttp_apispec import docs
+
+from ipv8.REST.schema import schema
+
+from marshmallow.fields import Dict
+
+from tribler_core.modules.metrics import default_registry
+from tribler_core.restapi.rest_endpoint import RESTEndpoint, RESTResponse
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain'
+
+
+class MetricsEndpoint(RESTEndpoint):
+    """
+    This endpoint exposes the counters, gauges and histograms of the core components.
+    """
+
+    def __init__(self, session, registry=default_registry):
+        super().__init__(session)
+        self.registry = registry
+
+    def setup_routes(self):
+        self.app.add_routes([web.get('', self.get_metrics),
+                             web.get('/snapshot', self.get_metrics_snapshot)])
+
+    @docs(
+        tags=["General"],
+        summary="Return all metrics in the Prometheus text format.",
+        responses={
+            200: {
+                "description": "The metrics, one sample per line"
+            }
+        }
+    )
+    async def get_metrics(self, request):
+        return RESTResponse(self.registry.get_text(), content_type=PROMETHEUS_CONTENT_TYPE, charset='utf-8')
+
+    @docs(
+        tags=["General"],
+        summary="Return the current value of all metrics. Histograms are summarized by their count, sum and maximum.",
+        responses={
+            200: {
+                "schema": schema(MetricsSnapshotResponse={'metrics': Dict})
+            }
+        }
+    )
+    async def get_metrics_snapshot(self, request):
+        return RESTResponse({'metrics': self.registry.get_snapshot()})
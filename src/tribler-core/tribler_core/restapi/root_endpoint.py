@@ -11,6 +11,7 @@ from tribler_core.modules.metadata_store.restapi.remote_query_endpoint import Re
 from tribler_core.modules.metadata_store.restapi.search_endpoint import SearchEndpoint
 from tribler_core.restapi.debug_endpoint import DebugEndpoint
 from tribler_core.restapi.events_endpoint import EventsEndpoint
+from tribler_core.restapi.metrics_endpoint import MetricsEndpoint
 from tribler_core.restapi.rest_endpoint import RESTEndpoint
 from tribler_core.restapi.settings_endpoint import SettingsEndpoint
 from tribler_core.restapi.shutdown_endpoint import ShutdownEndpoint
@@ -38,6 +39,7 @@ class RootEndpoint(RESTEndpoint):
                      '/bandwidth': BandwidthEndpoint,
                      '/trustview': TrustViewEndpoint,
                      '/statistics': StatisticsEndpoint,
+                     '/metrics': MetricsEndpoint,
                      '/libtorrent': LibTorrentEndpoint,
                      '/torrentinfo': TorrentInfoEndpoint,
                      '/metadata': MetadataEndpoint,
@@ -222,3 +222,28 @@ async def test_start_stop_profiler(enable_api, enable_resource_monitor, session)
     assert session.resource_monitor.profiler.is_running()
     await do_request(session, 'debug/profiler', expected_code=200, request_type='DELETE')
     assert not session.resource_monitor.profiler.is_running()
+
+
+@pytest.mark.asyncio
+async def test_start_stop_sampling_profiler(enable_api, enable_resource_monitor, session):
+    """
+    Test starting the sampling profiler, dumping its samples and stopping it using the API
+    """
+    await do_request(session, 'debug/profiler/samples', expected_code=400)
+    await do_request(session, 'debug/profiler?mode=foo', expected_code=400, request_type='PUT')
+    await do_request(session, 'debug/profiler?mode=sampling', expected_code=200, request_type='PUT')
+    json_response = await do_request(session, 'debug/profiler', expected_code=200)
+    assert json_response == {'state': 'STARTED', 'mode': 'sampling'}
+
+    json_response = await do_request(session, 'debug/profiler/samples', expected_code=200)
+    assert Path(json_response['profiler_file']).exists()
+
+    # Only one profiler can run at a time
+    await do_request(session, 'debug/profiler?mode=yappi', expected_code=400, request_type='PUT')
+    assert not session.resource_monitor.profiler.is_running()
+
+    json_response = await do_request(session, 'debug/profiler', expected_code=200, request_type='DELETE')
+    assert Path(json_response['profiler_file']).exists()
+    assert not session.resource_monitor.sampling_profiler.is_running()
+    assert not session.resource_monitor.sampling_profiler.samples
+    await do_request(session, 'debug/profiler', expected_code=400, request_type='DELETE')
@@ -0,0 +1,25 @@
+import pytest
+
+from tribler_core.modules.metrics import default_registry
+from tribler_core.restapi.base_api_test import do_request
+
+
+@pytest.mark.asyncio
+async def test_get_metrics(enable_api, session):
+    """
+    Test whether the metrics are returned in the Prometheus text format
+    """
+    default_registry.counter('test_requests', 'Number of test requests').inc()
+    response = await do_request(session, 'metrics', expected_code=200, json_response=False)
+    assert b'# TYPE tribler_test_requests counter\n' in response
+    assert b'\ntribler_test_requests ' in response
+
+
+@pytest.mark.asyncio
+async def test_get_metrics_snapshot(enable_api, session):
+    """
+    Test whether a JSON snapshot of the metrics is returned
+    """
+    default_registry.histogram('test_duration').observe(0.5)
+    response = await do_request(session, 'metrics/snapshot', expected_code=200)
+    assert response['metrics']['test_duration']['count'] >= 1
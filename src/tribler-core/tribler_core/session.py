@@ -125,6 +125,7 @@ class Session(TaskManager):
         self.trustchain_testnet_keypair = None
 
         self.dht_community = None
+        self.peer_resolver = None
         self.payout_manager = None
         self.mds = None  # Metadata Store
 
@@ -146,7 +147,7 @@ class Session(TaskManager):
         if not self.payout_manager:
             self._logger.warning("Running bootstrap without payout enabled")
         from tribler_core.modules.bootstrap import Bootstrap
-        self.bootstrap = Bootstrap(self.config.state_dir, dht=self.dht_community)
+        self.bootstrap = Bootstrap(self.config.state_dir, dht=self.dht_community, resolver=self.peer_resolver)
         infohash = self.config.bootstrap.infohash
         self.bootstrap.start_by_infohash(self.dlmgr.start_download, infohash)
         await self.bootstrap.download.future_finished
@@ -393,8 +394,12 @@ class Session(TaskManager):
             self.version_check_manager.start()
 
         if self.config.ipv8.enabled:
+            from tribler_core.modules.peer_resolver import PeerResolver
+            self.peer_resolver = PeerResolver(self.dht_community)
+
             from tribler_core.modules.payout_manager import PayoutManager
-            self.payout_manager = PayoutManager(self.bandwidth_community, self.dht_community)
+            self.payout_manager = PayoutManager(self.bandwidth_community, self.dht_community,
+                                                resolver=self.peer_resolver)
 
             if self.core_test_mode:
                 from ipv8.messaging.interfaces.udp.endpoint import UDPv4Address
@@ -459,6 +464,15 @@ class Session(TaskManager):
             await self.bootstrap.shutdown()
         self.bootstrap = None
 
+        if self.payout_manager:
+            await self.payout_manager.shutdown()
+        self.payout_manager = None
+
+        if self.peer_resolver:
+            # The peer resolver shares the DHTCommunity with the bootstrap module and the payout manager.
+            await self.peer_resolver.shutdown()
+        self.peer_resolver = None
+
         self.tracker_manager = None
 
         if self.tunnel_community and self.bandwidth_community:
@@ -477,10 +491,6 @@ class Session(TaskManager):
             await self.ipv8.stop(stop_loop=False)
         self.ipv8 = None
 
-        if self.payout_manager:
-            await self.payout_manager.shutdown()
-            self.payout_manager = None
-
         if self.watch_folder:
             self.notify_shutdown_state("Shutting down Watch Folder...")
             await self.watch_folder.stop()
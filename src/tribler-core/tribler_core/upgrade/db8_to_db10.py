@@ -3,7 +3,6 @@ import datetime
 import logging
 import sqlite3
 from asyncio import sleep
-from collections import deque
 from time import time as now
 
 from pony.orm import db_session
@@ -13,6 +12,9 @@ from tribler_core.modules.metadata_store.store import MetadataStore
 TABLE_NAMES = (
     "ChannelNode", "TorrentState", "TorrentState_TrackerState", "ChannelPeer", "ChannelVote", "TrackerState", "Vsids")
 
+# MiscData entries of the new DB storing the last copied rowid of each table, used to resume an interrupted upgrade
+CHECKPOINT_PREFIX = "upgrade_8to10_last_rowid_"
+
 
 class PonyToPonyMigration:
 
@@ -31,7 +33,7 @@ class PonyToPonyMigration:
     async def update_convert_progress(self, amount, total, eta, message=""):
         await self.update_status(
             f"{message}\n"
-            f"Converted: {amount}/{total} ({(amount * 100) // total}%).\n"
+            f"Converted: {amount}/{total} ({(amount * 100) // max(total, 1)}%).\n"
             f"Time remaining: {eta}"
         )
 
@@ -41,30 +43,33 @@ class PonyToPonyMigration:
         Chunks splitting uses congestion-control-like algorithm. Awaits are necessary so the
         reactor can get an opportunity at serving other tasks, such as sending progress notifications to
         the GUI through the REST API.
+        The convert command is called with the batch size and returns the number of actually converted entries,
+        zero meaning that there is nothing left to convert. The offset is the number of entries converted
+        before, e.g. by an interrupted upgrade.
         """
-        last_commit_time = now()
+        start_time = last_commit_time = now()
         batch_size = 1000
-
-        speed_list = deque(maxlen=20)
+        converted = offset
 
         reference_timedelta = 0.8
-        while offset < total_to_convert:
+        while converted < total_to_convert:
             if self.shutting_down:
                 break
-            end = offset + batch_size
 
             batch_start_time = now()
-            convert_command(offset, batch_size)
+            batch_converted = convert_command(batch_size)
             batch_end_time = now()
             batch_duration = batch_end_time - batch_start_time
+            if not batch_converted:
+                break
+            converted += batch_converted
 
-            remaining = total_to_convert - offset
-            est_speed = batch_size / max(batch_duration, 0.001)
-            speed_list.append(est_speed)
-            avg_est_speed = sum(speed_list) / len(speed_list)
-            eta = str(datetime.timedelta(seconds=int(remaining / avg_est_speed)))
+            # The ETA is based on the actual throughput of this run, including the commits and the progress reports
+            remaining = max(total_to_convert - converted, 0)
+            speed = (converted - offset) / max(batch_end_time - start_time, 0.001)
+            eta = str(datetime.timedelta(seconds=int(remaining / speed)))
 
-            await self.update_convert_progress(offset, total_to_convert, eta, message)
+            await self.update_convert_progress(converted, total_to_convert, eta, message)
 
             if batch_duration < reference_timedelta:
                 new_batch_size = round(batch_size * 1.5)
@@ -74,19 +79,18 @@ class PonyToPonyMigration:
             # we want to guarantee that at least some entries will go through
             new_batch_size = max(50, new_batch_size)
 
-            offset = end
             self._logger.info("Convert %s: %i/%i (%.2f%%), batch size %d batch duration %f new batch size %d",
                               table_name,
-                              end,
+                              converted,
                               total_to_convert,
-                              end * 100.0 / total_to_convert,
+                              converted * 100.0 / total_to_convert,
                               batch_size,
                               batch_duration,
                               new_batch_size)
 
             batch_size = new_batch_size
 
-            if offset >= total_to_convert or now() - last_commit_time > 10:
+            if converted >= total_to_convert or now() - last_commit_time > 10:
                 self._logger.info("Upgrade: commit data")
                 cursor.execute("commit")
                 cursor.execute("begin transaction")
@@ -97,26 +101,49 @@ class PonyToPonyMigration:
 
     async def convert_table(self, cursor, table_name, column_names):
         column_names_joined = ", ".join(column_names)
-        if "rowid" in column_names:
-            order_column = "rowid"
-        else:
-            order_column = column_names[0]
+        # Entries are copied in rowid order with keyset pagination: each batch starts right after the last copied
+        # rowid, so the cost of a batch does not depend on the number of entries copied before. The last copied
+        # rowid is stored as a checkpoint in the same transaction as the batch itself.
+        sql_batch_end = f"SELECT rowid FROM old_db.{table_name} WHERE rowid > ? ORDER BY rowid LIMIT 1 OFFSET ?;"
+        sql_last_rowid = f"SELECT MAX(rowid) FROM old_db.{table_name};"
+        sql_count_after = f"SELECT COUNT(*) FROM old_db.{table_name} WHERE rowid > ?;"
         sql_command = f"INSERT OR IGNORE INTO {table_name} ({column_names_joined}) " + \
                       f"SELECT {column_names_joined} FROM old_db.{table_name} " + \
-                      f"ORDER BY {order_column} " + \
-                      f"LIMIT ? OFFSET ?;"
+                      "WHERE rowid > ? AND rowid <= ?;"
+
+        last_rowid = get_checkpoint(cursor, table_name)
 
-        def convert_command(offset, batch_size):
+        def convert_command(batch_size):
+            nonlocal last_rowid
             try:
-                cursor.execute(sql_command, (batch_size, offset))
-            except Exception as e:
+                row = cursor.execute(sql_batch_end, (last_rowid, batch_size - 1)).fetchone()
+                if row:
+                    batch_end, converted = row[0], batch_size
+                else:
+                    # The last (incomplete) batch
+                    batch_end = cursor.execute(sql_last_rowid).fetchone()[0]
+                    if batch_end is None or batch_end <= last_rowid:
+                        return 0
+                    converted = cursor.execute(sql_count_after, (last_rowid,)).fetchone()[0]
+                cursor.execute(sql_command, (last_rowid, batch_end))
+                last_rowid = batch_end
+                set_checkpoint(cursor, table_name, last_rowid)
+                return converted
+            except Exception as e:  # pylint: disable=broad-except
                 self._logger.error("Upgrade: error while executing conversion command: %s:%s, SQL %s ",
                                    type(e).__name__, str(e), sql_command)
                 # Bail out and stop the upgrade process
                 self.shutting_down = True
+                return 0
 
         old_entries_count = self.get_table_entries_count(cursor, f"old_db.{table_name}")
-        await self.convert_async(table_name, cursor, convert_command, old_entries_count, message=f"Converting DB table {table_name}")
+        already_converted = cursor.execute(
+            f"SELECT COUNT(*) FROM old_db.{table_name} WHERE rowid <= ?;", (last_rowid,)
+        ).fetchone()[0]
+        if already_converted:
+            self._logger.info("Upgrade: resuming conversion of %s after %i entries", table_name, already_converted)
+        await self.convert_async(table_name, cursor, convert_command, old_entries_count, offset=already_converted,
+                                 message=f"Converting DB table {table_name}")
 
     async def do_migration(self):
         try:
@@ -128,7 +155,8 @@ class PonyToPonyMigration:
 
             with contextlib.closing(sqlite3.connect(self.new_db_path)) as connection, connection:
                 cursor = connection.cursor()
-                cursor.execute("PRAGMA journal_mode = OFF;")
+                # Journaling is required to resume an interrupted upgrade from a consistent state
+                cursor.execute("PRAGMA journal_mode = WAL;")
                 cursor.execute("PRAGMA synchronous = OFF;")
                 cursor.execute("PRAGMA foreign_keys = OFF;")
                 cursor.execute("PRAGMA temp_store = MEMORY;")
@@ -218,6 +246,9 @@ class PonyToPonyMigration:
             connection.set_progress_handler(fts_callback_handler, 5000)
             try:
                 t = now()
+                # An upgrade that was interrupted after filling the FTS index, but before the upgraded DB was moved in
+                # place, is resumed with a full FTS index. Refilling it would add every entry a second time.
+                connection.execute("INSERT INTO FtsIndex(FtsIndex) VALUES('delete-all')")
                 mds.fill_fts_index()
                 duration = now() - t
                 self._logger.info(f'Upgrade: fill FTS in {duration:.2f} seconds')
@@ -226,6 +257,34 @@ class PonyToPonyMigration:
         mds.shutdown()
 
 
+def can_resume_migration(new_db_path):
+    """
+    Check if the given (temporary) database contains the progress checkpoints of an interrupted migration.
+    """
+    with contextlib.closing(sqlite3.connect(new_db_path)) as connection, connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT COUNT(*) FROM MiscData WHERE name LIKE ?', (CHECKPOINT_PREFIX + "%",))
+        except sqlite3.OperationalError:
+            return False
+        return cursor.fetchone()[0] > 0
+
+
+def clear_checkpoints(new_db_path):
+    with contextlib.closing(sqlite3.connect(new_db_path)) as connection, connection:
+        connection.execute('DELETE FROM MiscData WHERE name LIKE ?', (CHECKPOINT_PREFIX + "%",))
+
+
+def get_checkpoint(cursor, table_name):
+    row = cursor.execute('SELECT value FROM MiscData WHERE name = ?', (CHECKPOINT_PREFIX + table_name,)).fetchone()
+    return int(row[0]) if row else 0
+
+
+def set_checkpoint(cursor, table_name, last_rowid):
+    cursor.execute('INSERT OR REPLACE INTO MiscData (name, value) VALUES (?, ?)',
+                   (CHECKPOINT_PREFIX + table_name, str(last_rowid)))
+
+
 def calc_progress(duration_now, duration_half=60.0):
     result = 100 * ( 1 - 1 / (1 + duration_now / (duration_half + 1)) ** 2)
     return result
@@ -1,5 +1,7 @@
+import contextlib
 import os
 import shutil
+import sqlite3
 from asyncio import Future
 from pathlib import Path
 
@@ -13,7 +15,12 @@ from tribler_core.modules.bandwidth_accounting.database import BandwidthDatabase
 from tribler_core.modules.metadata_store.orm_bindings.channel_metadata import CHANNEL_DIR_NAME_LENGTH
 from tribler_core.modules.metadata_store.store import CURRENT_DB_VERSION, MetadataStore
 from tribler_core.tests.tools.common import TESTS_DATA_DIR
-from tribler_core.upgrade.db8_to_db10 import calc_progress
+from tribler_core.upgrade.db8_to_db10 import (
+    PonyToPonyMigration,
+    calc_progress,
+    can_resume_migration,
+    set_checkpoint,
+)
 from tribler_core.upgrade.upgrade import cleanup_noncompliant_channel_torrents
 from tribler_core.utilities.configparser import CallbackConfigParser
 
@@ -188,6 +195,69 @@ async def test_upgrade_pony_8to10(upgrader, session):
         assert mds.ChannelNode.select().count() == 23
     mds.shutdown()
 
+@pytest.mark.asyncio
+async def test_upgrade_pony_8to10_resume(upgrader, session):
+    """
+    Test that an interrupted upgrade continues from the last checkpoint instead of starting anew
+    """
+    old_db_sample = TESTS_DATA_DIR / 'upgrade_databases' / 'pony_v6.db'
+    database_path = session.config.state_dir / 'sqlite' / 'metadata.db'
+    tmp_database_path = database_path.parent / 'metadata_upgraded.db'
+    shutil.copyfile(old_db_sample, database_path)
+    upgrader.upgrade_pony_db_6to7()
+    upgrader.upgrade_pony_db_7to8()
+
+    # Emulate an upgrade that was killed after copying the first 10 ChannelNode entries
+    mds = MetadataStore(tmp_database_path, None, session.trustchain_keypair, disable_sync=True, db_version=10)
+    mds.shutdown()
+    with contextlib.closing(sqlite3.connect(database_path)) as connection:
+        last_rowid = connection.execute("SELECT rowid FROM ChannelNode ORDER BY rowid LIMIT 1 OFFSET 9").fetchone()[0]
+    with contextlib.closing(sqlite3.connect(tmp_database_path)) as connection, connection:
+        set_checkpoint(connection.cursor(), "ChannelNode", last_rowid)
+    assert can_resume_migration(tmp_database_path)
+
+    await upgrader.upgrade_pony_db_8to10()
+    mds = MetadataStore(database_path, None, session.trustchain_keypair, check_tables=False, db_version=10)
+    with db_session:
+        assert int(mds.MiscData.get(name="db_version").value) == 10
+        # Only the entries after the checkpoint were copied by the resumed upgrade
+        assert mds.ChannelNode.select().count() == 13
+    mds.shutdown()
+    assert not can_resume_migration(database_path)
+
+
+@pytest.mark.asyncio
+async def test_upgrade_pony_8to10_resume_after_fts(upgrader, session):
+    """
+    Test that an upgrade that was interrupted after filling the FTS index, but before the upgraded DB was moved in
+    place, can be resumed
+    """
+    old_db_sample = TESTS_DATA_DIR / 'upgrade_databases' / 'pony_v6.db'
+    database_path = session.config.state_dir / 'sqlite' / 'metadata.db'
+    tmp_database_path = database_path.parent / 'metadata_upgraded.db'
+    shutil.copyfile(old_db_sample, database_path)
+    upgrader.upgrade_pony_db_6to7()
+    upgrader.upgrade_pony_db_7to8()
+
+    # Run the whole upgrade, except for moving the upgraded DB in place
+    mds = MetadataStore(tmp_database_path, None, session.trustchain_keypair, disable_sync=True, db_version=10)
+    with db_session(ddl=True):
+        mds.drop_indexes()
+        mds.drop_fts_triggers()
+    mds.shutdown()
+    migration = PonyToPonyMigration(database_path, tmp_database_path, lambda _: None)
+    duration_base = await migration.do_migration()
+    await migration.recreate_indexes(mds, duration_base)
+    assert not migration.shutting_down
+    assert can_resume_migration(tmp_database_path)
+
+    await upgrader.upgrade_pony_db_8to10()
+    assert not tmp_database_path.exists()
+    with contextlib.closing(sqlite3.connect(database_path)) as connection:
+        # The FTS index matches the ChannelNode table exactly, i.e. no entry was indexed twice
+        connection.execute("INSERT INTO FtsIndex(FtsIndex, rank) VALUES('integrity-check', 1)")
+
+
 @pytest.mark.asyncio
 async def test_upgrade_pony_10to11(upgrader, session):
     old_db_sample = TESTS_DATA_DIR / 'upgrade_databases' / 'pony_v10.db'
@@ -22,7 +22,12 @@ from tribler_core.upgrade.config_converter import (
     convert_config_to_tribler75,
     convert_config_to_tribler76,
 )
-from tribler_core.upgrade.db8_to_db10 import PonyToPonyMigration, get_db_version
+from tribler_core.upgrade.db8_to_db10 import (
+    PonyToPonyMigration,
+    can_resume_migration,
+    clear_checkpoints,
+    get_db_version,
+)
 from tribler_core.upgrade.legacy_to_pony import DispersyToPonyMigration, cleanup_pony_experimental_db, should_upgrade
 from tribler_core.utilities.configparser import CallbackConfigParser
 
@@ -282,11 +287,15 @@ class TriblerUpgrader:
         # Otherwise, start upgrading
         self.notify_starting()
         tmp_database_path = database_path.parent / 'metadata_upgraded.db'
-        # Clean the previous temp database
+        # A temp database with conversion checkpoints is left by an interrupted upgrade, so we continue it.
+        # Otherwise, we clean the previous temp database.
         if tmp_database_path.exists():
-            tmp_database_path.unlink()
+            if can_resume_migration(tmp_database_path):
+                self._logger.info("Upgrade: resuming the interrupted upgrade of %s", database_path)
+            else:
+                tmp_database_path.unlink()
 
-        # Create the new database
+        # Create the new database (or open the partially converted one)
         mds = MetadataStore(tmp_database_path, None, self.session.trustchain_keypair,
                             disable_sync=True, db_version=10)
         with db_session(ddl=True):
@@ -299,15 +308,16 @@ class TriblerUpgrader:
         duration_base = await self._pony2pony.do_migration()
         await self._pony2pony.recreate_indexes(mds, duration_base)
 
-        # Remove the old DB
-        database_path.unlink()
         if not self._pony2pony.shutting_down:
-            # Move the upgraded db in its place
-            tmp_database_path.rename(database_path)
+            # Move the upgraded db in its place. This atomically replaces the old DB, so a crash at any point leaves
+            # either the old DB or the upgraded one.
+            clear_checkpoints(tmp_database_path)
+            tmp_database_path.replace(database_path)
         else:
-            # The upgrade process was either skipped or interrupted. Delete the temp upgrade DB.
+            # The upgrade process was either skipped or interrupted. Delete the temp upgrade DB and the old DB.
             if tmp_database_path.exists():
                 tmp_database_path.unlink()
+            database_path.unlink()
 
         self.notify_done()
 
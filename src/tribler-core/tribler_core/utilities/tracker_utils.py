@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 from http.client import HTTP_PORT
 from json import dumps
 from urllib.parse import ParseResult, parse_qsl, unquote, urlencode, urlparse
@@ -21,7 +22,11 @@ url_regex = re.compile(
 remove_trailing_junk = re.compile(r'[,*.:]+\Z')
 truncated_url_detector = re.compile(r'\.\.\.')
 
+# Channels only use a few thousand distinct tracker strings, so their uniformed URLs are worth remembering
+TRACKER_URL_CACHE_SIZE = 8192
 
+
+@lru_cache(maxsize=TRACKER_URL_CACHE_SIZE)
 def get_uniformed_tracker_url(tracker_url):
     """
     Parse a tracker url of str type.
@@ -0,0 +1,150 @@
+import sys
+
+from PyQt5.QtCore import QCoreApplication
+
+import pytest
+
+from tribler_gui.widgets.tablecontentmodel import ChannelContentModel, ItemUidIndex, get_item_uid
+
+
+def make_torrent(index):
+    return {'public_key': 'aa', 'id': index, 'infohash': f'{index:040x}', 'name': f'torrent {index}'}
+
+
+class MockChannelContentModel(ChannelContentModel):
+    """
+    A model that does not send any requests to the core
+    """
+
+    def perform_query(self, **kwargs):
+        pass
+
+
+@pytest.fixture(name="qt_app", scope="module")
+def fixture_qt_app():
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    yield app
+
+
+@pytest.fixture(name="model")
+def fixture_model(qt_app):  # pylint: disable=unused-argument
+    return MockChannelContentModel()
+
+
+def test_item_uid_index_add_and_get():
+    items = [make_torrent(i) for i in range(3)]
+    index = ItemUidIndex(lambda: items)
+    for row, item in enumerate(items):
+        index.add(item, row)
+
+    assert len(index) == 6
+    assert index.get(get_item_uid(items[1])) == 1
+    assert index.get(items[2]['infohash']) == 2
+    assert index.get('missing') is None
+    assert index.get('missing', -1) == -1
+
+
+def test_item_uid_index_shift():
+    """
+    Test whether prepending items only moves the origin of the existing rows
+    """
+    items = [make_torrent(i) for i in range(3)]
+    index = ItemUidIndex(lambda: items)
+    for row, item in enumerate(items):
+        index.add(item, row)
+
+    new_items = [make_torrent(i) for i in range(3, 5)]
+    index.shift(len(new_items))
+    items[0:0] = new_items
+    for row, item in enumerate(new_items):
+        index.add(item, row)
+
+    for row, item in enumerate(items):
+        assert index.get(get_item_uid(item)) == row
+        assert index.get(item['infohash']) == row
+
+
+def test_item_uid_index_remove():
+    """
+    Test whether the rows below removed items are recomputed on the next lookup
+    """
+    items = [make_torrent(i) for i in range(5)]
+    index = ItemUidIndex(lambda: items)
+    for row, item in enumerate(items):
+        index.add(item, row)
+
+    for row in (3, 1):
+        index.discard(items[row], row)
+        del items[row]
+    index.invalidate_from(1)
+
+    assert get_item_uid(make_torrent(1)) not in index
+    assert get_item_uid(make_torrent(3)) not in index
+    for row, item in enumerate(items):
+        assert index.get(get_item_uid(item)) == row
+
+
+def test_item_uid_index_shared_infohash():
+    """
+    Test whether removing an item keeps the infohash key of another item with the same infohash
+    """
+    first = make_torrent(1)
+    second = dict(make_torrent(2), infohash=first['infohash'])
+    items = [first, second]
+    index = ItemUidIndex(lambda: items)
+    index.add(first, 0)
+    index.add(second, 1)
+
+    index.discard(first, 0)
+    assert index.get(first['infohash']) == 1
+
+    index.clear()
+    assert not len(index)
+
+
+def test_node_updates_coalesced(model):
+    """
+    Test whether updates of the same entry are merged and applied to the model in one go
+    """
+    model.add_items([make_torrent(i) for i in range(3)])
+    changed = []
+    model.dataChanged.connect(lambda first, last, _: changed.append((first.row(), last.row())))
+
+    model.update_node_info({'public_key': 'aa', 'id': 1, 'infohash': make_torrent(1)['infohash'], 'name': 'a'})
+    model.update_node_info({'public_key': 'aa', 'id': 1, 'infohash': make_torrent(1)['infohash'], 'num_seeders': 5})
+    model.update_node_info({'public_key': 'aa', 'id': 2, 'infohash': make_torrent(2)['infohash'], 'name': 'b'})
+    assert len(model.pending_node_updates) == 2
+    assert model.pending_updates_timer.isActive()
+    assert model.data_items[1]['name'] == 'torrent 1'
+
+    model.apply_pending_updates()
+    assert model.data_items[1]['name'] == 'a'
+    assert model.data_items[1]['num_seeders'] == 5
+    assert model.data_items[2]['name'] == 'b'
+    assert changed == [(1, 2)]
+    assert not model.pending_node_updates
+
+
+def test_remote_items_coalesced(model):
+    """
+    Test whether remote results are added to the model in a single batch
+    """
+    model.local_total = 0
+    model.pending_remote_items.extend([make_torrent(1), make_torrent(2), make_torrent(1)])
+    model.apply_pending_updates()
+    assert [item['id'] for item in model.data_items] == [1, 2]
+    assert not model.pending_remote_items
+
+
+def test_reset_drops_pending_updates(model):
+    """
+    Test whether resetting the model drops the updates that have not been applied yet
+    """
+    model.add_items([make_torrent(1)])
+    model.update_node_info({'public_key': 'aa', 'id': 1, 'infohash': make_torrent(1)['infohash'], 'name': 'a'})
+    assert model.pending_updates_timer.isActive()
+
+    model.reset()
+    assert not model.pending_node_updates
+    assert not model.pending_updates_timer.isActive()
+    assert not model.data_items
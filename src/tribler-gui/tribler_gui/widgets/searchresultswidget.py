@@ -124,8 +124,8 @@ class SearchResultsWidget(AddBreadcrumbOnShowMixin, widget_form, widget_class):
     def update_loading_page(self, remote_results):
         if not self.search_request or remote_results.get("uuid") != self.search_request.uuid:
             return
-        peer = remote_results["peer"]
-        self.search_request.peers_complete.add(peer)
+        # The Core merges the results of several peers into a single event
+        self.search_request.peers_complete.update(remote_results.get("peers", []))
         self.search_request.remote_results.append(remote_results.get("results", []))
         self.state_label.setText(format_search_loading_label(self.search_request))
         if self.search_request.complete:
@@ -4,7 +4,7 @@ from dataclasses import dataclass, field
 from enum import Enum, auto
 from typing import Callable
 
-from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QTimer, Qt, pyqtSignal
 
 from tribler_common.simpledefs import CHANNELS_VIEW_UUID, CHANNEL_STATE
 
@@ -17,6 +17,9 @@ from tribler_gui.utilities import connect, format_size, format_votes, get_votes_
 
 EXPANDING = 0
 
+# Remote results and entity updates arriving within this interval (ms) are applied to the model in a single batch
+UPDATES_COALESCING_INTERVAL = 50
+
 
 class Column(Enum):
     ACTIONS = auto()
@@ -71,6 +74,77 @@ def get_item_uid(item):
     return item['infohash']
 
 
+class ItemUidIndex:
+    """
+    Mapping from item uids (and infohashes) to the rows of a table model.
+
+    Rows are stored as positions relative to a movable origin, so prepending items to the table only moves
+    the origin instead of renumbering every existing row. Removing rows marks the positions below the first
+    removed row as stale. These are recomputed lazily on the next lookup, so a batch of removals costs
+    a single pass over the shifted part of the table.
+    """
+
+    def __init__(self, get_items):
+        # Callable returning the current list of items, used to recompute stale positions
+        self.get_items = get_items
+        self.positions = {}
+        self.origin = 0
+        self.stale_from = None
+
+    @staticmethod
+    def item_keys(item):
+        uid = get_item_uid(item)
+        yield uid
+        if 'infohash' in item and item['infohash'] != uid:
+            yield item['infohash']
+
+    def __contains__(self, uid):
+        return uid in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def get(self, uid, default=None):
+        self.reindex()
+        position = self.positions.get(uid)
+        return default if position is None else position + self.origin
+
+    def add(self, item, row):
+        for key in self.item_keys(item):
+            self.positions[key] = row - self.origin
+
+    def discard(self, item, row):
+        # The infohash key can be shared by several items, so we only remove it if it points to this row
+        position = row - self.origin
+        for key in self.item_keys(item):
+            if self.positions.get(key) == position:
+                self.positions.pop(key)
+
+    def shift(self, count):
+        """
+        Shift all the rows down by count, e.g. to make space for the items inserted on top of the table.
+        """
+        self.origin += count
+        if self.stale_from is not None:
+            self.stale_from += count
+
+    def invalidate_from(self, row):
+        self.stale_from = row if self.stale_from is None else min(self.stale_from, row)
+
+    def reindex(self):
+        if self.stale_from is None:
+            return
+        items = self.get_items()
+        for row in range(self.stale_from, len(items)):
+            self.add(items[row], row)
+        self.stale_from = None
+
+    def clear(self):
+        self.positions.clear()
+        self.origin = 0
+        self.stale_from = None
+
+
 class RemoteTableModel(QAbstractTableModel):
     info_changed = pyqtSignal(list)
     query_complete = pyqtSignal()
@@ -87,7 +161,7 @@ class RemoteTableModel(QAbstractTableModel):
         super().__init__(parent)
         # Unique identifier mapping for items. For torrents, it is infohash and for channels, it is concatenated value
         # of public key and channel id
-        self.item_uid_map = {}
+        self.item_uid_map = ItemUidIndex(lambda: self.data_items)
 
         # ACHTUNG! The reason why this is here and not in the class variable is, QT i18 only works for
         # tr() entries defined in the class instance constructor
@@ -113,6 +187,15 @@ class RemoteTableModel(QAbstractTableModel):
         # last one. In a sense, the queries' UUIDs play the role of "subscription topics" for the model.
         self.remote_queries = set()
 
+        # Remote results and entity updates are coalesced and applied in batches, so a burst of events
+        # results in a single rows insertion and a single data change notification.
+        self.pending_remote_items = []
+        self.pending_node_updates = {}
+        self.pending_updates_timer = QTimer(self)
+        self.pending_updates_timer.setSingleShot(True)
+        self.pending_updates_timer.setInterval(UPDATES_COALESCING_INTERVAL)
+        connect(self.pending_updates_timer.timeout, self.apply_pending_updates)
+
         self.loaded = False
 
     @property
@@ -137,7 +220,10 @@ class RemoteTableModel(QAbstractTableModel):
         self.remote_items = []
         self.max_rowid = None
         self.local_total = None
-        self.item_uid_map = {}
+        self.pending_remote_items = []
+        self.pending_node_updates = {}
+        self.pending_updates_timer.stop()
+        self.item_uid_map.clear()
         self.endResetModel()
         self.perform_query()
 
@@ -170,41 +256,31 @@ class RemoteTableModel(QAbstractTableModel):
 
         # Note: If we want to block the signal like itemChanged, we must use QSignalBlocker object or blockSignals
 
-        # Only add unique items to the table model and reverse mapping from unique ids to rows is built.
-        insert_index = 0 if on_top else len(self.data_items)
+        # Only add unique items to the table model
         unique_new_items = []
+        new_uids = set()
         for item in new_items:
             item_uid = get_item_uid(item)
-            if item_uid not in self.item_uid_map:
-                self.item_uid_map[item_uid] = insert_index
-                if 'infohash' in item:
-                    self.item_uid_map[item['infohash']] = insert_index
+            if item_uid not in self.item_uid_map and item_uid not in new_uids:
+                new_uids.add(item_uid)
                 unique_new_items.append(item)
-                insert_index += 1
 
         # If no new items are found, skip
         if not unique_new_items:
             return
 
-        # Else if remote items, to make space for new unique items shift the existing items
-        if on_top and insert_index > 0:
-            new_items_map = {}
-            for item in self.data_items:
-                old_item_uid = get_item_uid(item)
-                if old_item_uid in self.item_uid_map:
-                    shifted_index = insert_index + self.item_uid_map[old_item_uid]
-                    new_items_map[old_item_uid] = shifted_index
-                    if 'infohash' in item:
-                        new_items_map[item['infohash']] = shifted_index
-            self.item_uid_map.update(new_items_map)
-
-        # Update the table model
+        # Update the table model and the reverse mapping from unique ids to rows
         if on_top:
+            first_row = 0
             self.beginInsertRows(QModelIndex(), 0, len(unique_new_items) - 1)
-            self.data_items = unique_new_items + self.data_items
+            self.item_uid_map.shift(len(unique_new_items))
+            self.data_items[0:0] = unique_new_items
         else:
-            self.beginInsertRows(QModelIndex(), len(self.data_items), len(self.data_items) + len(unique_new_items) - 1)
+            first_row = len(self.data_items)
+            self.beginInsertRows(QModelIndex(), first_row, first_row + len(unique_new_items) - 1)
             self.data_items.extend(unique_new_items)
+        for row, item in enumerate(unique_new_items, first_row):
+            self.item_uid_map.add(item, row)
         self.endInsertRows()
 
         if self.all_local_entries_loaded:
@@ -213,14 +289,11 @@ class RemoteTableModel(QAbstractTableModel):
             self.add_items(remote_items, remote=True)  # to filter non-unique entries
 
     def remove_items(self, items):
-        uids_to_remove = []
-        rows_to_remove = []
+        rows_to_remove = set()
         for item in items:
-            uid = get_item_uid(item)
-            row = self.item_uid_map.get(uid)
+            row = self.item_uid_map.get(get_item_uid(item))
             if row is not None:
-                uids_to_remove.append(uid)
-                rows_to_remove.append(row)
+                rows_to_remove.add(row)
 
         if not rows_to_remove:
             return
@@ -238,22 +311,46 @@ class RemoteTableModel(QAbstractTableModel):
             else:
                 groups.append([row])
 
-        for uid in uids_to_remove:
-            self.item_uid_map.pop(uid)
+        for row in rows_to_remove_reversed:
+            self.item_uid_map.discard(self.data_items[row], row)
         for group in groups:
             first, last = group[-1], group[0]
             self.beginRemoveRows(QModelIndex(), first, last)
-            for row in group:
-                del self.data_items[row]
+            del self.data_items[first : last + 1]
             self.endRemoveRows()
 
-        # Update uids of the shifted rows
-        for n, item in enumerate(self.data_items):
-            if n >= rows_to_remove[0]:  # start from the first removed row
-                self.item_uid_map[get_item_uid(item)] = n
+        # Rows below the first removed one have shifted, their uids are re-indexed on the next lookup
+        self.item_uid_map.invalidate_from(rows_to_remove_reversed[-1])
 
         self.info_changed.emit(items)
 
+    def schedule_pending_updates(self):
+        if not self.pending_updates_timer.isActive():
+            self.pending_updates_timer.start()
+
+    def apply_pending_updates(self):
+        """
+        Apply the coalesced remote results and entity updates to the model in one go.
+        """
+        if self.qt_object_destroyed:
+            return
+
+        remote_items, self.pending_remote_items = self.pending_remote_items, []
+        self.add_items(remote_items, remote=True)
+
+        node_updates, self.pending_node_updates = self.pending_node_updates, {}
+        updated_rows = []
+        for uid, update_dict in node_updates.items():
+            row = self.item_uid_map.get(uid)
+            if row is not None and row < len(self.data_items):
+                self.data_items[row].update(**update_dict)
+                updated_rows.append(row)
+
+        if updated_rows:
+            self.dataChanged.emit(
+                self.index(min(updated_rows), 0), self.index(max(updated_rows), len(self.columns) - 1), []
+            )
+
     def perform_query(self, **kwargs):
         """
         Fetch results for a given query.
@@ -303,7 +400,11 @@ class RemoteTableModel(QAbstractTableModel):
             if prev_total != self.channel_info.get("total"):
                 update_labels = True
 
-            self.add_items(response['results'], on_top=on_top, remote=remote)
+            if remote and not on_top:
+                self.pending_remote_items.extend(response['results'])
+                self.schedule_pending_updates()
+            else:
+                self.add_items(response['results'], on_top=on_top, remote=remote)
 
             if update_labels:
                 self.info_changed.emit(response['results'])
@@ -444,10 +545,13 @@ class ChannelContentModel(RemoteTableModel):
             self.info_changed.emit([])
             return
 
-        row = self.item_uid_map.get(get_item_uid(update_dict))
-        if row is not None and row < len(self.data_items):
-            self.data_items[row].update(**update_dict)
-            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.columns)), [])
+        # Updates of the same entry are merged together and applied with the next batch
+        uid = get_item_uid(update_dict)
+        if uid in self.pending_node_updates:
+            self.pending_node_updates[uid].update(update_dict)
+        else:
+            self.pending_node_updates[uid] = dict(update_dict)
+        self.schedule_pending_updates()
 
     def perform_query(self, **kwargs):
         """